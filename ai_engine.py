@@ -1,156 +1,312 @@
 import os
 import json
-import re
+import hashlib
+from dataclasses import dataclass, asdict
 from google import genai
 from google.genai import types
+import metrics
+import prompts
+import call_policy
+import shared_store
 
-API_KEY = os.environ.get("GEMINI_API_KEY", "") 
-client = genai.Client(api_key=API_KEY) if API_KEY else None
-MODEL_ID = "gemini-2.5-flash" 
+API_KEY = os.environ.get("GEMINI_API_KEY", "")
+# Optional override so the app can be pointed at mock_gemini.py for offline load tests
+BASE_URL = os.environ.get("GEMINI_BASE_URL", "")
+
+if BASE_URL:
+    client = genai.Client(api_key=API_KEY or "mock-key", http_options=types.HttpOptions(base_url=BASE_URL))
+else:
+    client = genai.Client(api_key=API_KEY) if API_KEY else None
+MODEL_ID = "gemini-2.5-flash"
+
+def _generate(function, bytes_sent, config, **kwargs):
+    """Single choke point for Gemini calls: timed, counted, and run under the function's call policy."""
+    def attempt(timeout_s):
+        # Each attempt's HTTP timeout is whatever is left of the overall deadline
+        bounded = config.model_copy(update={"http_options": types.HttpOptions(timeout=int(timeout_s * 1000))})
+        with metrics.ai_call(function, bytes_sent) as call:
+            response = client.models.generate_content(model=MODEL_ID, config=bounded, **kwargs)
+            call.record_usage(response)
+        return response
+    return call_policy.run(function, attempt)
+
+# --- OFFLINE FALLBACK ---
+FALLBACK_CACHE_SIZE = 256
+# On disk so every worker process (and the next restart) shares the same last-known answers
+_fallback_cache = shared_store.DiskCache(os.environ.get("NUTRI_AI_CACHE", "ai_cache.db"), FALLBACK_CACHE_SIZE)
+
+OFFLINE_REPLIES = {
+    "analyze_food_image": {"error": True, "message": "The AI vision service is unavailable right now. Try again in a minute or log the meal manually."},
+    "chat_with_ai": "Your coach is offline for a moment. Keep logging meals and sipping water, and ask me again in a minute!",
+    "generate_recipe": """**Simple Balanced Plate**
+
+- Half the plate: steamed or stir-fried seasonal vegetables
+- A quarter: lean protein (dal, eggs, paneer, chicken or fish)
+- A quarter: whole grains (brown rice, millet or whole-wheat roti)
+
+**Method:** Cook with minimal oil, season with local spices and herbs. *The AI chef is offline; this is a general template.*""",
+    "analyze_pantry_image": "The Pantry Alchemist is offline right now. Try again in a minute, or build a plate from half vegetables, a quarter protein and a quarter whole grains.",
+    "generate_recovery_protocol": """**General Recovery Basics** *(the AI coach is offline; this is not personalised)*
+
+1. **Immediate Mobility/Rehab Advice:** Rest the area, apply ice for 15 minutes at a time, and only do pain-free range-of-motion movements.
+2. **Anti-Inflammatory Diet Shift:** Prioritise protein at every meal, plus omega-3 fats, leafy greens and vitamin C rich fruit.
+3. **Healing Recipe:** A turmeric and ginger lentil soup with plenty of vegetables.
+
+See a professional if pain is severe or persists.""",
+}
+
+def _fallback_key(name, fields, image_bytes=None):
+    raw = json.dumps([name, fields], sort_keys=True, default=str).encode()
+    if image_bytes is not None:
+        raw += hashlib.sha256(image_bytes).digest()
+    return hashlib.sha256(raw).hexdigest()
+
+def _remember(key, value):
+    _fallback_cache.set(key, value)
+
+class DegradedReply(str):
+    """Text shown in place of a live answer. `source` is "cache" or "offline" for fallbacks, "error" otherwise."""
+
+    def __new__(cls, text, source):
+        reply = super().__new__(cls, text)
+        reply.source = source
+        return reply
+
+def is_live(reply):
+    """True for a real Gemini answer; False for fallbacks and error replies (for load tests and callers that care)."""
+    if isinstance(reply, dict):
+        return not reply.get("error") and "fallback" not in reply
+    return reply is not None and not isinstance(reply, DegradedReply)
+
+def _fallback(name, key, error):
+    """Cached answer for the same request, else canned offline content. None if the error isn't an outage."""
+    if not (isinstance(error, call_policy.CircuitOpenError) or call_policy.is_transient(error)):
+        return None
+    cached = _fallback_cache.get(key)
+    source = "cache" if cached is not None else "offline"
+    metrics.AI_FALLBACKS.inc(function=name, source=source)
+    reply = cached if cached is not None else OFFLINE_REPLIES.get(name)
+    if isinstance(reply, dict):
+        return {**reply, "fallback": source}
+    return DegradedReply(reply, source) if reply is not None else None
+
+# --- PROMPT REGISTRY ---
+def _generate_prompt(name, fields=None, image_bytes=None, mime_type="image/jpeg", **config):
+    """Renders a registered prompt within its token budget and sends it with the static system part."""
+    template = prompts.PROMPTS[name]
+    text = template.render(**(fields or {}))
+    config["system_instruction"] = template.system
+    contents = [text]
+    if image_bytes is not None:
+        contents = [types.Content(parts=[
+            types.Part.from_text(text=text),
+            types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
+        ])]
+    bytes_sent = len(text) + len(image_bytes or b"") + len(template.system)
+    response = _generate(
+        name, bytes_sent,
+        contents=contents,
+        config=types.GenerateContentConfig(
+            temperature=template.temperature,
+            max_output_tokens=template.output_limit,
+            thinking_config=types.ThinkingConfig(thinking_budget=template.thinking_budget),
+            **config
+        )
+    )
+    template.check_usage(response)
+    return response
+
+def _reply_text(response):
+    """A prose answer, with a visible note when it ran into the output cap instead of ending on its own."""
+    text = response.text or ""
+    return text + prompts.TRUNCATION_NOTE if text and prompts.was_truncated(response) else text
+
+# --- VISION: TYPED RESULT & SCHEMA ---
+MAX_REPAIR_ATTEMPTS = 2
+MACRO_LIMITS = {"calories": 10000, "protein": 1000, "carbs": 1500, "fats": 1000}
+
+FOOD_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        "name": types.Schema(type=types.Type.STRING, description="Name of the food"),
+        "calories": types.Schema(type=types.Type.INTEGER, description="Total estimated calories"),
+        "protein": types.Schema(type=types.Type.INTEGER, description="Grams of protein"),
+        "carbs": types.Schema(type=types.Type.INTEGER, description="Grams of carbohydrates"),
+        "fats": types.Schema(type=types.Type.INTEGER, description="Grams of fats"),
+        "advice": types.Schema(type=types.Type.STRING, description="One short sentence of healthy advice regarding this food"),
+    },
+    required=["name", "calories", "protein", "carbs", "fats", "advice"],
+    property_ordering=["name", "calories", "protein", "carbs", "fats", "advice"],
+)
+
+@dataclass
+class FoodScan:
+    name: str
+    calories: int
+    protein: int
+    carbs: int
+    fats: int
+    advice: str = ""
+
+    @classmethod
+    def from_dict(cls, data):
+        """Validates model output against the schema. Raises ValueError describing the first violation."""
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        name = data.get("name")
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("'name' must be a non-empty string")
+        macros = {}
+        for key, limit in MACRO_LIMITS.items():
+            value = data.get(key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"'{key}' must be a number")
+            if not 0 <= value <= limit:
+                raise ValueError(f"'{key}' must be between 0 and {limit}")
+            macros[key] = int(round(value))
+        advice = data.get("advice", "")
+        if not isinstance(advice, str):
+            raise ValueError("'advice' must be a string")
+        return cls(name=name.strip(), advice=advice.strip(), **macros)
+
+    def to_dict(self):
+        return asdict(self)
+
+def _parse_scan(response):
+    """Fast path: the SDK already parsed the schema-constrained JSON; fall back to json.loads on the text."""
+    parsed = getattr(response, "parsed", None)
+    if isinstance(parsed, dict):
+        return FoodScan.from_dict(parsed)
+    try:
+        return FoodScan.from_dict(json.loads(response.text or ""))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON ({e.msg})")
+
+def _repair_scan(bad_output, problem):
+    """Text-only follow-up asking the model to fix its own output, much cheaper than resending the image."""
+    return _generate_prompt(
+        "analyze_food_image_repair", {"problem": problem, "bad_output": bad_output},
+        response_mime_type="application/json", response_schema=FOOD_SCHEMA
+    )
+
+def scan_food_image(image_bytes):
+    """Returns a validated FoodScan. Raises ValueError if the output can't be repaired; API errors propagate."""
+    response = _generate_prompt(
+        "analyze_food_image", image_bytes=image_bytes,
+        response_mime_type="application/json", response_schema=FOOD_SCHEMA
+    )
+    try:
+        return _parse_scan(response)
+    except ValueError as e:
+        problem = str(e)
+        metrics.VISION_PARSE_FAILURES.inc(stage="initial")
+
+    bad_output = response.text or ""
+    for _ in range(MAX_REPAIR_ATTEMPTS):
+        response = _repair_scan(bad_output, problem)
+        try:
+            scan = _parse_scan(response)
+        except ValueError as e:
+            problem = str(e)
+            bad_output = response.text or ""
+            metrics.VISION_PARSE_FAILURES.inc(stage="repair")
+            continue
+        metrics.VISION_REPAIRS.inc(outcome="success")
+        return scan
+    metrics.VISION_REPAIRS.inc(outcome="failed")
+    raise ValueError(problem)
 
 def analyze_food_image(image_bytes):
     if not client:
         return {"error": True, "message": "API Key is missing. Please set GEMINI_API_KEY in your terminal."}
-        
-    prompt = """
-    Analyze this food image. Provide the nutritional breakdown.
-    Respond ONLY with a JSON object containing the following keys:
-    "name": string (Name of the food)
-    "calories": integer (Total estimated calories)
-    "protein": integer (Grams of protein)
-    "carbs": integer (Grams of carbohydrates)
-    "fats": integer (Grams of fats)
-    "advice": string (One short sentence of healthy advice regarding this food)
-    """
+    key = _fallback_key("analyze_food_image", {}, image_bytes)
     try:
-        response = client.models.generate_content(
-            model=MODEL_ID,
-            contents=[
-                types.Content(
-                    parts=[
-                        types.Part.from_text(text=prompt),
-                        types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg")
-                    ]
-                )
-            ],
-            config=types.GenerateContentConfig(response_mime_type="application/json", temperature=0.2)
-        )
-        
-        # BULLETPROOF FIX: Use regex to hunt down the exact JSON block just in case the AI hallucinates conversational text around it
-        raw_text = response.text.strip()
-        match = re.search(r'\{.*\}', raw_text, re.DOTALL)
-        if match:
-            raw_text = match.group(0)
-            
-        return json.loads(raw_text)
-        
-    except json.JSONDecodeError:
+        result = scan_food_image(image_bytes).to_dict()
+        _remember(key, result)
+        return result
+    except ValueError:
+        metrics.record_ai_error("analyze_food_image", "SchemaViolation")
         return {"error": True, "message": "Failed to parse AI output. Please try a clearer image."}
     except Exception as e:
-        return {"error": True, "message": f"Vision API Error: {str(e)}"}
+        return _fallback("analyze_food_image", key, e) or {"error": True, "message": f"Vision API Error: {str(e)}"}
+
+def fallback_reply(name, fields, error, image_bytes=None):
+    """What a panel should show when `name` failed with `error`: a cached or offline answer, or None."""
+    return _fallback(name, _fallback_key(name, fields, image_bytes), error)
+
+def _require_client():
+    if not client:
+        raise RuntimeError("System Offline: API key missing.")
 
 def chat_with_ai(user_message, context_data):
     if not client:
-        return "System Offline: GEMINI_API_KEY environment variable is missing."
-        
-    sys_prompt = f"""
-    You are NUtri-INO, a friendly, uplifting AI health coach. 
-    Current User Stats & Context: {context_data}. 
-    Keep answers concise, helpful, and under 3 sentences. 
-    Use a positive, motivating tone. Include local insights if applicable.
-    """
+        return DegradedReply("System Offline: GEMINI_API_KEY environment variable is missing.", "error")
+    fields = {"context": context_data, "message": user_message}
+    key = _fallback_key("chat_with_ai", fields)
     try:
-        response = client.models.generate_content(
-            model=MODEL_ID,
-            config=types.GenerateContentConfig(system_instruction=sys_prompt),
-            contents=[user_message]
-        )
-        return response.text
+        response = _generate_prompt("chat_with_ai", fields)
+        text = _reply_text(response)
+        _remember(key, text)
+        return text
     except Exception as e:
-        return f"API Connection Failed: {str(e)}"
+        return _fallback("chat_with_ai", key, e) or DegradedReply(f"API Connection Failed: {str(e)}", "error")
+
+# --- LONG-FORM GENERATORS ---
+# The *_text functions raise on failure so background jobs only store real answers;
+# the original names keep their never-raise behaviour for direct callers.
+
+def recipe_text(food_name, location, goal):
+    _require_client()
+    fields = {"food_name": food_name, "location": location, "goal": goal}
+    response = _generate_prompt("generate_recipe", fields)
+    text = _reply_text(response)
+    _remember(_fallback_key("generate_recipe", fields), text)
+    return text
 
 def generate_recipe(food_name, location, goal):
     if not client:
-        return "System Offline: API key missing."
-    prompt = f"""
-    Act as a localized nutritionist and chef. 
-    Provide a quick, simple, healthy home-cooked recipe or preparation method for '{food_name}'.
-    The user is located in '{location}' and their primary health goal is '{goal}'.
-    Adapt the ingredients to what is fresh, cultural, and locally available there, while strictly supporting the health goal.
-    
-    IMPORTANT: Do NOT explicitly include the city, state, or region name in the recipe title or text. Use the natural, traditional name of the dish.
-    Format the response cleanly in Markdown with bold headers and bullet points. Keep it under 150 words.
-    """
+        return DegradedReply("System Offline: API key missing.", "error")
     try:
-        response = client.models.generate_content(
-            model=MODEL_ID,
-            contents=[prompt],
-            config=types.GenerateContentConfig(temperature=0.6) 
-        )
-        return response.text
+        return recipe_text(food_name, location, goal)
     except Exception as e:
-        return f"Could not generate recipe: {str(e)}"
+        fields = {"food_name": food_name, "location": location, "goal": goal}
+        return fallback_reply("generate_recipe", fields, e) or DegradedReply(f"Could not generate recipe: {str(e)}", "error")
+
+def pantry_text(image_bytes, location, goal, mime_type="image/jpeg"):
+    _require_client()
+    fields = {"location": location, "goal": goal}
+    response = _generate_prompt("analyze_pantry_image", fields, image_bytes=image_bytes, mime_type=mime_type)
+    if not response.text:
+        raise ValueError("The AI returned an empty response. The image might be too blurry or triggered a safety filter. Try a clearer photo!")
+    text = _reply_text(response)
+    _remember(_fallback_key("analyze_pantry_image", fields, image_bytes), text)
+    return text
 
 def analyze_pantry_image(image_bytes, location, goal, mime_type="image/jpeg"):
     if not client:
-        return "System Offline: API key missing."
-    
-    prompt = f"""
-    You are the "Pantry Alchemist". Look at the ingredients visible in this image (fridge, pantry, or counter).
-    The user lives in '{location}' and their health goal is '{goal}'.
-    Invent 2 unique, simple, and delicious recipes they can make right now using ONLY the ingredients you see (plus basic pantry staples like salt, pepper, oil, water).
-    If you cannot clearly see any food items, politely explain what you see instead.
-    
-    Format cleanly in Markdown. For each recipe include:
-    - A catchy title (IMPORTANT: Do NOT include the city, state, or region name anywhere in the title)
-    - Estimated Calories
-    - Brief instructions
-    """
+        return DegradedReply("System Offline: API key missing.", "error")
     try:
-        response = client.models.generate_content(
-            model=MODEL_ID,
-            contents=[
-                types.Content(
-                    parts=[
-                        types.Part.from_text(text=prompt),
-                        types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
-                    ]
-                )
-            ],
-            config=types.GenerateContentConfig(temperature=0.7) 
-        )
-        
-        if response.text:
-            return response.text
-        else:
-            return "The AI returned an empty response. The image might be too blurry or triggered a safety filter. Try a clearer photo!"
-            
+        return pantry_text(image_bytes, location, goal, mime_type)
+    except ValueError as e:
+        return DegradedReply(str(e), "error")
     except Exception as e:
-        return f"Failed to analyze pantry: {str(e)}"
+        fields = {"location": location, "goal": goal}
+        return fallback_reply("analyze_pantry_image", fields, e, image_bytes) or DegradedReply(f"Failed to analyze pantry: {str(e)}", "error")
 
 # --- NEW: REHAB & RECOVERY ENGINE ---
+def recovery_protocol_text(strain_description, location):
+    _require_client()
+    fields = {"strain": strain_description, "location": location}
+    response = _generate_prompt("generate_recovery_protocol", fields)
+    text = _reply_text(response)
+    _remember(_fallback_key("generate_recovery_protocol", fields), text)
+    return text
+
 def generate_recovery_protocol(strain_description, location):
     if not client:
-        return "System Offline: API key missing."
-        
-    prompt = f"""
-    Act as an elite sports medicine dietitian and physiotherapist. 
-    The user is experiencing the following strain/injury: '{strain_description}'.
-    They are located in '{location}'.
-    
-    Provide a highly actionable recovery protocol formatted cleanly in Markdown. Include:
-    1. **Immediate Mobility/Rehab Advice:** 2 specific, safe stretches or actions to take.
-    2. **Anti-Inflammatory Diet Shift:** Explain briefly what macros/micronutrients they need right now to repair this specific tissue.
-    3. **Healing Recipe:** 1 specific recipe using ingredients traditionally available in their region that directly supports reducing inflammation. 
-    
-    IMPORTANT: Do NOT explicitly mention the user's city, state, or region name anywhere in the protocol or recipe title. Give the dish its natural name.
-    """
+        return DegradedReply("System Offline: API key missing.", "error")
     try:
-        response = client.models.generate_content(
-            model=MODEL_ID,
-            contents=[prompt],
-            config=types.GenerateContentConfig(temperature=0.4)
-        )
-        return response.text
+        return recovery_protocol_text(strain_description, location)
     except Exception as e:
-        return f"Failed to generate recovery protocol: {str(e)}"
\ No newline at end of file
+        fields = {"strain": strain_description, "location": location}
+        return fallback_reply("generate_recovery_protocol", fields, e) or DegradedReply(f"Failed to generate recovery protocol: {str(e)}", "error")
@@ -0,0 +1,85 @@
+import math
+
+# --- MATH ALGORITHMS ---
+# Kept free of any UI imports so the dashboard, the benchmark runner and
+# background jobs can all share the exact same implementations.
+
+def solve_gauss_jordan(matrix, targets):
+    """Solves a 3x3 system of linear equations using Gauss-Jordan elimination."""
+    # Create the augmented matrix
+    aug = [matrix[i] + [targets[i]] for i in range(3)]
+
+    for i in range(3):
+        # Find pivot
+        pivot = aug[i][i]
+        if pivot == 0:
+            # Swap rows if pivot is zero
+            for j in range(i+1, 3):
+                if aug[j][i] != 0:
+                    aug[i], aug[j] = aug[j], aug[i]
+                    pivot = aug[i][i]
+                    break
+            if pivot == 0: return None # Singular matrix (foods have identical macro profiles)
+
+        # Divide row by pivot
+        for j in range(4):
+            aug[i][j] /= pivot
+
+        # Eliminate other rows
+        for k in range(3):
+            if k != i:
+                factor = aug[k][i]
+                for j in range(4):
+                    aug[k][j] -= factor * aug[i][j]
+
+    return [aug[0][3], aug[1][3], aug[2][3]]
+
+def pearson_correlation(x, y):
+    """Calculates the linear relationship between two lifestyle variables."""
+    n = len(x)
+    if n < 3: return 0.0
+
+    mean_x = sum(x) / n
+    mean_y = sum(y) / n
+
+    # Prevent divide-by-zero if data is entirely flat/identical
+    if all(xi == mean_x for xi in x) or all(yi == mean_y for yi in y):
+        return 0.0
+
+    numerator = sum((xi - mean_x) * (yi - mean_y) for xi, yi in zip(x, y))
+    sum_sq_x = sum((xi - mean_x)**2 for xi in x)
+    sum_sq_y = sum((yi - mean_y)**2 for yi in y)
+
+    denominator = math.sqrt(sum_sq_x * sum_sq_y)
+    return numerator / denominator if denominator != 0 else 0.0
+
+def correlations(columns, pairs):
+    """Pearson r for each (a, b) pair of named columns, e.g. {("carbs", "steps"): 0.71}."""
+    return {(a, b): pearson_correlation(columns[a], columns[b]) for a, b in pairs}
+
+LIFESTYLE_PAIRS = (("carbs", "steps"), ("protein", "consumed"), ("steps", "consumed"))
+
+def lifestyle_correlations(daily, pairs=LIFESTYLE_PAIRS):
+    """Correlations over the days that have any food or step data. Returns (day_count, {pair: r})."""
+    # Filter out empty days to avoid mathematically skewed data
+    keep = [i for i, (c, s) in enumerate(zip(daily["consumed"], daily["steps"])) if c > 0 or s > 0]
+    columns = {name: [daily[name][i] for i in keep] for pair in pairs for name in pair}
+    return len(keep), correlations(columns, pairs)
+
+class NoPortionPlan(ValueError):
+    """The targets can't be hit with these three foods."""
+
+def portion_plan(foods, targets):
+    """Grams of each of three foods (macros per 100 g as p/c/f) that hit the p/c/f targets exactly."""
+    # Build the 3x3 matrix (macros per 1 gram), transposed for the equation Ax = b
+    matrix = [[float(f['p']) / 100, float(f['c']) / 100, float(f['f']) / 100] for f in foods]
+    A = [[matrix[j][i] for j in range(3)] for i in range(3)]
+    b = [float(targets['p']), float(targets['c']), float(targets['f'])]
+
+    solution = solve_gauss_jordan(A, b)
+    if not solution:
+        raise NoPortionPlan("Foods are too nutritionally similar to solve.")
+    # Check for mathematically correct but physically impossible negative weights
+    if any(g < 0 for g in solution):
+        raise NoPortionPlan("Impossible to hit these exact targets without negative food. Try swapping an ingredient!")
+    return solution
@@ -0,0 +1,236 @@
+"""
+JSON API for mobile and integration clients.
+
+Mounted on NiceGUI's FastAPI app under /api, next to the wearable and job
+routes, and backed by the same HealthManager the dashboard uses. GET responses
+carry an ETag and answer a matching If-None-Match with 304. Bodies of 1 KB or
+more are gzipped for clients that accept it. /api/history is paged with `limit`
+and the `next` cursor from the previous page.
+
+Request bodies must be sent as application/json, so a cross-site page can't
+post one without a CORS preflight. When NUTRI_API_TOKEN is set, every route
+also needs it as X-API-Token; the dashboard's own pages get it as a same-site
+cookie for their offline sync and downloads.
+
+    GET    /api/day?date=YYYY-MM-DD       totals, meals, target and streak for one day
+    POST   /api/meals                     {"meals": [{name, calories, protein, carbs, fats, day?, ts?}]}
+    DELETE /api/meals/{id}
+    GET    /api/history?start=&end=&limit=&cursor=
+    GET    /api/streak
+    POST   /api/optimizer                 {"foods": [{name, p, c, f} x3], "targets": {p, c, f}}
+    GET    /api/analytics/correlations
+    GET    /api/analytics/forecast
+    POST   /api/sync                      {"ops": [{id, type: meal|steps|weight, ts, ...}]} from the offline queue
+"""
+import asyncio
+import functools
+import gzip
+import hashlib
+import hmac
+import json
+import os
+from datetime import date
+
+from fastapi import APIRouter, Request, Response
+
+from analytics import NoPortionPlan, lifestyle_correlations, portion_plan
+from history_store import METRICS, day_ordinal
+
+GZIP_MIN_BYTES = 1024
+MAX_BATCH_MEALS = 500
+DEFAULT_PAGE_DAYS = 100
+MAX_PAGE_DAYS = 1000
+MAX_SYNC_OPS = 500
+API_TOKEN = os.environ.get("NUTRI_API_TOKEN", "")
+API_COOKIE = "nutri_api"
+JSON_TYPES = ("application/json",)
+
+def has_api_token(request):
+    """True when no NUTRI_API_TOKEN is set, or the request carries it as X-API-Token or the dashboard cookie."""
+    if not API_TOKEN:
+        return True
+    sent = request.headers.get("x-api-token") or request.cookies.get(API_COOKIE) or ""
+    return hmac.compare_digest(sent, API_TOKEN)
+
+def rejection(request, body_types=None):
+    """(status, message) for a request without the API token or with a body type outside `body_types`, else None."""
+    if not has_api_token(request):
+        return 401, "Missing or wrong X-API-Token"
+    sent_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if body_types and sent_type not in body_types:
+        return 415, f"Content-Type must be {' or '.join(body_types)}"
+    return None
+
+def json_response(request, payload, status_code=200):
+    body = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    headers = {"Vary": "Accept-Encoding"}
+    if request.method == "GET":
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "no-cache"  # Always revalidate; a 304 costs a round trip, not a body
+        sent = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+        if etag in sent or "*" in sent:
+            return Response(status_code=304, headers=headers)
+    if len(body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+def error(request, status_code, message):
+    return json_response(request, {"error": message}, status_code)
+
+def _parse_day(value, default):
+    if not value:
+        return default
+    try:
+        return day_ordinal(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+def create_router(manager, compute_pool, forecaster):
+    router = APIRouter(prefix="/api")
+
+    def today():
+        return day_ordinal(manager.data["current_date"])
+
+    def streak():
+        count, last_7 = manager.get_streak_info()
+        return {"streak": count, "last_7_days": last_7}
+
+    def refuse(request, body_types=None):
+        refused = rejection(request, body_types)
+        return error(request, *refused) if refused else None
+
+    @router.get("/day")
+    def get_day(request: Request, date: str = None):
+        refused = refuse(request)
+        if refused:
+            return refused
+        try:
+            ordinal = _parse_day(date, today())
+        except ValueError as ex:
+            return error(request, 400, str(ex))
+        day = _iso(ordinal)
+        totals = manager.get_day(ordinal)
+        payload = {"date": day, "totals": totals, "meals": manager.meals.meals_for_day(day), "target": manager.data["target"]}
+        if ordinal == today():
+            payload["remaining"] = manager.get_stats()["remaining"]
+            payload["streak"] = streak()
+        return json_response(request, payload)
+
+    @router.post("/meals")
+    async def log_meals(request: Request):
+        refused = refuse(request, JSON_TYPES)
+        if refused:
+            return refused
+        try:
+            payload = await request.json()
+        except ValueError:
+            return error(request, 400, "Body must be JSON")
+        meals = payload.get("meals") if isinstance(payload, dict) else payload
+        if not isinstance(meals, list) or not meals:
+            return error(request, 400, 'Body must be {"meals": [...]} with at least one meal')
+        if len(meals) > MAX_BATCH_MEALS:
+            return error(request, 413, f"At most {MAX_BATCH_MEALS} meals per request")
+        try:
+            ids = manager.log_meals(meals)
+        except (TypeError, ValueError, AttributeError) as ex:
+            return error(request, 400, str(ex))
+        return json_response(request, {"ids": ids, "today": manager.get_day(today())}, 201)
+
+    @router.delete("/meals/{meal_id}")
+    def delete_meal(request: Request, meal_id: int):
+        refused = refuse(request)
+        if refused:
+            return refused
+        meal = manager.undo_meal(meal_id)
+        if meal is None:
+            return error(request, 404, "Unknown meal")
+        return json_response(request, {"deleted": meal})
+
+    @router.get("/history")
+    def history(request: Request, start: str = None, end: str = None, limit: int = DEFAULT_PAGE_DAYS, cursor: str = None):
+        refused = refuse(request)
+        if refused:
+            return refused
+        try:
+            first = _parse_day(cursor or start, manager.history.base_ordinal or today())
+            last = min(_parse_day(end, today()), today())
+        except ValueError as ex:
+            return error(request, 400, str(ex))
+        limit = max(1, min(limit, MAX_PAGE_DAYS))
+        stop = min(last, first + limit - 1)
+        past = manager.history.window(first, max(0, min(stop, today() - 1) - first + 1))
+        days = []
+        for i in range(max(0, stop - first + 1)):
+            row = manager.get_day(first + i) if first + i == today() else {m: past[m][i] for m in METRICS}
+            days.append({"date": _iso(first + i), **row})
+        return json_response(request, {"days": days, "next": _iso(stop + 1) if stop < last else None})
+
+    @router.post("/sync")
+    async def sync(request: Request):
+        """Offline entries, each applied once however often the client retries. The client drops every id echoed back."""
+        refused = refuse(request, JSON_TYPES)
+        if refused:
+            return refused
+        try:
+            payload = await request.json()
+        except ValueError:
+            return error(request, 400, "Body must be JSON")
+        ops = payload.get("ops") if isinstance(payload, dict) else None
+        if not isinstance(ops, list):
+            return error(request, 400, 'Body must be {"ops": [...]}')
+        if len(ops) > MAX_SYNC_OPS:
+            return error(request, 413, f"At most {MAX_SYNC_OPS} ops per request")
+        result = await asyncio.to_thread(manager.apply_sync_ops, ops)
+        return json_response(request, {**result, "today": manager.get_day(today())})
+
+    @router.get("/streak")
+    def get_streak(request: Request):
+        refused = refuse(request)
+        if refused:
+            return refused
+        return json_response(request, streak())
+
+    @router.post("/optimizer")
+    async def optimizer(request: Request):
+        refused = refuse(request, JSON_TYPES)
+        if refused:
+            return refused
+        try:
+            payload = await request.json()
+        except ValueError:
+            return error(request, 400, "Body must be JSON")
+        try:
+            foods, targets = payload["foods"], payload["targets"]
+            grams = await compute_pool.run(portion_plan, foods, targets, size=9)
+        except NoPortionPlan as ex:
+            return error(request, 422, str(ex))
+        except (KeyError, TypeError, ValueError, IndexError):
+            return error(request, 400, 'Body must be {"foods": [{name, p, c, f} x3], "targets": {p, c, f}} with numbers')
+        return json_response(request, {"portions": [{"name": f.get("name", ""), "grams": round(g, 1)} for f, g in zip(foods, grams)]})
+
+    @router.get("/analytics/correlations")
+    async def get_correlations(request: Request):
+        refused = refuse(request)
+        if refused:
+            return refused
+        daily = manager.get_daily_columns(("consumed", "protein", "carbs", "steps"))
+        logged_days, r = await compute_pool.run(lifestyle_correlations, daily, size=len(daily["consumed"]) * 3)
+        return json_response(request, {"logged_days": logged_days,
+                                       "correlations": [{"x": a, "y": b, "r": round(v, 4)} for (a, b), v in r.items()]})
+
+    @router.get("/analytics/forecast")
+    async def get_forecast(request: Request):
+        refused = refuse(request)
+        if refused:
+            return refused
+        series = manager.get_progress_series()
+        # Own key: sharing the dashboard panel's would let each supersede (cancel) the other's queued fit
+        run = functools.partial(compute_pool.run, size=len(series), key=f"{manager.user_id}:api-forecast")
+        return json_response(request, {"forecast": await forecaster.forecast_async(series, run)})
+
+    return router
+
+def _iso(ordinal):
+    return date.fromordinal(ordinal).isoformat()
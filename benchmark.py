@@ -0,0 +1,211 @@
+"""
+NUtri-INO benchmark runner.
+
+Generates synthetic users with years of history and times the hot paths of
+HealthManager and the analytics algorithms. Results can be written as JSON and
+compared against a previous run to catch performance regressions.
+
+Usage:
+    python benchmark.py                          # 1/5/10 year users, prints a table
+    python benchmark.py --output bench.json      # also write JSON results
+    python benchmark.py --compare bench.json     # exit 1 if anything got slower
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from health_manager import HealthManager
+from analytics import solve_gauss_jordan, pearson_correlation
+from forecasting import ProgressSeries, WeightForecaster
+
+DEFAULT_YEARS = [1, 5, 10]
+PROGRESS_ENTRIES_PER_YEAR = 1000
+
+# --- SYNTHETIC DATA ---
+
+def make_synthetic_user(years, seed=42):
+    """Builds a user_data dict with `years` of daily history, weigh-ins and logins."""
+    rng = random.Random(seed + years)
+    today = datetime.now()
+    days = years * 365
+
+    history = {}
+    login_dates = []
+    for i in range(days, 0, -1):
+        d = (today - timedelta(days=i)).strftime("%Y-%m-%d")
+        history[d] = {
+            "consumed": rng.randint(1200, 3200),
+            "protein": rng.randint(40, 200),
+            "carbs": rng.randint(80, 400),
+            "fats": rng.randint(20, 120),
+            "steps": rng.randint(0, 18000),
+        }
+        # Roughly one missed login a fortnight keeps the streak logic honest
+        if rng.random() > 0.07:
+            login_dates.append(d)
+
+    progress_log = []
+    entries = years * PROGRESS_ENTRIES_PER_YEAR
+    weight = 85.0
+    for i in range(entries):
+        day = today - timedelta(days=days - int(i * days / entries))
+        weight += rng.uniform(-0.35, 0.3)
+        progress_log.append({
+            "date": day.strftime("%b %d, %Y"),
+            "image": f"progress_{day.strftime('%Y%m%d%H%M%S')}_{i}.jpg",
+            "weight": f"{weight:.1f}",
+        })
+
+    return {
+        "name": f"Bench User {years}y",
+        "location": "Chennai, Tamil Nadu, India",
+        "current_date": today.strftime("%Y-%m-%d"),
+        "history": history,
+        "progress_log": progress_log,
+        "login_dates": login_dates,
+    }
+
+def write_user(data, directory):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "user_data.json")
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+    return path
+
+# --- TIMING ---
+
+def time_op(fn, repeat):
+    """Runs fn once to warm up, then `repeat` times. Returns timings in milliseconds."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "max_ms": round(max(samples), 4),
+    }
+
+def regression_fit(log):
+    """The full trajectory fit the Predictive Analytics panel performs when the log changes."""
+    return WeightForecaster(method="huber").forecast(ProgressSeries(log))
+
+def bench_user(years, repeat, workdir):
+    data = make_synthetic_user(years)
+    # Each case gets its own directory so history stores and meal logs don't carry over
+    path = write_user(data, os.path.join(workdir, f"{years}y"))
+    manager = HealthManager(storage_file=path)
+
+    daily = manager.get_daily_columns()
+    cals, carbs, steps = daily["consumed"], daily["carbs"], daily["steps"]
+    log = manager.get_progress_log()
+    forecaster = WeightForecaster(method="huber")
+
+    # Same shape as the default optimizer inputs in the dashboard
+    A = [[0.31, 0.027, 0.21], [0.0, 0.28, 0.22], [0.036, 0.003, 0.50]]
+    b = [50.0, 60.0, 20.0]
+
+    ops = {
+        "load_data": manager.load_data,
+        "save_data": manager.save_data,
+        "get_weekly_history": manager.get_weekly_history,
+        "get_daily_columns": manager.get_daily_columns,
+        "get_streak_info": manager.get_streak_info,
+        "pearson_correlation": lambda: (pearson_correlation(carbs, steps), pearson_correlation(steps, cals)),
+        "predictive_regression": lambda: regression_fit(log),
+        "predictive_cached": lambda: forecaster.forecast(manager.get_progress_series()),
+        "solve_gauss_jordan": lambda: solve_gauss_jordan(A, b),
+    }
+
+    size = {
+        "history_days": len(manager.history),
+        "progress_entries": len(log),
+        "login_dates": len(manager.data["login_dates"]),
+        "file_bytes": os.path.getsize(path),
+    }
+    results = []
+    for op, fn in ops.items():
+        results.append({"case": f"{years}y", "op": op, **time_op(fn, repeat)})
+    return size, results
+
+def run_suite(years_list, repeat):
+    workdir = tempfile.mkdtemp(prefix="nutri_bench_")
+    try:
+        cases = {}
+        results = []
+        for years in years_list:
+            size, case_results = bench_user(years, repeat, workdir)
+            cases[f"{years}y"] = size
+            results.extend(case_results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "cases": cases,
+        "results": results,
+    }
+
+# --- REPORTING ---
+
+def print_table(report):
+    print(f"{'case':<6} {'operation':<24} {'median ms':>12} {'min ms':>12}")
+    for r in report["results"]:
+        print(f"{r['case']:<6} {r['op']:<24} {r['median_ms']:>12.3f} {r['min_ms']:>12.3f}")
+
+def compare(report, baseline_path, tolerance):
+    """Prints ops whose median slowed down by more than `tolerance`. Returns the regression count."""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    previous = {(r["case"], r["op"]): r for r in baseline.get("results", [])}
+
+    regressions = 0
+    for r in report["results"]:
+        old = previous.get((r["case"], r["op"]))
+        if not old or old["median_ms"] <= 0:
+            continue
+        ratio = r["median_ms"] / old["median_ms"]
+        if ratio > 1 + tolerance:
+            regressions += 1
+            print(f"REGRESSION {r['case']} {r['op']}: {old['median_ms']:.3f} ms -> {r['median_ms']:.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark NUtri-INO hot paths.")
+    parser.add_argument("--years", type=int, nargs="+", default=DEFAULT_YEARS, help="History lengths to generate")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per operation")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Previous JSON results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.years, args.repeat)
+    print_table(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    if args.compare:
+        return 1 if compare(report, args.compare, args.tolerance) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Content-addressed storage for progress photos.
+
+Each photo is stored once, under the SHA-256 of its bytes, in two levels of
+shard directories (ab/cd/abcd….jpg). Re-uploading the same photo reuses the
+existing file, and no directory grows past a few hundred entries. A blob's
+reference count is the number of progress_log entries naming its key. Deleting
+an entry releases the blob once nothing else refers to it, and collect()
+sweeps anything a failed or interrupted step left behind. The sweep also
+re-hashes every live blob and moves corrupt ones to quarantine/.
+
+Blobs touched within the grace period are never removed. This covers an upload
+whose log entry another worker has not written yet.
+"""
+import hashlib
+import logging
+import os
+import re
+import time
+
+import shared_store
+
+log = logging.getLogger("nutri.blob_store")
+
+GRACE_SECONDS = 600
+CHUNK_SIZE = 1 << 20
+_KEY = re.compile(r"^([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})(\.[a-z0-9]{1,5})$")
+_SIGNATURES = (
+    (0, b"\xff\xd8\xff", ".jpg"),
+    (0, b"\x89PNG", ".png"),
+    (0, b"GIF8", ".gif"),
+    (8, b"WEBP", ".webp"),
+    (4, b"ftypheic", ".heic"),
+    (4, b"ftypmif1", ".heic"),
+)
+
+def _extension(data, filename=""):
+    for offset, magic, ext in _SIGNATURES:
+        if data[offset:offset + len(magic)] == magic:
+            return ext
+    ext = os.path.splitext(filename)[1].lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,5}", ext) else ".bin"
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_key(name):
+    return bool(_KEY.match(name or ""))
+
+class BlobStore:
+    def __init__(self, root, grace_seconds=GRACE_SECONDS):
+        self.root = root
+        self.grace_seconds = grace_seconds
+        os.makedirs(root, exist_ok=True)
+        self._gc_lock = shared_store.FileLock(os.path.join(root, ".gc.lock"))
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def _find(self, digest):
+        """The existing key for `digest` under any extension, or None."""
+        shard = os.path.join(self.root, digest[:2], digest[2:4])
+        try:
+            names = os.listdir(shard)
+        except FileNotFoundError:
+            return None
+        for name in names:
+            if name.startswith(digest) and not name.endswith(".tmp"):
+                return f"{digest[:2]}/{digest[2:4]}/{name}"
+        return None
+
+    def put(self, data, filename=""):
+        """Stores `data` unless an identical blob exists. Returns its key, a relative path usable in URLs."""
+        digest = hashlib.sha256(data).hexdigest()
+        key = self._find(digest)
+        if key is not None:
+            try:
+                os.utime(self.path(key))  # Fresh mtime keeps a concurrent sweep's grace period away from it
+                return key
+            except FileNotFoundError:
+                pass  # Swept between the lookup and now; write it again
+        key = f"{digest[:2]}/{digest[2:4]}/{digest}{_extension(data, filename)}"
+        path = self.path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        for attempt in range(2):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                break
+            except FileNotFoundError:
+                if attempt:
+                    raise  # A sweep pruned the empty shard in between; recreate it once
+        os.replace(tmp, path)
+        return key
+
+    def release(self, key):
+        """Removes a blob nothing refers to any more, unless it is still inside the grace period."""
+        if not is_key(key):
+            return False
+        try:
+            if os.stat(self.path(key)).st_mtime > time.time() - self.grace_seconds:
+                return False  # Possibly just re-uploaded elsewhere; the next sweep decides
+            os.remove(self.path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def adopt(self, names):
+        """
+        Copies flat legacy files (paths relative to root) into the store, under the sweep lock. Returns
+        {old: key}; repoint every reference, then call drop_legacy(mapping) to delete the originals.
+        """
+        mapping = {}
+        with self._gc_lock:
+            for name in names:
+                path = os.path.join(self.root, name)
+                if is_key(name) or os.path.dirname(name) or not os.path.isfile(path):
+                    continue
+                with open(path, 'rb') as f:
+                    mapping[name] = self.put(f.read(), name)
+        return mapping
+
+    def drop_legacy(self, mapping):
+        for name in mapping:
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass  # Another worker adopted it too
+
+    def _walk(self):
+        for first in sorted(os.listdir(self.root)):
+            top = os.path.join(self.root, first)
+            if len(first) != 2 or not os.path.isdir(top):
+                continue
+            for second in sorted(os.listdir(top)):
+                shard = os.path.join(top, second)
+                if not os.path.isdir(shard):
+                    continue
+                for name in os.listdir(shard):
+                    yield f"{first}/{second}/{name}", os.path.join(shard, name)
+
+    def collect(self, live, verify=True):
+        """
+        Mark-and-sweep over the store: removes unreferenced blobs and stale temp files past the grace
+        period, re-hashes live blobs when `verify`, and prunes empty shards. `live` is every referenced key.
+        """
+        live = set(live)
+        stats = {"blobs": 0, "bytes": 0, "removed": 0, "freed": 0, "temp": 0, "corrupt": [], "missing": []}
+        with self._gc_lock:
+            cutoff = time.time() - self.grace_seconds
+            present = set()
+            for key, path in self._walk():
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                match = _KEY.match(key)
+                if match is None:
+                    if key.endswith(".tmp") and st.st_mtime < cutoff:
+                        os.remove(path)
+                        stats["temp"] += 1
+                    continue
+                if key not in live:
+                    if st.st_mtime < cutoff:
+                        os.remove(path)
+                        stats["removed"] += 1
+                        stats["freed"] += st.st_size
+                    continue
+                if verify and _file_digest(path) != match.group(3):
+                    quarantine = os.path.join(self.root, "quarantine")
+                    os.makedirs(quarantine, exist_ok=True)
+                    os.replace(path, os.path.join(quarantine, os.path.basename(path)))
+                    stats["corrupt"].append(key)
+                    continue
+                present.add(key)
+                stats["blobs"] += 1
+                stats["bytes"] += st.st_size
+            self._prune_empty()
+            lost = present.union(stats["corrupt"])
+            stats["missing"] = sorted(k for k in live if k not in lost and not os.path.isfile(self.path(k)))
+        if stats["corrupt"] or stats["missing"]:
+            log.warning("blob store integrity: %d corrupt, %d missing", len(stats["corrupt"]), len(stats["missing"]))
+        return stats
+
+    def _prune_empty(self):
+        for first in os.listdir(self.root):
+            top = os.path.join(self.root, first)
+            if len(first) != 2 or not os.path.isdir(top):
+                continue
+            for second in os.listdir(top):
+                try:
+                    os.rmdir(os.path.join(top, second))
+                except OSError:
+                    pass  # Not empty
+            try:
+                os.rmdir(top)
+            except OSError:
+                pass
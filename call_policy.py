@@ -0,0 +1,132 @@
+"""
+Deadlines, retries and a circuit breaker for outbound AI calls.
+
+`run(name, attempt)` calls `attempt(timeout_s)` under the named CallPolicy:
+each attempt gets whatever is left of the overall deadline, transient failures
+(timeouts, connection drops, 408/429/5xx) are retried with full-jitter
+exponential backoff, and every outcome feeds a shared CircuitBreaker. Once the
+breaker trips, calls fail immediately with CircuitOpenError until the cooldown
+ends, so worker threads aren't tied up waiting on a degraded endpoint.
+"""
+import random
+import threading
+import time
+
+import httpx
+
+import metrics
+
+TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """Raised without calling out while the breaker is open."""
+
+class DeadlineExceeded(TimeoutError):
+    """The call's overall deadline ran out before an attempt could succeed."""
+
+class CallPolicy:
+    def __init__(self, deadline_s, max_attempts=3, base_delay_s=0.5, max_delay_s=4.0):
+        self.deadline_s = deadline_s
+        self.max_attempts = max_attempts
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+
+    def backoff(self, attempt, rng=random):
+        """Full jitter: uniform over [0, min(cap, base * 2^attempt)]."""
+        return rng.uniform(0, min(self.max_delay_s, self.base_delay_s * (2 ** attempt)))
+
+# Interactive flows get tight deadlines; image analysis is allowed longer
+POLICIES = {
+    "chat_with_ai": CallPolicy(deadline_s=12, max_attempts=2),
+    "generate_recipe": CallPolicy(deadline_s=20),
+    "generate_recovery_protocol": CallPolicy(deadline_s=25),
+    "analyze_pantry_image": CallPolicy(deadline_s=30),
+    "analyze_food_image": CallPolicy(deadline_s=25),
+    "analyze_food_image_repair": CallPolicy(deadline_s=10, max_attempts=2),
+}
+DEFAULT_POLICY = CallPolicy(deadline_s=20)
+
+def is_transient(error):
+    """Worth retrying: timeouts, dropped connections and retryable HTTP status codes."""
+    if isinstance(error, (TimeoutError, ConnectionError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return code in TRANSIENT_CODES
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive transient failures; one probe is let through after `cooldown_s`."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, cooldown_s=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.cooldown_s:
+                self._set_state(self.HALF_OPEN)
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self._set_state(self.OPEN)
+
+    def remaining_cooldown(self):
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.cooldown_s - (self.clock() - self.opened_at))
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.AI_CIRCUIT_OPEN.set(1 if state == self.OPEN else 0)
+        metrics.trace("circuit", state, 0.0, failures=self.failures)
+
+breaker = CircuitBreaker()
+
+def run(name, attempt, policy=None, sleep=time.sleep):
+    """Calls `attempt(timeout_s)` with retries inside the policy's deadline. Non-transient errors propagate at once."""
+    policy = policy or POLICIES.get(name, DEFAULT_POLICY)
+    if not breaker.allow():
+        metrics.AI_ERRORS.inc(function=name, error="CircuitOpen")
+        raise CircuitOpenError(f"AI service unavailable, retrying in {breaker.remaining_cooldown():.0f}s")
+
+    deadline = time.monotonic() + policy.deadline_s
+    for n in range(policy.max_attempts):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            result = attempt(remaining)
+        except Exception as e:
+            if not is_transient(e):
+                breaker.record_success()  # The service answered; the request itself was bad
+                raise
+            breaker.record_failure()
+            delay = policy.backoff(n)
+            if n + 1 >= policy.max_attempts or not breaker.allow() or time.monotonic() + delay >= deadline:
+                raise
+            metrics.AI_RETRIES.inc(function=name)
+            sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+    raise DeadlineExceeded(f"{name} exceeded its {policy.deadline_s}s deadline")
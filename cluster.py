@@ -0,0 +1,167 @@
+"""
+Multi-process deployment on one box.
+
+Starts N copies of main.py on consecutive private ports behind a small asyncio
+TCP proxy on the public port. NiceGUI keeps each browser's UI state and
+websocket in the process that served its page, so the proxy is sticky: it reads
+the headers of the first request on each connection and sends browsers that
+carry the `nutri_worker` cookie (set by every worker) back to the same worker.
+New visitors go to the worker with the fewest open connections. After the
+headers, bytes are piped both ways untouched, so websockets just work.
+
+The workers share user_data.json, the meal log, jobs.db, the wearable store and
+ai_cache.db through the cross-process locking in shared_store.py.
+
+Usage:
+    python cluster.py --workers 4 --port 8080
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+AFFINITY_COOKIE = "nutri_worker"
+HEADER_LIMIT = 64 * 1024
+RESTART_DELAY_S = 2.0
+
+class Upstream:
+    def __init__(self, index, host, port):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.active = 0
+        self.process = None
+
+def parse_affinity(head):
+    """Worker index from the `nutri_worker` cookie in a raw request head, or None."""
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() != b"cookie":
+            continue
+        for pair in value.split(b";"):
+            key, _, val = pair.strip().partition(b"=")
+            if key == AFFINITY_COOKIE.encode() and val.isdigit():
+                return int(val)
+    return None
+
+async def pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        try:
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError):
+            pass
+
+class StickyProxy:
+    def __init__(self, upstreams):
+        self.upstreams = upstreams
+        self._turn = 0
+
+    def candidates(self, head):
+        """Upstreams to try in order: the cookie's worker first, then the least busy (round robin on ties)."""
+        n = len(self.upstreams)
+        self._turn = (self._turn + 1) % n
+        ordered = sorted(self.upstreams, key=lambda u: (u.active, (u.index - self._turn) % n))
+        index = parse_affinity(head)
+        if index is not None and 0 <= index < len(self.upstreams):
+            preferred = self.upstreams[index]
+            ordered.remove(preferred)
+            ordered.insert(0, preferred)
+        return ordered
+
+    async def handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        for upstream in self.candidates(head):
+            try:
+                up_reader, up_writer = await asyncio.open_connection(upstream.host, upstream.port, limit=HEADER_LIMIT)
+                break
+            except OSError:
+                continue  # Worker restarting; fall through to the next one
+        else:
+            writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            writer.close()
+            return
+
+        upstream.active += 1
+        try:
+            up_writer.write(head)
+            await asyncio.gather(pipe(reader, up_writer), pipe(up_reader, writer))
+        finally:
+            upstream.active -= 1
+            up_writer.close()
+            writer.close()
+
+def spawn(upstream, script):
+    env = {**os.environ, "NUTRI_PORT": str(upstream.port), "NUTRI_WORKER": str(upstream.index)}
+    upstream.process = subprocess.Popen([sys.executable, script], env=env)
+    print(f"worker {upstream.index} pid {upstream.process.pid} on {upstream.host}:{upstream.port}")
+
+async def supervise(upstreams, script):
+    """Restarts any worker that exits."""
+    while True:
+        await asyncio.sleep(RESTART_DELAY_S)
+        for upstream in upstreams:
+            if upstream.process.poll() is not None:
+                print(f"worker {upstream.index} exited with {upstream.process.returncode}; restarting")
+                spawn(upstream, script)
+
+async def serve(args):
+    upstreams = [Upstream(i, "127.0.0.1", args.worker_base_port + i) for i in range(args.workers)]
+    for upstream in upstreams:
+        spawn(upstream, args.app)
+    proxy = StickyProxy(upstreams)
+    server = await asyncio.start_server(proxy.handle, args.host, args.port, limit=HEADER_LIMIT)
+    print(f"NUtri-INO cluster: {args.workers} workers behind http://{args.host}:{args.port}")
+    main_task = asyncio.current_task()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, main_task.cancel)
+    except (NotImplementedError, AttributeError):
+        pass  # Windows: Ctrl+C still stops the cluster cleanly
+    try:
+        async with server:
+            await asyncio.gather(server.serve_forever(), supervise(upstreams, args.app))
+    except asyncio.CancelledError:
+        pass
+    finally:
+        for upstream in upstreams:
+            upstream.process.terminate()
+        deadline = time.monotonic() + 10
+        for upstream in upstreams:
+            try:
+                upstream.process.wait(timeout=max(0.1, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                upstream.process.kill()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several NUtri-INO workers behind a sticky local proxy.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--worker-base-port", type=int, default=8101, help="Worker i listens on base + i")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"))
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Population benchmarks: "you vs. users with the same goal".
+
+A nightly batch job reads the archived daily history of every stored profile,
+in chunks of profiles at a time. Each chunk becomes a (profiles x days) int32
+matrix per metric, copied straight out of the memory-mapped columns. Logged
+days are bucketed and counted per goal with one bincount, with no Python loop
+over days. The result is one small, mergeable histogram per (goal, metric),
+saved to cohorts.json together with its cumulative counts and a few
+percentiles. The dashboard answers "which percentile is this value?" with an
+index into that table and never touches other users' files.
+
+Goals with fewer than MIN_COHORT_USERS users are left out, so no single
+person's numbers can be read back from the table.
+
+    python cohorts.py build [--root DIR] [--out cohorts.json]
+    python cohorts.py show
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+from datetime import date
+
+import numpy as np
+
+import shared_store
+from history_store import HistoryStore
+
+log = logging.getLogger("nutri.cohorts")
+
+PROFILE_ROOT = os.environ.get("NUTRI_PROFILE_ROOT", ".")
+COHORTS_PATH = os.environ.get("NUTRI_COHORTS", "cohorts.json")
+WINDOW_DAYS = 90
+CHUNK_PROFILES = 512
+MIN_COHORT_USERS = 5
+# metric: (first bucket edge, bucket width, bucket count); larger values land in the last bucket
+BUCKETS = {"consumed": (0, 50, 120), "protein": (0, 5, 80), "steps": (0, 500, 80)}
+PERCENTILES = (10, 25, 50, 75, 90)
+
+def find_profiles(root=PROFILE_ROOT):
+    """(profile json, history directory) for every profile in `root` or one directory below it."""
+    for pattern in ("*_history", os.path.join("*", "*_history")):
+        for meta in sorted(glob.glob(os.path.join(root, pattern, "meta.json"))):
+            directory = os.path.dirname(meta)
+            profile = directory[:-len("_history")] + ".json"
+            if os.path.isfile(profile):
+                yield profile, directory
+
+def _goal(profile):
+    try:
+        with open(profile, 'r') as f:
+            return json.load(f).get("goal") or None
+    except (OSError, ValueError):
+        return None
+
+def _load_chunk(chunk, start, window):
+    """Reads the window of each profile into one (profiles x window) matrix per metric, zero where nothing is stored."""
+    block = {m: np.zeros((len(chunk), window), dtype=np.int32) for m in BUCKETS}
+    for row, (_, directory) in enumerate(chunk):
+        store = HistoryStore(directory)
+        if store.base_ordinal is None:
+            continue
+        lo = max(start, store.base_ordinal)
+        hi = min(start + window, store.base_ordinal + store.days)
+        if lo >= hi:
+            continue
+        for m in BUCKETS:
+            column = np.frombuffer(store.columns[m], dtype=np.int32)
+            block[m][row, lo - start:hi - start] = column[lo - store.base_ordinal:hi - store.base_ordinal]
+    return block
+
+def _percentile_values(counts, first, width):
+    cdf = np.cumsum(counts)
+    total = int(cdf[-1])
+    out = {}
+    for p in PERCENTILES:
+        target = total * p / 100
+        i = int(np.searchsorted(cdf, target))
+        below = cdf[i - 1] if i else 0
+        frac = (target - below) / counts[i] if counts[i] else 0.0
+        out[str(p)] = round(first + width * (i + frac))
+    return out
+
+def build(root=PROFILE_ROOT, end_ordinal=None, window_days=WINDOW_DAYS, min_users=MIN_COHORT_USERS, chunk_size=CHUNK_PROFILES):
+    """Aggregates the `window_days` archived days before `end_ordinal` (default today) into the cohort table."""
+    end_ordinal = end_ordinal or date.today().toordinal()
+    start = end_ordinal - window_days
+    goals, goal_index = [], {}
+    counts = {m: np.zeros((0, BUCKETS[m][2]), dtype=np.int64) for m in BUCKETS}
+    users = np.zeros(0, dtype=np.int64)
+    profiles = [p for p in find_profiles(root)]
+    for offset in range(0, len(profiles), chunk_size):
+        chunk = profiles[offset:offset + chunk_size]
+        ids = np.array([goal_index.setdefault(_goal(profile), len(goal_index)) for profile, _ in chunk], dtype=np.int64)
+        goals = list(goal_index)
+        block = _load_chunk(chunk, start, window_days)
+        logged = block["consumed"] > 0  # A day counts once something was eaten on it
+        users = np.pad(users, (0, len(goals) - len(users)))
+        users += np.bincount(ids[logged.any(axis=1)], minlength=len(goals))
+        for m, (first, width, n) in BUCKETS.items():
+            mask = logged & (block[m] > 0)
+            buckets = np.clip((block[m] - first) // width, 0, n - 1)
+            flat = (ids[:, None] * n + buckets)[mask]
+            counts[m] = np.pad(counts[m], ((0, len(goals) - len(counts[m])), (0, 0)))
+            counts[m] += np.bincount(flat, minlength=len(goals) * n).reshape(len(goals), n)
+
+    table = {"generated": date.fromordinal(end_ordinal).isoformat(), "window_days": window_days,
+             "profiles": len(profiles), "buckets": {m: list(b) for m, b in BUCKETS.items()}, "goals": {}}
+    for i, goal in enumerate(goals):
+        if goal is None or users[i] < min_users:
+            continue
+        entry = {"users": int(users[i]), "metrics": {}}
+        for m, (first, width, _) in BUCKETS.items():
+            if counts[m][i].sum():
+                entry["metrics"][m] = {"days": int(counts[m][i].sum()), "cdf": np.cumsum(counts[m][i]).tolist(),
+                                       "p": _percentile_values(counts[m][i], first, width)}
+        table["goals"][goal] = entry
+    return table
+
+def refresh(root=PROFILE_ROOT, path=COHORTS_PATH, end_ordinal=None):
+    """Rebuilds the table unless it is already from today. Safe to call from every worker. Returns True if it rebuilt."""
+    end_ordinal = end_ordinal or date.today().toordinal()
+    with shared_store.FileLock(path + ".lock"):
+        try:
+            with open(path, 'r') as f:
+                if json.load(f).get("generated") == date.fromordinal(end_ordinal).isoformat():
+                    return False
+        except (OSError, ValueError):
+            pass
+        table = build(root, end_ordinal)
+        shared_store.atomic_write_json(path, table, separators=(",", ":"))
+    log.info("cohort table rebuilt from %d profiles", table["profiles"])
+    return True
+
+class CohortTable:
+    """Read side for the dashboard: reloads cohorts.json when it changes, then every lookup is O(1)."""
+
+    def __init__(self, path=COHORTS_PATH):
+        self.path = path
+        self.data = None
+        self._stamp = None
+
+    def _current(self):
+        stamp = shared_store.file_stamp(self.path)
+        if stamp != self._stamp:
+            self._stamp = stamp
+            try:
+                with open(self.path, 'r') as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                self.data = None
+        return self.data
+
+    def percentile(self, goal, metric, value):
+        """Share (0-100) of `goal` users' logged days at or below `value`, or None without a cohort."""
+        data = self._current()
+        entry = ((data or {}).get("goals", {}).get(goal) or {}).get("metrics", {}).get(metric)
+        if not entry or value is None:
+            return None
+        first, width, n = data["buckets"][metric]
+        cdf = entry["cdf"]
+        pos = (value - first) / width
+        i = min(max(int(pos), 0), n - 1)
+        below = cdf[i - 1] if i else 0
+        within = min(max(pos - i, 0.0), 1.0)
+        return round(100 * (below + within * (cdf[i] - below)) / cdf[-1])
+
+    def compare(self, goal, values):
+        """{metric: percentile} for whichever of `values` has a cohort; empty when there is none."""
+        out = {}
+        for metric, value in (values or {}).items():
+            pct = self.percentile(goal, metric, value)
+            if pct is not None:
+                out[metric] = pct
+        return out
+
+    def cohort_size(self, goal):
+        return ((self._current() or {}).get("goals", {}).get(goal) or {}).get("users", 0)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the goal cohort benchmark table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    make = sub.add_parser("build", help="Aggregate every profile's history now")
+    make.add_argument("--root", default=PROFILE_ROOT)
+    make.add_argument("--out", default=COHORTS_PATH)
+    make.add_argument("--window", type=int, default=WINDOW_DAYS)
+    show = sub.add_parser("show", help="Print the percentiles in the current table")
+    show.add_argument("--path", default=COHORTS_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        table = build(args.root, window_days=args.window)
+        shared_store.atomic_write_json(args.out, table, separators=(",", ":"))
+        print(f"{table['profiles']} profiles, {len(table['goals'])} goal cohorts -> {args.out}")
+    else:
+        data = CohortTable(args.path)._current()
+        if not data:
+            print("No cohort table yet")
+            return 1
+        for goal, entry in data["goals"].items():
+            print(f"{goal} ({entry['users']} users)")
+            for metric, stats in entry["metrics"].items():
+                print(f"  {metric:<9} " + "  ".join(f"p{p}={v}" for p, v in stats["p"].items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Process pool for CPU-heavy analytics and image work.
+
+`ComputePool.run(func, *args, size=n)` runs small inputs inline on the caller
+and ships anything with `size` above `inline_max` to a warm ProcessPoolExecutor,
+so one user's ten-year correlation matrix or trend fit never holds the GIL
+while other sessions are clicking. Tasks must be picklable module-level
+functions (see analytics.py, forecasting.py, imaging.py). Passing a `key`
+supersedes any still-queued task with the same key, e.g. when a panel is
+refreshed again before its previous computation started.
+
+Workers use the spawn start method everywhere. Spawned children normally
+re-import the parent's __main__, and main.py builds the whole UI at import, so
+the parent's main module is hidden while worker processes are started. The
+frozen (PyInstaller) build relaunches its own executable instead, which is why
+main.py calls multiprocessing.freeze_support() before anything else.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import metrics
+
+log = logging.getLogger("nutri.compute")
+
+INLINE_MAX = 2000  # Data points below which IPC costs more than it saves
+
+def _warm_up():
+    """Runs once per worker: pays the import cost up front, not on the first real task."""
+    import analytics, forecasting, imaging, food_classifier  # noqa: F401
+    food_classifier.warm()
+    return os.getpid()
+
+_main_lock = threading.Lock()
+
+@contextmanager
+def _hidden_main():
+    main = sys.modules.get("__main__")
+    if main is None:
+        yield
+        return
+    with _main_lock:
+        path, spec = main.__dict__.pop("__file__", None), getattr(main, "__spec__", None)
+        main.__spec__ = None
+        try:
+            yield
+        finally:
+            if path is not None:
+                main.__file__ = path
+            main.__spec__ = spec
+
+class ComputePool:
+    def __init__(self, workers=None, inline_max=INLINE_MAX):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.inline_max = inline_max
+        self._executor = None
+        self._pending = {}
+
+    def _create(self):
+        with _hidden_main():
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            # One warm-up per worker makes the executor start all of them now
+            warmups = [self._executor.submit(_warm_up) for _ in range(self.workers)]
+        return warmups
+
+    async def start(self):
+        """Startup hook: spawns and warms every worker in the background."""
+        warmups = self._create()
+        pids = await asyncio.gather(*(asyncio.wrap_future(f) for f in warmups), return_exceptions=True)
+        log.info("compute pool warm: %s", [p for p in pids if isinstance(p, int)])
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def cancel(self, key):
+        """Cancels the queued task for `key`. A task already running in a worker is left to finish."""
+        future = self._pending.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    async def run(self, func, *args, size=0, key=None, timeout=None):
+        name = getattr(func, "__name__", "task")
+        start = time.perf_counter()
+        if size <= self.inline_max or self._executor is None:
+            route = "inline"
+            result = func(*args)
+        else:
+            route = "pool"
+            result = await self._offload(func, args, key, timeout)
+        elapsed = time.perf_counter() - start
+        metrics.COMPUTE_SECONDS.observe(elapsed, task=name, route=route)
+        metrics.trace("compute", name, elapsed, route=route, size=size)
+        return result
+
+    async def _offload(self, func, args, key, timeout):
+        if key is not None:
+            self.cancel(key)
+        try:
+            with _hidden_main():
+                future = self._executor.submit(func, *args)
+        except BrokenProcessPool:
+            log.warning("compute pool broken; restarting it")
+            self._create()
+            return await asyncio.to_thread(func, *args)
+        if key is not None:
+            self._pending[key] = future
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except BrokenProcessPool:
+            # A worker died mid-task; rebuild the pool and finish this one off the event loop
+            log.warning("compute worker died running %s; restarting the pool", getattr(func, "__name__", func))
+            self._create()
+            return await asyncio.to_thread(func, *args)
+        finally:
+            if key is not None and self._pending.get(key) is future:
+                del self._pending[key]
@@ -0,0 +1,191 @@
+"""
+On-device food recognition, tried before Gemini.
+
+If an ONNX image classifier is installed (NUTRI_FOOD_MODEL, default
+models/food_classifier.onnx, with one label per line in the matching
+.labels.txt), scans are first run through it on the CPU. Inference happens in
+the compute pool's worker processes, where every worker keeps its own warm
+session. Concurrent scans are collected for a few milliseconds and sent as a
+single batch. A confident prediction for a label in food_nutrition.csv is
+answered locally with that table's typical serving. Anything else, or any
+setup without onnxruntime, numpy, Pillow or a model file, goes on to Gemini
+exactly as before.
+"""
+import asyncio
+import csv
+import logging
+import os
+import time
+
+import metrics
+
+try:
+    import numpy as np
+    import onnxruntime as ort
+except ImportError:  # Optional: without it every scan goes to Gemini
+    ort = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+log = logging.getLogger("nutri.food_classifier")
+
+MODEL_PATH = os.environ.get("NUTRI_FOOD_MODEL", os.path.join("models", "food_classifier.onnx"))
+NUTRITION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "food_nutrition.csv")
+CONFIDENCE_THRESHOLD = float(os.environ.get("NUTRI_FOOD_CONFIDENCE", "0.85"))
+MAX_BATCH = 16
+BATCH_WINDOW_S = 0.01
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+def available(model_path=MODEL_PATH):
+    return ort is not None and Image is not None and os.path.exists(model_path)
+
+def labels_path(model_path):
+    return os.path.splitext(model_path)[0] + ".labels.txt"
+
+# --- WORKER SIDE ---
+# Everything below runs inside compute-pool processes, one session per process.
+
+_sessions = {}
+
+def _session(model_path):
+    if model_path not in _sessions:
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = 1  # Parallelism comes from the pool's processes
+        session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        with open(labels_path(model_path), 'r', encoding='utf-8') as f:
+            labels = [line.strip() for line in f if line.strip()]
+        spec = session.get_inputs()[0]
+        channels_first = spec.shape[1] == 3
+        side = spec.shape[2] if channels_first else spec.shape[1]
+        fixed_batch = spec.shape[0] == 1
+        _sessions[model_path] = (session, labels, spec.name, channels_first, side if isinstance(side, int) else 224, fixed_batch)
+    return _sessions[model_path]
+
+def warm(model_path=MODEL_PATH):
+    """Compute-pool warm-up hook: loads the model so the first scan doesn't pay for it."""
+    if available(model_path):
+        _session(model_path)
+
+def _preprocess(image_bytes, side, channels_first):
+    import io
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert("RGB")
+        # Resize the short side, then centre-crop to a square
+        scale = side / min(img.size)
+        img = img.resize((max(side, round(img.width * scale)), max(side, round(img.height * scale))), Image.BILINEAR)
+        left, top = (img.width - side) // 2, (img.height - side) // 2
+        img = img.crop((left, top, left + side, top + side))
+        pixels = (np.asarray(img, dtype=np.float32) / 255.0 - IMAGENET_MEAN) / IMAGENET_STD
+    return pixels.transpose(2, 0, 1) if channels_first else pixels
+
+def _probabilities(logits):
+    if np.all(logits >= 0) and abs(float(logits.sum()) - 1.0) < 1e-3:
+        return logits  # The model already ends in a softmax
+    shifted = np.exp(logits - logits.max())
+    return shifted / shifted.sum()
+
+def classify_batch(images, model_path=MODEL_PATH):
+    """One forward pass for a list of image bytes. Returns [(label, confidence)], or None for undecodable images."""
+    session, labels, input_name, channels_first, side, fixed_batch = _session(model_path)
+    results = [None] * len(images)
+    tensors, slots = [], []
+    for i, image_bytes in enumerate(images):
+        try:
+            tensors.append(_preprocess(image_bytes, side, channels_first).astype(np.float32))
+            slots.append(i)
+        except Exception:
+            continue
+    if not tensors:
+        return results
+    if fixed_batch:
+        outputs = [session.run(None, {input_name: t[None]})[0][0] for t in tensors]
+    else:
+        outputs = session.run(None, {input_name: np.stack(tensors)})[0]
+    for slot, logits in zip(slots, outputs):
+        probs = _probabilities(np.asarray(logits, dtype=np.float64).ravel())
+        best = int(probs.argmax())
+        results[slot] = (labels[best] if best < len(labels) else str(best), float(probs[best]))
+    return results
+
+# --- WEB-PROCESS SIDE ---
+
+def load_nutrition(path=NUTRITION_PATH):
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        return {row["label"]: row for row in csv.DictReader(f)}
+
+class FoodClassifier:
+    """Micro-batches scans from all sessions into classify_batch calls on `run` (the compute pool)."""
+
+    def __init__(self, run, model_path=MODEL_PATH, threshold=CONFIDENCE_THRESHOLD, max_batch=MAX_BATCH, window_s=BATCH_WINDOW_S):
+        self.run = run
+        self.model_path = model_path
+        self.threshold = threshold
+        self.max_batch = max_batch
+        self.window_s = window_s
+        self.available = available(model_path)
+        self.nutrition = load_nutrition() if self.available else {}
+        self._queue = []
+        self._timer = None
+        self._tasks = set()
+
+    async def classify(self, image_bytes):
+        """(label, confidence) for one image, or None."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((image_bytes, future))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window_s, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch):
+        images = [image for image, _ in batch]
+        try:
+            results = await self.run(classify_batch, images, self.model_path, size=sum(map(len, images)))
+        except Exception as ex:
+            # A broken model must never break scanning; everything escalates to Gemini instead
+            log.warning("local food classifier failed: %s", ex)
+            results = [None] * len(batch)
+        metrics.FOOD_CLASSIFIER_BATCH.observe(len(batch))
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def recognize(self, image_bytes):
+        """A scan result shaped like ai_engine's FoodScan when the local model is sure, else None (ask Gemini)."""
+        if not self.available:
+            return None
+        start = time.perf_counter()
+        prediction = await self.classify(image_bytes)
+        metrics.FOOD_CLASSIFIER_LATENCY.observe(time.perf_counter() - start)
+        if prediction is None:
+            metrics.FOOD_SCANS.inc(tier="gemini", reason="undecodable")
+            return None
+        label, confidence = prediction
+        food = self.nutrition.get(label)
+        if food is None or confidence < self.threshold:
+            metrics.FOOD_SCANS.inc(tier="gemini", reason="unknown_label" if food is None else "low_confidence")
+            return None
+        metrics.FOOD_SCANS.inc(tier="local", reason="")
+        return {
+            "name": food["name"],
+            "calories": int(food["calories"]),
+            "protein": int(food["protein"]),
+            "carbs": int(food["carbs"]),
+            "fats": int(food["fats"]),
+            "advice": f"Recognised on-device ({confidence:.0%} sure). Values are for a typical serving: {food['serving']}.",
+        }
@@ -0,0 +1,193 @@
+"""
+Weight-trend forecasting.
+
+Progress entries are converted once into typed arrays of (day ordinal, weight).
+On top of that the forecaster offers an exponentially weighted moving average
+for the smoothed history, Theil-Sen and Huber robust regression for the trend,
+and prediction intervals for the projection. Fits are memoized on the progress
+log's revision, so re-rendering the panel costs nothing until the log changes.
+"""
+import math
+import random
+from array import array
+from datetime import date, datetime
+
+DATE_FORMAT = "%b %d, %Y"
+THEIL_SEN_MAX_PAIRS = 20000
+HUBER_K = 1.345
+
+# Two-sided 95% Student t quantiles for small samples; 1.96 beyond the table
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+        10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042}
+
+def _t_quantile(df):
+    if df <= 0:
+        return float("inf")
+    for limit in sorted(T_95):
+        if df <= limit:
+            return T_95[limit]
+    return 1.96
+
+def _median(values):
+    ordered = sorted(values)
+    n = len(ordered)
+    if n == 0:
+        return 0.0
+    mid = n // 2
+    return ordered[mid] if n % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+class ProgressSeries:
+    """Date-sorted weigh-ins as parallel arrays of day ordinals and weights."""
+
+    def __init__(self, log, revision=0):
+        points = []
+        for entry in log:
+            try:
+                points.append((datetime.strptime(entry["date"], DATE_FORMAT).toordinal(), float(entry["weight"])))
+            except (ValueError, TypeError, KeyError):
+                continue
+        points.sort(key=lambda p: p[0])
+        self.days = array('l', (p[0] for p in points))
+        self.weights = array('d', (p[1] for p in points))
+        self.revision = revision
+
+    def __len__(self):
+        return len(self.days)
+
+# --- ESTIMATORS ---
+
+def ewma(values, alpha=0.3):
+    """Exponentially weighted moving average; alpha closer to 1 follows the raw weigh-ins more tightly."""
+    out = array('d')
+    level = None
+    for v in values:
+        level = v if level is None else alpha * v + (1 - alpha) * level
+        out.append(level)
+    return out
+
+def ols(xs, ys, weights=None):
+    """(Weighted) least squares. Returns (slope, intercept)."""
+    if weights is None:
+        weights = [1.0] * len(xs)
+    sw = sum(weights)
+    if sw == 0:
+        return 0.0, 0.0
+    mx = sum(w * x for w, x in zip(weights, xs)) / sw
+    my = sum(w * y for w, y in zip(weights, ys)) / sw
+    sxx = sum(w * (x - mx) ** 2 for w, x in zip(weights, xs))
+    sxy = sum(w * (x - mx) * (y - my) for w, x, y in zip(weights, xs, ys))
+    slope = sxy / sxx if sxx else 0.0
+    return slope, my - slope * mx
+
+def theil_sen(xs, ys, seed=0):
+    """Median of pairwise slopes. Large logs use a fixed random sample of pairs to stay fast."""
+    n = len(xs)
+    pairs = n * (n - 1) // 2
+    slopes = []
+    if pairs <= THEIL_SEN_MAX_PAIRS:
+        for i in range(n):
+            for j in range(i + 1, n):
+                if xs[j] != xs[i]:
+                    slopes.append((ys[j] - ys[i]) / (xs[j] - xs[i]))
+    else:
+        rng = random.Random(seed)
+        for _ in range(THEIL_SEN_MAX_PAIRS):
+            i, j = rng.randrange(n), rng.randrange(n)
+            if xs[j] != xs[i]:
+                slopes.append((ys[j] - ys[i]) / (xs[j] - xs[i]))
+    slope = _median(slopes) if slopes else 0.0
+    intercept = _median([y - slope * x for x, y in zip(xs, ys)])
+    return slope, intercept
+
+def huber(xs, ys, k=HUBER_K, iterations=20, tol=1e-7):
+    """Huber M-estimator via iteratively reweighted least squares, scale from the MAD of residuals."""
+    slope, intercept = ols(xs, ys)
+    for _ in range(iterations):
+        residuals = [y - (slope * x + intercept) for x, y in zip(xs, ys)]
+        scale = 1.4826 * _median([abs(r) for r in residuals])
+        if scale == 0:
+            break
+        weights = [1.0 if abs(r) <= k * scale else k * scale / abs(r) for r in residuals]
+        new_slope, new_intercept = ols(xs, ys, weights)
+        converged = abs(new_slope - slope) < tol and abs(new_intercept - intercept) < tol
+        slope, intercept = new_slope, new_intercept
+        if converged:
+            break
+    return slope, intercept
+
+ESTIMATORS = {"ols": ols, "theil_sen": theil_sen, "huber": huber}
+
+def prediction_bands(xs, ys, slope, intercept, targets):
+    """Half-widths of the 95% prediction interval around the fitted line at each x in `targets`."""
+    n = len(xs)
+    if n < 3:
+        return [0.0] * len(targets)
+    residuals = [y - (slope * x + intercept) for x, y in zip(xs, ys)]
+    s = math.sqrt(sum(r * r for r in residuals) / (n - 2))
+    mx = sum(xs) / n
+    sxx = sum((x - mx) ** 2 for x in xs) or 1.0
+    t = _t_quantile(n - 2)
+    return [t * s * math.sqrt(1 + 1 / n + (x0 - mx) ** 2 / sxx) for x0 in targets]
+
+# --- FORECASTER ---
+
+class WeightForecaster:
+    """Fits the trend for a ProgressSeries and memoizes the chart-ready result per series revision."""
+
+    def __init__(self, method="huber", horizon_days=30, step_days=5, alpha=0.3):
+        self.method = method
+        self.horizon_days = horizon_days
+        self.step_days = step_days
+        self.alpha = alpha
+        self._cache_key = None
+        self._cache_value = None
+
+    def _key(self, series):
+        return (series.revision, len(series), self.method)
+
+    def forecast(self, series):
+        key = self._key(series)
+        if key != self._cache_key:
+            self._cache_value = fit_trend(series, self.method, self.horizon_days, self.step_days, self.alpha)
+            self._cache_key = key
+        return self._cache_value
+
+    async def forecast_async(self, series, run):
+        """Like forecast(), but a refit goes through `run(func, *args)`, e.g. the compute pool."""
+        key = self._key(series)
+        if key != self._cache_key:
+            self._cache_value = await run(fit_trend, series, self.method, self.horizon_days, self.step_days, self.alpha)
+            self._cache_key = key
+        return self._cache_value
+
+def fit_trend(series, method="huber", horizon_days=30, step_days=5, alpha=0.3):
+    """Chart-ready trend fit for a ProgressSeries. Module level so it can run in a worker process."""
+    if len(series) < 2:
+        return None
+    start = series.days[0]
+    xs = [d - start for d in series.days]
+    ys = list(series.weights)
+    slope, intercept = ESTIMATORS[method](xs, ys)
+
+    label = lambda x: date.fromordinal(start + x).strftime("%b %d")
+    smoothed = ewma(ys, alpha)
+    last_x = xs[-1]
+    future = list(range(last_x, last_x + horizon_days, step_days))
+    projected = []
+    for future_x, band in zip(future, prediction_bands(xs, ys, slope, intercept, future)):
+        # The robust slope carried on from the smoothed history's last value, so the chart's lines meet
+        centre = smoothed[-1] + slope * (future_x - last_x)
+        projected.append((label(future_x), round(centre, 1), round(centre - band, 1), round(centre + band, 1)))
+
+    return {
+        "method": method,
+        "slope": slope,
+        "intercept": intercept,
+        "dates": [label(x) for x in xs],
+        "smoothed": [round(v, 1) for v in smoothed],
+        "fitted": [round(slope * x + intercept, 1) for x in xs],
+        "projected_dates": [p[0] for p in projected],
+        "projected": [p[1] for p in projected],
+        "lower": [p[2] for p in projected],
+        "upper": [p[3] for p in projected],
+    }
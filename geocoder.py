@@ -0,0 +1,175 @@
+"""
+Offline reverse geocoding.
+
+Resolves a latitude/longitude to "City, Region, Country" from the bundled
+gazetteer.tsv, so location auto-detect needs no third-party service. Points are
+stored as unit vectors in flat arrays and indexed by an implicit k-d tree; the
+nearest city by straight-line chord is also the nearest by great-circle
+distance, and there is no special case at the poles or the antimeridian. The
+index is built on first use, and recent lookups are kept in an LRU cache.
+
+The bundled file covers major cities only, so a point more than MAX_DISTANCE_KM
+from all of them is reported as unknown rather than snapped to a far-away city.
+For full coverage, build one at deploy time from the GeoNames dumps
+(cities15000.txt, admin1CodesASCII.txt, countryInfo.txt, licensed CC BY 4.0;
+the attribution is written into the generated file):
+
+    python geocoder.py build cities15000.txt admin1CodesASCII.txt countryInfo.txt
+"""
+import argparse
+import math
+import os
+import sys
+import threading
+from array import array
+from functools import lru_cache
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.tsv")
+EARTH_RADIUS_KM = 6371.0
+MAX_DISTANCE_KM = 50   # Farther than this from any known city counts as "unknown"
+CACHE_SIZE = 4096
+CACHE_DECIMALS = 3     # ~100 m; nearby fixes share a cache entry
+GEONAMES_ATTRIBUTION = "# Data from GeoNames (https://www.geonames.org/), licensed under CC BY 4.0\n"
+
+def _unit(lat, lon):
+    phi, lam = math.radians(lat), math.radians(lon)
+    return math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)
+
+class Gazetteer:
+    def __init__(self, path=GAZETTEER_PATH):
+        self.names = []
+        coords = ([], [], [])
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith("#") or not line.strip():
+                    continue
+                name, region, country, lat, lon = line.rstrip("\n").split("\t")[:5]
+                self.names.append((name, region, country))
+                for axis, value in zip(coords, _unit(float(lat), float(lon))):
+                    axis.append(value)
+        self.axes = tuple(array('d', axis) for axis in coords)
+        self.order = array('i', range(len(self.names)))
+        self._build(0, len(self.order), 0)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _build(self, lo, hi, depth):
+        """Sorts order[lo:hi] so its middle element splits the rest on one axis, recursively."""
+        if hi - lo < 2:
+            return
+        values = self.axes[depth % 3]
+        self.order[lo:hi] = array('i', sorted(self.order[lo:hi], key=values.__getitem__))
+        mid = (lo + hi) // 2
+        self._build(lo, mid, depth + 1)
+        self._build(mid + 1, hi, depth + 1)
+
+    def nearest(self, lat, lon):
+        """(index, chord distance²) of the closest entry."""
+        q = _unit(lat, lon)
+        best = [-1, float("inf")]
+        xs, ys, zs = self.axes
+
+        def search(lo, hi, depth):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            i = self.order[mid]
+            d2 = (xs[i] - q[0]) ** 2 + (ys[i] - q[1]) ** 2 + (zs[i] - q[2]) ** 2
+            if d2 < best[1]:
+                best[0], best[1] = i, d2
+            diff = q[depth % 3] - self.axes[depth % 3][i]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            search(*near, depth + 1)
+            if diff * diff < best[1]:
+                search(*far, depth + 1)
+
+        search(0, len(self.order), 0)
+        return best[0], best[1]
+
+_gazetteer = None
+_load_lock = threading.Lock()
+
+def gazetteer():
+    """The shared index, loaded on first use."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _load_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+    return _gazetteer
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _reverse(lat, lon):
+    index, d2 = gazetteer().nearest(lat, lon)
+    if index < 0:
+        return None
+    km = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(d2) / 2))
+    if km > MAX_DISTANCE_KM:
+        return None
+    city, region, country = gazetteer().names[index]
+    # Skip the region when it only repeats the city ("Tokyo, Tokyo, Japan")
+    parts = [city] + ([region] if region and region != city else []) + [country]
+    return {"city": city, "region": region, "country": country, "km": round(km, 1), "label": ", ".join(filter(bool, parts))}
+
+def reverse(lat, lon):
+    """Nearest known city to a coordinate as a dict with a ready-made "label", or None if nothing is close."""
+    lat, lon = float(lat), float(lon)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("Coordinates out of range")
+    return _reverse(round(lat, CACHE_DECIMALS), round(lon, CACHE_DECIMALS))
+
+# --- BUILDING FROM GEONAMES ---
+
+def build(cities_path, admin1_path, countries_path, out_path=GAZETTEER_PATH, min_population=15000):
+    """Writes a gazetteer.tsv from GeoNames dumps. Returns the number of places written."""
+    regions = {}
+    with open(admin1_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            code, name = line.split("\t")[:2]
+            regions[code] = name
+    countries = {}
+    with open(countries_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            cols = line.split("\t")
+            countries[cols[0]] = cols[4]
+    count = 0
+    with open(cities_path, 'r', encoding='utf-8') as src, open(out_path + ".tmp", 'w', encoding='utf-8') as out:
+        out.write(GEONAMES_ATTRIBUTION)
+        out.write("# name\tregion\tcountry\tlat\tlon\n")
+        for line in src:
+            cols = line.split("\t")
+            if int(cols[14] or 0) < min_population:
+                continue
+            country = cols[8]
+            region = regions.get(f"{country}.{cols[10]}", "")
+            out.write(f"{cols[1]}\t{region}\t{countries.get(country, country)}\t{float(cols[4]):.4f}\t{float(cols[5]):.4f}\n")
+            count += 1
+    os.replace(out_path + ".tmp", out_path)
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline reverse geocoder.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    lookup = sub.add_parser("lookup", help="Resolve a coordinate")
+    lookup.add_argument("lat", type=float)
+    lookup.add_argument("lon", type=float)
+    make = sub.add_parser("build", help="Rebuild gazetteer.tsv from GeoNames dumps")
+    make.add_argument("cities")
+    make.add_argument("admin1")
+    make.add_argument("countries")
+    make.add_argument("--min-population", type=int, default=15000)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build(args.cities, args.admin1, args.countries, min_population=args.min_population)
+        print(f"Wrote {count} places to {GAZETTEER_PATH}")
+    else:
+        place = reverse(args.lat, args.lon)
+        print(place["label"] if place else "No known city nearby")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
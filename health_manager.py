@@ -1,11 +1,47 @@
 import json
+import math
+from array import array
 import os
-import random
-from datetime import datetime, timedelta
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import metrics
+from meal_log import MealLog
+from forecasting import ProgressSeries
+import shared_store
+from history_store import HistoryStore, METRICS, day_ordinal
+
+SYNC_OP_RETENTION_S = 60 * 86400  # Offline clients retrying older ops than this could double-log
+MACROS = ("calories", "protein", "carbs", "fats")
+NUTRITION_METRICS = ("consumed", "protein", "carbs", "fats")  # Counters that today's meal log adds up
+
+def _macro(meal, key):
+    """A meal's macro as an int. Negatives, NaN and infinities raise ValueError."""
+    try:
+        value = float(meal.get(key, 0))
+    except (TypeError, ValueError):
+        raise ValueError(f"'{key}' must be a number")
+    if not math.isfinite(value) or value < 0:
+        raise ValueError(f"'{key}' must be a non-negative number")
+    return int(value)
+
+def _legacy_metrics(values):
+    """Numeric metrics from a hand-edited legacy history row; null, text and out-of-range values are dropped."""
+    clean = {}
+    for metric in METRICS:
+        try:
+            value = float(values[metric])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if math.isfinite(value) and -2**31 <= value < 2**31:
+            clean[metric] = int(value)
+    return clean
 
 class HealthManager:
     def __init__(self, storage_file="user_data.json"):
         self.storage_file = storage_file
+        self.user_id = os.path.splitext(os.path.basename(storage_file))[0]
         self.default_data = {
             "name": "",
             "location": "",
@@ -17,153 +53,439 @@ class HealthManager:
             "burned": 0,
             "steps": 0,
             "last_sync": "Never",
+            "timezone": "",          # IANA name from the browser; empty means server local time
             "current_date": datetime.now().strftime("%Y-%m-%d"),
             "goal": "🏋️ Strength & Recovery", 
             "target_weight": "70.0",
             "active_strain": "",     # NEW: Stores the current physical strain
             "recovery_mode": False,  # NEW: Toggles the dashboard into rehab mode
-            "history": {},
             "progress_log": [],
             "login_dates": []
         }
+        self._file_lock = shared_store.FileLock(storage_file + ".lock")
+        self._stamp = None
+        # Reload state first: the migration's transaction may already reload a profile another worker rewrote
+        self._login_days = set()
+        self._progress_rev = 0
+        self._progress_series = None
         self.data = self.load_data()
-        self._check_daily_reset()
+        self.meals = MealLog(os.path.splitext(storage_file)[0] + "_meals.db")
+        self.history = HistoryStore(os.path.splitext(storage_file)[0] + "_history")
+        self._reconcile_counters()
+        self._migrate_history()
+        self._load_login_days()
+        self.rollover() # Catch up on any days that passed while the app was closed
+        self._refresh_calendar()
         self._record_login() # <--- NEW: Automatically logs your streak when the app opens
 
+    def _load_login_days(self):
+        for d in self.data.get("login_dates", []):
+            try:
+                self._login_days.add(datetime.strptime(d, "%Y-%m-%d").date())
+            except ValueError:
+                continue
+
     def _record_login(self):
         """Silently logs today's date to keep the streak alive."""
-        today = datetime.now().strftime("%Y-%m-%d")
-        if "login_dates" not in self.data:
-            self.data["login_dates"] = []
+        if self._today_date in self._login_days:
+            return
+        with self.transaction():
+            today = self.data["current_date"]
+            if "login_dates" not in self.data:
+                self.data["login_dates"] = []
             
-        if today not in self.data["login_dates"]:
-            self.data["login_dates"].append(today)
-            self.save_data()
+            if today not in self.data["login_dates"]:
+                self.data["login_dates"].append(today)
+                self._login_days.add(self._today_date)
 
     def load_data(self):
+        self._stamp = shared_store.file_stamp(self.storage_file)
         if not os.path.exists(self.storage_file):
             return self.default_data.copy()
         try:
-            with open(self.storage_file, 'r') as f:
+            with metrics.storage_op("load", self.storage_file), open(self.storage_file, 'r') as f:
                 loaded = json.load(f)
                 return {**self.default_data, **loaded}
         except:
             return self.default_data.copy()
 
     def save_data(self):
-        with open(self.storage_file, 'w') as f:
-            json.dump(self.data, f, indent=4)
+        with self._file_lock, metrics.storage_op("save", self.storage_file):
+            shared_store.atomic_write_json(self.storage_file, self.data, indent=4)
+            self._stamp = shared_store.file_stamp(self.storage_file)
+
+    # --- MULTI-PROCESS SAFETY ---
+    # Several worker processes may share one profile file. Writers go through
+    # transaction(); readers call reload_if_changed() to see other workers' writes.
+    def reload_if_changed(self):
+        """Reloads the profile if another process rewrote it. Returns True if it did."""
+        if shared_store.file_stamp(self.storage_file) == self._stamp:
+            return False
+        with self._file_lock:
+            self.history.reload_if_changed()
+            self.data = self.load_data()
+            self._reconcile_counters()
+            self._login_days = set()
+            self._load_login_days()
+            self._progress_rev += 1
+            self._refresh_calendar()
+        return True
+
+    @contextmanager
+    def transaction(self):
+        """Read-modify-write under the cross-process lock, so concurrent workers never lose each other's updates."""
+        with self._file_lock:
+            self.reload_if_changed()
+            yield self.data
+            self.save_data()
+
+    def _reconcile_counters(self):
+        """
+        Rebuilds today's calorie and macro counters from the meal log. Meals (and their sync ids) commit to
+        SQLite before the profile is saved, so a crash in between would otherwise leave the counters behind.
+        """
+        totals = self.meals.day_totals(self.data["current_date"])
+        for metric, macro in zip(NUTRITION_METRICS, MACROS):
+            self.data[metric] = totals[macro]
+
+    def _migrate_history(self):
+        """Moves a legacy per-day `history` dict out of the JSON profile into the columnar store."""
+        if not self.data.get("history"):
+            return
+        with self.transaction():
+            rows = []
+            for day, values in (self.data.pop("history", None) or {}).items():
+                try:
+                    rows.append((day_ordinal(day), _legacy_metrics(values)))
+                except (TypeError, ValueError):
+                    continue  # Hand-edited junk keys are dropped rather than blocking startup
+            self.history.write_rows(rows)
 
     def update_profile(self, name, location, goal, target_weight):
-        self.data["name"] = name
-        self.data["location"] = location
-        self.data["goal"] = goal
-        self.data["target_weight"] = target_weight
-        self.save_data()
+        with self.transaction():
+            self.data["name"] = name
+            self.data["location"] = location
+            self.data["goal"] = goal
+            self.data["target_weight"] = target_weight
 
     # --- NEW: Rehab & Recovery Methods ---
     def set_recovery_mode(self, strain_description):
-        self.data["active_strain"] = strain_description
-        self.data["recovery_mode"] = True if strain_description else False
-        self.save_data()
+        with self.transaction():
+            self.data["active_strain"] = strain_description
+            self.data["recovery_mode"] = True if strain_description else False
 
     def clear_recovery_mode(self):
-        self.data["active_strain"] = ""
-        self.data["recovery_mode"] = False
-        self.save_data()
+        with self.transaction():
+            self.data["active_strain"] = ""
+            self.data["recovery_mode"] = False
     # -------------------------------------
 
     def log_progress(self, filename, weight):
-        self.data["progress_log"].append({
-            "date": datetime.now().strftime("%b %d, %Y"),
-            "image": filename,
-            "weight": weight
-        })
-        self.save_data()
+        with self.transaction():
+            self.data["progress_log"].append({
+                "date": datetime.now().strftime("%b %d, %Y"),
+                "image": filename,
+                "weight": weight
+            })
+            self._progress_rev += 1
         
     def get_progress_log(self):
         return self.data.get("progress_log", [])
 
+    def get_progress_series(self):
+        """Typed (day, weight) arrays for the forecaster, rebuilt only when the log changes."""
+        if self._progress_series is None or self._progress_series.revision != self._progress_rev:
+            self._progress_series = ProgressSeries(self.get_progress_log(), self._progress_rev)
+        return self._progress_series
+
     def delete_progress_entry(self, filename):
-        self.data["progress_log"] = [
-            entry for entry in self.data.get("progress_log", []) 
-            if entry.get("image") != filename
-        ]
-        self.save_data()
-
-    def _check_daily_reset(self):
-        today = datetime.now().strftime("%Y-%m-%d")
+        """Drops every log entry for `filename` (or a photo-less weigh-in's op id). Returns how many other entries still reference the image."""
+        with self.transaction():
+            self.data["progress_log"] = [
+                entry for entry in self.data.get("progress_log", []) 
+                if (entry.get("image") or entry.get("op")) != filename
+            ]
+            self._progress_rev += 1
+        return self.progress_images().count(filename)
+
+    def progress_images(self):
+        """Image keys referenced by the progress log, one per entry: the blob store's reference counts."""
+        return [entry.get("image") for entry in self.get_progress_log() if entry.get("image")]
+
+    def relink_progress_images(self, mapping):
+        """Points entries at new image keys, e.g. after legacy files move into the blob store."""
+        with self.transaction():
+            for entry in self.data.get("progress_log", []):
+                if entry.get("image") in mapping:
+                    entry["image"] = mapping[entry["image"]]
+            self._progress_rev += 1
+
+    # --- DAY ROLLOVER ---
+    # Driven by scheduler.DailyRolloverScheduler at each user's local midnight,
+    # so the read paths below never have to check the date themselves.
+    def tzinfo(self):
+        """The user's timezone, or None for server local time."""
+        name = self.data.get("timezone")
+        if not name:
+            return None
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            return None
+
+    def now(self):
+        """Current time in the user's timezone (server local time if none is set)."""
+        tz = self.tzinfo()
+        return datetime.now(tz) if tz else datetime.now()
+
+    def set_timezone(self, name):
+        if name == self.data.get("timezone"):
+            return
+        with self.transaction():
+            self.data["timezone"] = name
+            self.rollover()
+
+    def _day_changed(self):
         last_date = self.data.get("current_date")
-        
-        if last_date != today:
+        # ISO dates compare correctly as strings; never roll "backwards" after a timezone change
+        return not last_date or last_date < self.now().strftime("%Y-%m-%d")
+
+    def rollover(self):
+        """Archives the live counters if the user's day has changed. Skipped days read as zero. Returns True on rollover."""
+        # Cheap check first so the scheduler's frequent no-op calls never take the lock or write
+        self.reload_if_changed()
+        if not self._day_changed():
+            return False
+        with self.transaction():
+            if not self._day_changed():
+                return False  # Another worker rolled over while we waited for the lock
+            last_date = self.data.get("current_date")
+
             if last_date:
-                if "history" not in self.data:
-                    self.data["history"] = {}
-                self.data["history"][last_date] = {
-                    "consumed": self.data.get("consumed", 0),
-                    "protein": self.data.get("protein", 0),
-                    "carbs": self.data.get("carbs", 0),
-                    "fats": self.data.get("fats", 0),
-                    "steps": self.data.get("steps", 0)
-                }
+                # Skipped days need no rows: the columns read zero wherever nothing was written
+                try:
+                    self.history.write_rows([(last_date, {m: self.data.get(m, 0) for m in METRICS})])
+                except ValueError:
+                    pass
             self.force_reset_today()
+            return True
+
+    def _refresh_calendar(self):
+        """Precomputes the date keys and labels the weekly chart and streak tracker need for the current day."""
+        self._today_date = datetime.strptime(self.data["current_date"], "%Y-%m-%d").date()
+        week = [self._today_date - timedelta(days=i) for i in range(6, -1, -1)]
+        self._week_keys = [(d.strftime("%Y-%m-%d"), d.strftime("%b %d")) for d in week]
+        self._week_days = [(d, d.strftime("%a")[0]) for d in week] # M, T, W, T, F, S, S
 
     def force_reset_today(self):
-        self.data["consumed"] = 0
-        self.data["protein"] = 0
-        self.data["carbs"] = 0
-        self.data["fats"] = 0
-        self.data["burned"] = 0
-        self.data["steps"] = 0
-        self.data["current_date"] = datetime.now().strftime("%Y-%m-%d")
-        self.save_data()
-
-    def sync_smartwatch(self):
-        self._check_daily_reset()
-        new_steps = random.randint(50, 500)
-        new_burn = int(new_steps * 0.04)
-        self.data["steps"] += new_steps
-        self.data["burned"] += new_burn
-        self.data["last_sync"] = datetime.now().strftime("%H:%M:%S")
-        self.save_data()
-        return {"steps": new_steps, "burned": new_burn}
-
-    def log_meal(self, food_name, calories, protein, carbs, fats):
-        self._check_daily_reset()
-        self.data["consumed"] += int(calories)
-        self.data["protein"] += int(protein)
-        self.data["carbs"] += int(carbs)
-        self.data["fats"] += int(fats)
-        self.save_data()
+        with self.transaction():
+            today = self.now().strftime("%Y-%m-%d")
+            if self.data.get("current_date") == today:
+                # A manual reset of the same day also throws away that day's meal events
+                self.meals.clear_day(today)
+            self.data["consumed"] = 0
+            self.data["protein"] = 0
+            self.data["carbs"] = 0
+            self.data["fats"] = 0
+            self.data["burned"] = 0
+            self.data["steps"] = 0
+            self.data["current_date"] = today
+            self._refresh_calendar()
+
+    def sync_smartwatch(self, steps_today, burned_today):
+        """Brings today's counters up to the wearable store's totals and returns what was added."""
+        with self.transaction():
+            new_steps = max(0, int(steps_today) - self.data["steps"])
+            new_burn = max(0, int(burned_today) - self.data["burned"])
+            self.data["steps"] += new_steps
+            self.data["burned"] += new_burn
+            self.data["last_sync"] = self.now().strftime("%H:%M:%S")
+            return {"steps": new_steps, "burned": new_burn}
+
+    def backfill_activity(self, day_totals):
+        """Writes imported (date, steps, burned) rows into history, or into today's live counters."""
+        self.import_days((day, {"steps": steps, "burned": burned}) for day, steps, burned in day_totals)
+
+    def import_days(self, rows):
+        """
+        Writes [(day, {metric: value})] in one transaction: today's row to the live counters, the rest to history.
+        Today's calories and macros are left to the meal log, so the counters keep matching today's meals.
+        """
+        with self.transaction():
+            today = day_ordinal(self.data["current_date"])
+            past = []
+            for day, values in rows:
+                if day_ordinal(day) == today:
+                    self.data.update({m: int(v) for m, v in values.items() if m not in NUTRITION_METRICS})
+                else:
+                    past.append((day, values))
+            self.history.write_rows(past)
+
+    def get_day(self, day):
+        """Totals for any day, from the live counters if it is today."""
+        if day_ordinal(day) == self._today_date.toordinal():
+            return {m: self.data.get(m, 0) for m in METRICS}
+        return self.history.row(day)
+
+    def log_meal(self, food_name, calories, protein, carbs, fats, image_hash=None):
+        """Records the meal as its own event and adds it to today's running totals. Returns the meal id."""
+        meal = {"name": food_name, "calories": calories, "protein": protein, "carbs": carbs, "fats": fats, "image_hash": image_hash}
+        return self.log_meals([meal])[0]
+
+    def log_meals(self, meals, op_ids=()):
+        """
+        Logs a batch of meal dicts (name, calories, protein, carbs, fats, optional day/ts/image_hash) in one
+        transaction. Meals for earlier days are added to that day's history row. `op_ids` are client sync ids
+        stored with the meals. Returns the new meal ids.
+        """
+        with self.transaction():
+            today = self.data["current_date"]
+            rows = []
+            for meal in meals:
+                # Canonical YYYY-MM-DD, so the `day == today` check below can't miss e.g. "20261019"
+                day = date.fromordinal(day_ordinal(meal.get("day") or today)).isoformat()
+                if day_ordinal(day) > self._today_date.toordinal():
+                    raise ValueError(f"Cannot log a meal for a future day: {day}")
+                rows.append((day, str(meal.get("name") or "Food"), *(_macro(meal, m) for m in MACROS),
+                             meal.get("image_hash"), meal.get("ts")))
+            ids = self.meals.log_many(rows, op_ids)
+            past = {}
+            for day, _, calories, protein, carbs, fats, _, _ in rows:
+                target = self.data if day == today else past.setdefault(day, self.history.row(day))
+                target["consumed"] += calories
+                target["protein"] += protein
+                target["carbs"] += carbs
+                target["fats"] += fats
+            self.history.write_rows(past.items())
+            return ids
+
+    # --- OFFLINE SYNC ---
+    # Entries queued by the offline client arrive as ops with client-generated ids. Meal ids are stored in
+    # the meal log's own transaction, and today's counters are rebuilt from it on load; steps/weight ids go
+    # in the profile's `sync_ops`, saved with the counters.
+    def _op_time(self, ts):
+        """An op's client timestamp (ms) in the user's timezone, clamped so a fast client clock can't reach tomorrow."""
+        now = self.now()
+        if ts is None:
+            return now
+        when = datetime.fromtimestamp(float(ts) / 1000, now.tzinfo)
+        return min(when, now)
+
+    def apply_sync_ops(self, ops):
+        """
+        Applies offline ops ({id, type: meal|steps|weight, ts, ...}) exactly once each, in one transaction.
+        Returns {"applied": [ids], "duplicate": [ids], "rejected": [{"id", "error"}]}.
+        """
+        result = {"applied": [], "duplicate": [], "rejected": []}
+        with self.transaction():
+            ops = [op for op in ops if isinstance(op, dict)]
+            synced = self.data.setdefault("sync_ops", {})
+            seen = self.meals.seen_ops(str(op["id"]) for op in ops if op.get("id")) | set(synced)
+            meals, meal_ids, activity, weigh_ins = [], [], [], []
+            for op in ops:
+                op_id = str(op.get("id") or "")
+                if not op_id:
+                    result["rejected"].append({"id": None, "error": "Missing id"})
+                    continue
+                if op_id in seen:
+                    result["duplicate"].append(op_id)
+                    continue
+                seen.add(op_id)
+                try:
+                    when = self._op_time(op.get("ts"))
+                    day = when.strftime("%Y-%m-%d")
+                    kind = op.get("type")
+                    if kind == "meal":
+                        macros = {m: _macro(op, m) for m in MACROS}
+                        meals.append({"name": str(op.get("name") or "Food"), "day": day, "ts": when.timestamp(), **macros})
+                        meal_ids.append(op_id)
+                    elif kind == "steps":
+                        steps, burned = int(op.get("steps", 0)), int(op.get("burned", 0))
+                        if steps < 0 or burned < 0:
+                            raise ValueError("Negative activity")
+                        activity.append((op_id, day, steps, burned))
+                    elif kind == "weight":
+                        weight = float(op["weight"])
+                        if not 0 < weight < 500:
+                            raise ValueError("Weight out of range")
+                        weigh_ins.append((op_id, when, weight))
+                    else:
+                        raise ValueError(f"Unknown op type {kind!r}")
+                except (TypeError, ValueError, KeyError, OverflowError, OSError) as ex:
+                    result["rejected"].append({"id": op_id, "error": str(ex)})
+            if meals:
+                self.log_meals(meals, meal_ids)
+            today = self.data["current_date"]
+            past = {}
+            for _, day, steps, burned in activity:
+                row = self.data if day == today else past.setdefault(day, self.history.row(day))
+                row["steps"] = row.get("steps", 0) + steps
+                row["burned"] = row.get("burned", 0) + burned
+            self.history.write_rows(past.items())
+            for op_id, when, weight in weigh_ins:
+                self.data["progress_log"].append({"date": when.strftime("%b %d, %Y"), "image": "", "weight": str(weight), "op": op_id})
+            if weigh_ins:
+                self._progress_rev += 1
+            # Recorded before the transaction saves, so the ids and what they applied land in the same write
+            now = time.time()
+            synced.update((op_id, now) for op_id in [a[0] for a in activity] + [w[0] for w in weigh_ins])
+            self.data["sync_ops"] = {op_id: ts for op_id, ts in synced.items() if ts >= now - SYNC_OP_RETENTION_S}
+        self.meals.prune_ops(time.time() - SYNC_OP_RETENTION_S)
+        result["applied"] = meal_ids + [a[0] for a in activity] + [w[0] for w in weigh_ins]
+        return result
+
+    def undo_meal(self, meal_id):
+        """Removes a logged meal. Today's meals come off the live counters, older ones off that day's history row."""
+        with self.transaction():
+            meal = self.meals.delete(meal_id)
+            if meal is None:
+                return None
+            target = self.data if meal["day"] == self.data["current_date"] else self.history.row(meal["day"])
+            target["consumed"] = max(0, target.get("consumed", 0) - meal["calories"])
+            for macro in ("protein", "carbs", "fats"):
+                target[macro] = max(0, target.get(macro, 0) - meal[macro])
+            if target is not self.data:
+                self.history.write_rows([(meal["day"], target)])
+            return meal
+
+    def get_todays_meals(self):
+        return self.meals.meals_for_day(self.data["current_date"])
 
     def get_stats(self):
-        self._check_daily_reset()
         remaining = max(0, (self.data["target"] + self.data["burned"]) - self.data["consumed"])
         return {**self.data, "remaining": remaining}
 
     def get_weekly_history(self):
-        self._check_daily_reset()
-        history_data = self.data.get("history", {})
-        dates = [(datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(6, -1, -1)]
-        weekly_stats = {"dates": [], "consumed": [], "protein": [], "carbs": [], "fats": []}
-        
-        for d in dates:
-            stats = self.data if d == self.data["current_date"] else history_data.get(d, {"consumed": 0, "protein": 0, "carbs": 0, "fats": 0})
-            clean_date = datetime.strptime(d, "%Y-%m-%d").strftime("%b %d")
-            weekly_stats["dates"].append(clean_date)
-            weekly_stats["consumed"].append(stats.get("consumed", 0))
-            weekly_stats["protein"].append(stats.get("protein", 0))
-            weekly_stats["carbs"].append(stats.get("carbs", 0))
-            weekly_stats["fats"].append(stats.get("fats", 0))
-            
+        # The six archived days are one slice of the mapped columns; today comes from the live counters
+        past = self.history.window(self._today_date.toordinal() - 6, 6, ("consumed", "protein", "carbs", "fats"))
+        weekly_stats = {"dates": [label for _, label in self._week_keys]}
+        for metric, view in past.items():
+            weekly_stats[metric] = view.tolist() + [self.data.get(metric, 0)]
         return weekly_stats
+
+    def get_daily_columns(self, metrics=METRICS):
+        """Every archived day plus today as {metric: array('i')}, e.g. for correlations."""
+        start = self.history.base_ordinal or self._today_date.toordinal()
+        count = max(0, self._today_date.toordinal() - start)
+        past = self.history.window(start, count, metrics)
+        columns = {}
+        for m in metrics:
+            columns[m] = array('i')
+            columns[m].frombytes(past[m].cast('B'))
+            columns[m].append(int(self.data.get(m, 0)))
+        return columns
+    def get_recent_averages(self, days=7, metrics=("consumed", "protein", "steps")):
+        """Per-metric average over the last `days` archived days that have food logged; {} if there are none."""
+        past = self.history.window(self._today_date.toordinal() - days, days, tuple({"consumed", *metrics}))
+        logged = [i for i, kcal in enumerate(past["consumed"]) if kcal > 0]
+        if not logged:
+            return {}
+        return {m: sum(past[m][i] for i in logged) / len(logged) for m in metrics}
+
     def get_streak_info(self):
         """Calculates current streak and the last 7 days of activity."""
-        login_dates = self.data.get("login_dates", [])
-        
-        # Convert strings to actual Date objects for math
-        dates = set(datetime.strptime(d, "%Y-%m-%d").date() for d in login_dates)
-        today = datetime.now().date()
+        dates = self._login_days
+        today = self._today_date
         
         streak = 0
         # The streak is "alive" if you logged in today OR yesterday
@@ -174,13 +496,7 @@ class HealthManager:
                 streak += 1
                 temp_date -= timedelta(days=1)
                 
-        # Generate the last 7 days for the UI timeline
-        last_7_days = []
-        for i in range(6, -1, -1):
-            d = today - timedelta(days=i)
-            last_7_days.append({
-                "day_name": d.strftime("%a")[0], # Returns M, T, W, T, F, S, S
-                "logged": d in dates
-            })
+        # The last 7 days for the UI timeline
+        last_7_days = [{"day_name": name, "logged": d in dates} for d, name in self._week_days]
             
         return streak, last_7_days
\ No newline at end of file
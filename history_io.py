@@ -0,0 +1,200 @@
+"""
+Nutrition history import and export.
+
+Reads MyFitnessPal / Cronometer style exports (CSV, JSON or JSON Lines) one
+row at a time. Per-meal rows are summed into daily totals, and days are written
+to the HealthManager history store in batches, one transaction per batch. Memory
+stays bounded by the batch size, not the file size. Exports stream the history
+store back out as CSV or JSON Lines in chunks, from a copy taken under the
+profile lock.
+
+Re-importing the same file is idempotent: an imported day replaces that day's
+stored totals.
+
+Usage:
+    python history_io.py import cronometer.csv        # into user_data.json
+    python history_io.py export history.csv           # or history.jsonl
+"""
+import argparse
+from array import array
+import csv
+import io
+import json
+import sys
+import time
+from datetime import date, datetime
+
+from history_store import METRICS
+from wearable_ingest import parse_timestamp, iter_json_objects, _pick, _to_float
+
+BATCH_DAYS = 500
+EXPORT_CHUNK_DAYS = 1000
+
+DATE_FIELDS = ("date", "day", "date (yyyy-mm-dd)", "diary date", "timestamp", "time", "datetime")
+DATE_FORMATS = ("%m/%d/%Y", "%d/%m/%Y", "%d.%m.%Y", "%Y/%m/%d")
+METRIC_FIELDS = {
+    "consumed": ("calories", "energy (kcal)", "calories (kcal)", "kcal", "energy", "consumed"),
+    "protein": ("protein (g)", "protein"),
+    "carbs": ("carbohydrates (g)", "carbs (g)", "net carbs (g)", "carbohydrates", "carbs"),
+    "fats": ("fat (g)", "fats (g)", "fat", "fats"),
+    "steps": ("steps", "step count"),
+    "burned": ("exercise calories", "calories burned", "active calories", "burned"),
+}
+
+# --- PARSING ---
+
+def parse_day(value):
+    """Day ordinal from an ISO date/timestamp or a few common spreadsheet formats, or None."""
+    dt = parse_timestamp(value)
+    if dt is None and value:
+        for fmt in DATE_FORMATS:
+            try:
+                dt = datetime.strptime(str(value).strip(), fmt)
+                break
+            except ValueError:
+                continue
+    return dt.toordinal() if dt else None
+
+def _columns(fields):
+    """Maps our metric names to the file's column names."""
+    date_col = _pick(fields, DATE_FIELDS)
+    columns = {m: col for m, col in ((m, _pick(fields, names)) for m, names in METRIC_FIELDS.items()) if col}
+    if not date_col or not columns:
+        raise ValueError(f"Need a date column and at least one of calories/protein/carbs/fat, found {list(fields)}")
+    return date_col, columns
+
+def _row(record, date_col, columns):
+    ordinal = parse_day(record.get(date_col))
+    if ordinal is None:
+        return None
+    values = {}
+    for metric, col in columns.items():
+        value = _to_float(record.get(col))
+        if value is not None:
+            values[metric] = value
+    return ordinal, values
+
+def parse_csv(stream):
+    reader = csv.DictReader(stream)
+    date_col, columns = _columns(reader.fieldnames or [])
+    for record in reader:
+        row = _row(record, date_col, columns)
+        if row:
+            yield row
+
+def parse_json(stream):
+    layout = None
+    for obj in iter_json_objects(stream):
+        if not isinstance(obj, dict):
+            continue
+        if layout is None:
+            layout = _columns(list(obj.keys()))
+        row = _row(obj, *layout)
+        if row:
+            yield row
+
+def iter_rows(path, fmt=None):
+    """Yields (day ordinal, {metric: value}) per row. Several rows may share a day (one per meal)."""
+    fmt = fmt or ("json" if path.lower().endswith((".json", ".jsonl", ".ndjson")) else "csv")
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        yield from (parse_json(f) if fmt == "json" else parse_csv(f))
+
+# --- PIPELINE ---
+
+def import_rows(rows, manager, batch_days=BATCH_DAYS):
+    """Sums rows into daily totals and writes them to `manager` in batches. Returns (row_count, day_count)."""
+    pending = {}
+    written = set()
+    count = 0
+
+    def flush():
+        batch = []
+        for ordinal, totals in pending.items():
+            if ordinal in written:
+                # The file revisited a day we already flushed: add on top of what this import wrote
+                stored = manager.get_day(ordinal)
+                totals = {m: stored.get(m, 0) + v for m, v in totals.items()}
+            batch.append((ordinal, {m: int(round(v)) for m, v in totals.items()}))
+        manager.import_days(batch)
+        written.update(pending)
+        pending.clear()
+
+    for ordinal, values in rows:
+        count += 1
+        if ordinal not in pending and len(pending) >= batch_days:
+            flush()
+        totals = pending.setdefault(ordinal, {})
+        for metric, value in values.items():
+            totals[metric] = totals.get(metric, 0) + value
+    if pending:
+        flush()
+    return count, len(written)
+
+def import_file(path, manager, fmt=None):
+    start = time.perf_counter()
+    count, days = import_rows(iter_rows(path, fmt), manager)
+    seconds = time.perf_counter() - start
+    return {"rows": count, "days": days, "seconds": round(seconds, 3), "rows_per_sec": int(count / seconds) if seconds else count}
+
+# --- EXPORT ---
+
+def _snapshot(manager):
+    """Copies the stored range and today's counters under the profile lock, so a concurrent resize can't tear the export."""
+    with manager._file_lock:
+        manager.reload_if_changed()
+        history = manager.history
+        today = manager.data["current_date"]
+        base, days = history.base_ordinal, history.days
+        columns = {m: array('i', view) for m, view in history.window(base or 0, days).items()}
+        return base, days, columns, today, manager.get_day(today)
+
+def export_days(manager):
+    """(ISO date, totals) for every day with data, oldest first, today's live counters last."""
+    base, days, columns, today, today_row = _snapshot(manager)
+    for i in range(days):
+        day = date.fromordinal(base + i).isoformat()
+        row = {m: columns[m][i] for m in METRICS}
+        if day != today and any(row.values()):
+            yield day, row
+    yield today, today_row
+
+def iter_export(manager, fmt="csv"):
+    """Yields the export as text chunks, for a streaming download or a file."""
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == "csv" else None
+    if writer:
+        writer.writerow(("date",) + METRICS)
+    for i, (day, row) in enumerate(export_days(manager), 1):
+        if writer:
+            writer.writerow([day] + [row[m] for m in METRICS])
+        else:
+            buf.write(json.dumps({"date": day, **{m: row[m] for m in METRICS}}) + "\n")
+        if i % EXPORT_CHUNK_DAYS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import or export NUtri-INO nutrition history.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "json"])
+    parser.add_argument("--user-data", default="user_data.json")
+    args = parser.parse_args(argv)
+
+    from health_manager import HealthManager
+    manager = HealthManager(args.user_data)
+    if args.action == "import":
+        summary = import_file(args.path, manager, args.format)
+        print(f"Imported {summary['rows']} rows covering {summary['days']} days in {summary['seconds']}s ({summary['rows_per_sec']} rows/s)")
+    else:
+        fmt = args.format or ("json" if args.path.lower().endswith((".json", ".jsonl")) else "csv")
+        with open(args.path, 'w', newline='') as f:
+            for chunk in iter_export(manager, fmt):
+                f.write(chunk)
+        print(f"Exported history to {args.path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
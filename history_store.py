@@ -0,0 +1,191 @@
+"""
+Columnar daily history.
+
+Archived daily totals live next to the profile as one raw int32 file per
+metric (consumed.i32, protein.i32, ...). Slot i holds day `base_ordinal + i`,
+so any date range is a contiguous slice. Columns are memory-mapped read-only
+and exposed as `memoryview`s cast to int32: opening ten years of history reads
+nothing up front, and a week or a year is a view into the mapping, not a copy.
+Days that were never written read as zero.
+
+Writes go straight into the files and are visible through every process's
+mapping. meta.json is rewritten only when the range grows, which is how other
+processes know to remap. Callers serialise writes; HealthManager does so under
+its profile lock.
+
+Growing forward only extends the files; slots past meta's `days` are never
+read, so an interrupted extension is harmless. Adding older days shifts every
+slot, so the padded columns are written as a new generation of files
+(consumed.<n>.i32, ...) and meta.json, which names the generation, is switched
+in one atomic replace. An interruption before that leaves the old generation
+and meta.json untouched.
+"""
+import json
+import mmap
+import os
+from array import array
+from datetime import date
+
+import shared_store
+
+METRICS = ("consumed", "protein", "carbs", "fats", "steps", "burned")
+ITEM_SIZE = array('i').itemsize  # int32 on every platform we ship to
+
+def day_ordinal(day):
+    """'YYYY-MM-DD', a date or an ordinal to a day ordinal."""
+    if isinstance(day, int):
+        return day
+    return (date.fromisoformat(day) if isinstance(day, str) else day).toordinal()
+
+class HistoryStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.base_ordinal = None
+        self.days = 0
+        self.generation = 0
+        self.columns = {m: memoryview(b"").cast('i') for m in METRICS}
+        self._maps = []
+        self._stamp = None
+        os.makedirs(directory, exist_ok=True)
+        self._map()
+
+    def _meta_path(self):
+        return os.path.join(self.directory, "meta.json")
+
+    def _column_path(self, metric, generation=None):
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.directory, f"{metric}.{generation}.i32" if generation else f"{metric}.i32")
+
+    def _unmap(self):
+        """Closes our mappings. Windows refuses to resize or replace a file while this process still maps it."""
+        for view in self.columns.values():
+            try:
+                view.release()
+            except BufferError:
+                pass  # Something (e.g. a NumPy array) still wraps this view; the mapping goes when it does
+        self.columns = {m: memoryview(b"").cast('i') for m in METRICS}
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+        self._maps = []
+
+    def _map(self):
+        meta_path = self._meta_path()
+        self._unmap()
+        self._stamp = shared_store.file_stamp(meta_path)
+        if self._stamp is None:
+            return
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        self.base_ordinal = meta["base_ordinal"]
+        self.days = meta["days"]
+        self.generation = meta.get("generation", 0)
+        columns = {}
+        for metric in METRICS:
+            if not self.days:
+                columns[metric] = memoryview(b"").cast('i')
+                continue
+            with open(self._column_path(metric), 'rb') as f:
+                # Views handed out earlier keep their own mapping alive until they are dropped
+                mapped = mmap.mmap(f.fileno(), self.days * ITEM_SIZE, access=mmap.ACCESS_READ)
+            self._maps.append(mapped)
+            columns[metric] = memoryview(mapped).cast('i')
+        self.columns = columns
+
+    def reload_if_changed(self):
+        """Remaps the columns if another process grew the range since we mapped it."""
+        if shared_store.file_stamp(self._meta_path()) == self._stamp:
+            return False
+        self._map()
+        return True
+
+    def __len__(self):
+        return self.days
+
+    # --- READS ---
+
+    def window(self, start_ordinal, count, metrics=METRICS):
+        """`count` days from `start_ordinal` as {metric: memoryview}. A view when the range is stored, zero-padded otherwise."""
+        lo = start_ordinal - (self.base_ordinal or 0)
+        if self.base_ordinal is not None and lo >= 0 and lo + count <= self.days:
+            return {m: self.columns[m][lo:lo + count] for m in metrics}
+        out = {}
+        for m in metrics:
+            values = array('i', bytes(count * ITEM_SIZE))
+            for i in range(max(0, -lo), min(count, self.days - lo)):
+                values[i] = self.columns[m][lo + i]
+            out[m] = memoryview(values)
+        return out
+
+    def row(self, day):
+        i = day_ordinal(day) - (self.base_ordinal or 0)
+        if self.base_ordinal is None or not 0 <= i < self.days:
+            return {m: 0 for m in METRICS}
+        return {m: self.columns[m][i] for m in METRICS}
+
+    def items(self):
+        """(ISO date, row) for every stored day, oldest first."""
+        for i in range(self.days):
+            yield date.fromordinal(self.base_ordinal + i).isoformat(), {m: self.columns[m][i] for m in METRICS}
+
+    # --- WRITES ---
+
+    def write_rows(self, rows):
+        """Writes [(day, {metric: value})]. Metrics missing from a row are left as they are."""
+        rows = [(day_ordinal(day), values) for day, values in rows]
+        if not rows:
+            return
+        self.reload_if_changed()  # Another process may have moved the range to a new generation
+        self._ensure_range(min(o for o, _ in rows), max(o for o, _ in rows))
+        for metric in METRICS:
+            updates = [(o, int(v[metric])) for o, v in rows if metric in v]
+            if not updates:
+                continue
+            with open(self._column_path(metric), 'r+b') as f:
+                for ordinal, value in sorted(updates):
+                    f.seek((ordinal - self.base_ordinal) * ITEM_SIZE)
+                    f.write(array('i', [value]).tobytes())
+
+    def _ensure_range(self, first, last):
+        if self.base_ordinal is None:
+            base, days = first, last - first + 1
+        else:
+            base = min(self.base_ordinal, first)
+            days = max(self.base_ordinal + self.days, last + 1) - base
+        if base == self.base_ordinal and days == self.days:
+            return
+        lead = (self.base_ordinal - base) if self.base_ordinal is not None else 0
+        generation = self.generation + 1 if lead else self.generation
+        current = {m: self.columns[m].tobytes() for m in METRICS} if lead else None
+        self._unmap()
+        try:
+            self._resize(base, days, lead, generation, current)
+        except BaseException:
+            self._map()  # Still the old generation and meta.json; keep serving them
+            raise
+        previous = self.generation
+        self._map()
+        if generation != previous:
+            for metric in METRICS:
+                try:
+                    os.remove(self._column_path(metric, previous))
+                except OSError:
+                    pass  # Still mapped by another process on Windows; unused either way
+
+    def _resize(self, base, days, lead, generation, current):
+        for metric in METRICS:
+            if lead:
+                # Older days go in front: a fresh generation, invisible until meta.json names it
+                with open(self._column_path(metric, generation), 'wb') as f:
+                    f.write(bytes(lead * ITEM_SIZE))
+                    f.write(current[metric])
+                    f.truncate(days * ITEM_SIZE)
+                    f.flush()
+                    os.fsync(f.fileno())
+            else:
+                with open(self._column_path(metric), 'ab') as f:
+                    f.truncate(days * ITEM_SIZE)
+        shared_store.atomic_write_json(self._meta_path(), {"base_ordinal": base, "days": days, "metrics": list(METRICS),
+                                                           "generation": generation})
@@ -0,0 +1,38 @@
+"""
+Image preparation before upload.
+
+Phone photos are often 3-12 MB. Gemini bills images in 768px tiles, so anything
+bigger only costs upload time and tokens. `prepare_image` decodes, honours the
+EXIF orientation, downsizes to MAX_SIDE and re-encodes as JPEG. It is a pure
+function of bytes, so the compute pool can run it in a worker process. Without
+Pillow installed, images are passed through unchanged.
+"""
+import io
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional: the app still works, just uploads originals
+    Image = None
+
+MAX_SIDE = 768
+JPEG_QUALITY = 85
+
+def prepare_image(image_bytes, mime_type="image/jpeg", max_side=MAX_SIDE):
+    """Returns (bytes, mime_type) ready to send. Falls back to the original on any decode problem."""
+    if Image is None:
+        return image_bytes, mime_type
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img = ImageOps.exif_transpose(img)
+            if max(img.size) <= max_side and mime_type == "image/jpeg":
+                return image_bytes, mime_type
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    except Exception:
+        return image_bytes, mime_type
+    data = out.getvalue()
+    # Never send something larger than what we were given
+    return (data, "image/jpeg") if len(data) < len(image_bytes) else (image_bytes, mime_type)
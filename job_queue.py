@@ -0,0 +1,235 @@
+"""
+Background job queue for long AI tasks.
+
+Jobs are rows in SQLite (id, user, kind, params, status, progress, error) and
+are run by a fixed pool of asyncio workers, so concurrency is bounded no matter
+how many clients submit. The blocking task itself runs in a thread. Finished
+results go into a per-user `results` table keyed by a caller-chosen key, so an
+identical request (e.g. the recovery protocol for the same strain) is answered
+from disk instead of being regenerated, for up to RESULT_TTL_SECONDS; older
+results and finished jobs are pruned. The work survives the browser tab
+closing; jobs still queued or running when the process stopped are picked up
+again on the next start.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT    PRIMARY KEY,
+    user        TEXT    NOT NULL,
+    kind        TEXT    NOT NULL,
+    params      TEXT    NOT NULL,
+    result_key  TEXT,
+    owner       TEXT    NOT NULL DEFAULT '',
+    status      TEXT    NOT NULL,
+    progress    REAL    NOT NULL DEFAULT 0,
+    note        TEXT    NOT NULL DEFAULT '',
+    error       TEXT,
+    created     REAL    NOT NULL,
+    updated     REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created);
+CREATE TABLE IF NOT EXISTS results (
+    user        TEXT    NOT NULL,
+    result_key  TEXT    NOT NULL,
+    kind        TEXT    NOT NULL,
+    result      TEXT    NOT NULL,
+    created     REAL    NOT NULL,
+    PRIMARY KEY (user, result_key)
+);
+"""
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+POLL_SECONDS = 1.0
+RESULT_TTL_SECONDS = 7 * 86400  # A stored answer older than this is regenerated, then pruned
+PRUNE_EVERY_SECONDS = 3600
+
+class JobFailed(Exception):
+    """Raised by `wait` for a job that failed in an earlier process, when the original exception is gone."""
+
+class JobQueue:
+    def __init__(self, path="jobs.db", workers=4, owner=""):
+        self.path = path
+        self.workers = workers
+        # With several worker processes sharing jobs.db, each only resumes the jobs it submitted
+        self.owner = owner
+        self.tasks = {}
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+        self._queue = None
+        self._worker_tasks = []
+        self._waiters = {}
+        self._outcomes = {}  # Exceptions and unkeyed results, held only for jobs someone is awaiting
+        self._last_prune = 0.0
+
+    def register(self, kind, func):
+        """`func(params, progress)` runs in a worker thread; `progress(fraction, note)` updates the job row."""
+        self.tasks[kind] = func
+
+    # --- SUBMIT & QUERY ---
+    def submit(self, user, kind, params, result_key=None):
+        """Queues a job and returns its id. A stored result or an in-flight job for the same key is reused.
+
+        Without a `result_key` nothing is persisted and the result only reaches callers already waiting.
+        """
+        if kind not in self.tasks:
+            raise KeyError(f"No task registered for job kind '{kind}'")
+        now = time.time()
+        if now - self._last_prune > PRUNE_EVERY_SECONDS:
+            self.prune(now)
+        with self.lock, self.conn:
+            if result_key is not None:
+                active = self.conn.execute(
+                    "SELECT id FROM jobs WHERE user = ? AND result_key = ? AND status IN (?, ?) ORDER BY created LIMIT 1",
+                    (user, result_key, QUEUED, RUNNING)).fetchone()
+                if active:
+                    return active["id"]
+                stored = self.conn.execute(
+                    "SELECT 1 FROM results WHERE user = ? AND result_key = ? AND created >= ?",
+                    (user, result_key, now - RESULT_TTL_SECONDS)).fetchone()
+            else:
+                stored = None
+            job_id = uuid.uuid4().hex
+            self.conn.execute(
+                "INSERT INTO jobs (id, user, kind, params, result_key, owner, status, progress, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user, kind, json.dumps(params), result_key, self.owner, DONE if stored else QUEUED, 1.0 if stored else 0.0, now, now))
+        metrics.JOBS_SUBMITTED.inc(kind=kind, source="results" if stored else "queued")
+        if not stored and self._queue is not None:
+            self._queue.put_nowait(job_id)
+        return job_id
+
+    def status(self, job_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, user, kind, status, progress, note, error, created, updated FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def result(self, user, result_key):
+        """The stored result for a key, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT result FROM results WHERE user = ? AND result_key = ?", (user, result_key)).fetchone()
+        return json.loads(row["result"]) if row else None
+
+    def results_for(self, user, kind=None, limit=50):
+        query = "SELECT result_key, kind, result, created FROM results WHERE user = ?"
+        args = [user]
+        if kind:
+            query += " AND kind = ?"
+            args.append(kind)
+        query += " ORDER BY created DESC LIMIT ?"
+        args.append(limit)
+        with self.lock:
+            rows = self.conn.execute(query, args).fetchall()
+        return [{**dict(r), "result": json.loads(r["result"])} for r in rows]
+
+    def forget(self, user, result_key):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM results WHERE user = ? AND result_key = ?", (user, result_key))
+
+    def prune(self, now=None):
+        """Deletes stored results past RESULT_TTL_SECONDS and finished job rows just as old."""
+        now = now or time.time()
+        self._last_prune = now
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM results WHERE created < ?", (now - RESULT_TTL_SECONDS,))
+            self.conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (DONE, FAILED, now - RESULT_TTL_SECONDS))
+
+    async def wait(self, job_id):
+        """Resolves with the job's result, or raises the task's exception."""
+        job = self._job(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        while job["status"] not in (DONE, FAILED):
+            waiter = self._waiters.get(job_id)
+            if waiter is None:
+                waiter = self._waiters[job_id] = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass  # The job may belong to another worker process; re-read its row
+            job = self._job(job_id)
+        self._waiters.pop(job_id, None)
+        if job["status"] == FAILED:
+            raise self._outcomes.pop(job_id, None) or JobFailed(job["error"])
+        if job["result_key"] is None:
+            return self._outcomes.pop(job_id, None)
+        return self.result(job["user"], job["result_key"])
+
+    def _job(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def _update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        with self.lock, self.conn:
+            self.conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    # --- WORKERS ---
+    async def start(self):
+        """Startup hook: re-queues unfinished jobs from a previous run and launches the workers."""
+        self._queue = asyncio.Queue()
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE jobs SET status = ? WHERE status = ? AND owner = ?", (QUEUED, RUNNING, self.owner))
+            pending = self.conn.execute("SELECT id FROM jobs WHERE status = ? AND owner = ? ORDER BY created",
+                                        (QUEUED, self.owner)).fetchall()
+        for row in pending:
+            self._queue.put_nowait(row["id"])
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        job = self._job(job_id)
+        if job is None or job["status"] != QUEUED:
+            return
+        func = self.tasks.get(job["kind"])
+        self._update(job_id, status=RUNNING, progress=0.05, note="Started")
+        progress = lambda fraction, note="": self._update(job_id, progress=float(fraction), note=note)
+        start = time.perf_counter()
+        try:
+            if func is None:
+                raise KeyError(f"No task registered for job kind '{job['kind']}'")
+            result = await asyncio.to_thread(func, json.loads(job["params"]), progress)
+        except Exception as e:
+            if job_id in self._waiters:
+                self._outcomes[job_id] = e
+            self._update(job_id, status=FAILED, error=str(e), note="Failed")
+            outcome = FAILED
+        else:
+            with self.lock, self.conn:
+                if job["result_key"] is not None:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO results (user, result_key, kind, result, created) VALUES (?, ?, ?, ?, ?)",
+                        (job["user"], job["result_key"], job["kind"], json.dumps(result), time.time()))
+                self.conn.execute("UPDATE jobs SET status = ?, progress = 1.0, note = 'Done', updated = ? WHERE id = ?",
+                                  (DONE, time.time(), job_id))
+            if job["result_key"] is None and job_id in self._waiters:
+                self._outcomes[job_id] = result
+            outcome = DONE
+        metrics.JOB_SECONDS.observe(time.perf_counter() - start, kind=job["kind"], outcome=outcome)
+        waiter = self._waiters.pop(job_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
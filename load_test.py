@@ -0,0 +1,171 @@
+"""
+Load generator for the AI-backed dashboard flows.
+
+Simulates many dashboard clients running the same scan, chat and recipe flows
+as handle_upload, send_chat and show_recipe (AI call pushed to a worker thread
+with asyncio.to_thread, then the HealthManager update) against mock_gemini.py,
+and reports p50/p95/p99 latency and throughput per flow. A response only
+counts as a success when ai_engine.is_live() says it is a real answer, not a
+cached/offline fallback or an error message.
+
+Usage:
+    python load_test.py --clients 50 --duration 30                 # spawns a mock server
+    python load_test.py --target http://127.0.0.1:8765 --threads 64
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_gemini import MockConfig, MockGeminiServer
+
+def percentile(samples, q):
+    """Nearest-rank percentile of an unsorted list (q in 0-100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, flow, seconds, ok):
+        self.latencies.setdefault(flow, []).append(seconds * 1000)
+        if not ok:
+            self.errors[flow] = self.errors.get(flow, 0) + 1
+
+    def summary(self, elapsed):
+        flows = {}
+        total = 0
+        for flow, samples in sorted(self.latencies.items()):
+            total += len(samples)
+            flows[flow] = {
+                "requests": len(samples),
+                "errors": self.errors.get(flow, 0),
+                "p50_ms": round(percentile(samples, 50), 1),
+                "p95_ms": round(percentile(samples, 95), 1),
+                "p99_ms": round(percentile(samples, 99), 1),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+            }
+        return {"elapsed_s": round(elapsed, 2), "requests": total, "throughput_rps": round(total / elapsed, 2), "flows": flows}
+
+# --- SIMULATED DASHBOARD FLOWS ---
+
+def build_flows(ai, manager, rng):
+    fake_image = rng.randbytes(64 * 1024)
+
+    async def scan():
+        result = await asyncio.to_thread(ai.analyze_food_image, fake_image)
+        if ai.is_live(result):
+            manager.log_meal(result.get('name', 'Food'), result.get('calories', 0), result.get('protein', 0), result.get('carbs', 0), result.get('fats', 0))
+            return True
+        return False
+
+    async def chat():
+        stats = manager.get_stats()
+        context = f"User: Load Tester. Loc: Chennai. Goal: {stats['goal']}. Cals: {stats['consumed']}/{stats['target']}."
+        response = await asyncio.to_thread(ai.chat_with_ai, "What should I eat after leg day?", context)
+        return ai.is_live(response)
+
+    async def recipe():
+        response = await asyncio.to_thread(ai.generate_recipe, "Light Lentil Soup", "Chennai, India", "🔥 Lose Fat")
+        return ai.is_live(response)
+
+    return {"scan": scan, "chat": chat, "recipe": recipe}
+
+async def client_loop(flows, mix, deadline, think_s, recorder, rng):
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    while time.perf_counter() < deadline:
+        flow = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            ok = await flows[flow]()
+        except Exception:
+            ok = False
+        recorder.record(flow, time.perf_counter() - start, ok)
+        await asyncio.sleep(rng.uniform(0, 2 * think_s))
+
+async def run_load(ai, manager, args):
+    loop = asyncio.get_running_loop()
+    if args.threads:
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=args.threads))
+
+    recorder = Recorder()
+    mix = parse_mix(args.mix)
+    start = time.perf_counter()
+    deadline = start + args.duration
+    tasks = []
+    for i in range(args.clients):
+        rng = random.Random(args.seed + i)
+        flows = build_flows(ai, manager, rng)
+        tasks.append(client_loop(flows, mix, deadline, args.think_ms / 1000, recorder, rng))
+    await asyncio.gather(*tasks)
+    return recorder.summary(time.perf_counter() - start)
+
+def print_report(report):
+    print(f"{'flow':<8} {'reqs':>6} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for flow, s in report["flows"].items():
+        print(f"{flow:<8} {s['requests']:>6} {s['errors']:>7} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['throughput_rps']:>8.2f}")
+    print(f"total    {report['requests']:>6} requests in {report['elapsed_s']}s -> {report['throughput_rps']} req/s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive simulated dashboard clients against a mock Gemini endpoint.")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--mix", default="scan=1,chat=2,recipe=1", help="Weighted flow mix")
+    parser.add_argument("--think-ms", type=float, default=500, help="Mean pause between a client's actions")
+    parser.add_argument("--threads", type=int, default=0, help="Size of the to_thread pool (0 = asyncio default)")
+    parser.add_argument("--target", help="Base URL of an already running mock_gemini.py")
+    parser.add_argument("--latency-ms", type=float, default=800, help="Latency of the spawned mock")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Error rate of the spawned mock")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.target:
+        os.environ["GEMINI_BASE_URL"] = args.target
+    else:
+        server = MockGeminiServer(config=MockConfig(args.latency_ms, args.latency_ms / 4, args.error_rate, seed=args.seed)).start()
+        os.environ["GEMINI_BASE_URL"] = server.url
+
+    # Imported late so ai_engine builds its client against the mock endpoint
+    import ai_engine
+    from health_manager import HealthManager
+
+    workdir = tempfile.mkdtemp(prefix="nutri_load_")
+    try:
+        manager = HealthManager(storage_file=os.path.join(workdir, "user_data.json"))
+        report = asyncio.run(run_load(ai_engine, manager, args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        if server:
+            server.stop()
+
+    report["config"] = {k: v for k, v in vars(args).items() if k != "output"}
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
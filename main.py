@@ -1,6 +1,5 @@
 import os
 import sys
-import math
 # --- PYINSTALLER WINDOWED MODE FIX ---
 # When running as a windowed .exe, there is no console. 
 # Uvicorn tries to write logs to a missing console and crashes. 
@@ -11,32 +10,315 @@ if sys.stderr is None:
     sys.stderr = open(os.devnull, "w")
 # -------------------------------------
 
+import multiprocessing
+if __name__ in {"__main__", "__mp_main__"}:
+    # In the frozen .exe a spawned compute-pool worker re-runs this file; this turns it
+    # into the worker and exits before any of the app below is built
+    multiprocessing.freeze_support()
+
+import functools
+import hashlib
+import hmac
 import json
+import logging
+import tempfile
 import urllib.request
-from datetime import datetime, timedelta
 from nicegui import ui, app
+from fastapi import Request
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 import asyncio
 from health_manager import HealthManager
-from ai_engine import analyze_food_image, chat_with_ai, generate_recipe, analyze_pantry_image, generate_recovery_protocol
-from theme import apply_theme
+from ai_engine import analyze_food_image, chat_with_ai, recipe_text, pantry_text, recovery_protocol_text, fallback_reply
+from theme import apply_theme, toggle_low_power
+from offline import enable_offline
+import metrics
+import profiler
+from analytics import portion_plan, NoPortionPlan, lifestyle_correlations
+from forecasting import WeightForecaster
+from scheduler import DailyRolloverScheduler
+from wearable_ingest import TimeSeriesStore, ingest_file, ingest_samples
+import history_io
+import geocoder
+from job_queue import JobQueue
+from compute_pool import ComputePool
+from imaging import prepare_image
+from blob_store import BlobStore
+import cohorts
+from food_classifier import FoodClassifier
+from suggestions import SuggestionIndex
+from api import create_router, rejection, API_COOKIE, API_TOKEN, JSON_TYPES
 
 # --- INIT & FILE SYSTEM ---
+# Set by cluster.py when several workers run behind the sticky proxy
+WORKER_ID = os.environ.get("NUTRI_WORKER", "")
+PORT = int(os.environ.get("NUTRI_PORT", "8080"))
+
 user_health = HealthManager()
 apply_theme()
+enable_offline()
+
+rollover_scheduler = DailyRolloverScheduler()
+rollover_scheduler.register(user_health)
+app.on_startup(rollover_scheduler.start)
 
 PROGRESS_DIR = 'progress_shots'
-if not os.path.exists(PROGRESS_DIR):
-    os.makedirs(PROGRESS_DIR)
+photo_store = BlobStore(PROGRESS_DIR)
 app.add_static_files('/progress_shots', PROGRESS_DIR)
 
+# --- NEW: PROGRESS PHOTO GARBAGE COLLECTION ---
+PHOTO_GC_INTERVAL_S = 6 * 3600
+
+async def sweep_progress_photos():
+    """
+    Moves legacy flat files into the blob store, then sweeps blobs no log entry references. The file work
+    runs in threads; the progress log is read and relinked on the event loop, like every other profile access.
+    """
+    user_health.reload_if_changed()
+    mapping = await asyncio.to_thread(photo_store.adopt, set(user_health.progress_images()))
+    if mapping:
+        user_health.relink_progress_images(mapping)
+        await asyncio.to_thread(photo_store.drop_legacy, mapping)
+    return await asyncio.to_thread(photo_store.collect, user_health.progress_images())
+
+async def photo_gc_loop():
+    while True:
+        try:
+            stats = await sweep_progress_photos()
+            metrics.PHOTO_STORE_BYTES.set(stats["bytes"])
+            metrics.PHOTO_GC_REMOVED.inc(stats["removed"])
+        except Exception:
+            logging.exception("Progress photo sweep failed")
+        await asyncio.sleep(PHOTO_GC_INTERVAL_S)
+
+def start_photo_gc():
+    asyncio.get_running_loop().create_task(photo_gc_loop())
+
+app.on_startup(start_photo_gc)
+
+if WORKER_ID:
+    @app.middleware('http')
+    async def worker_affinity(request: Request, call_next):
+        """Tags the browser with this worker so the proxy keeps routing it here."""
+        response = await call_next(request)
+        if request.cookies.get('nutri_worker') != WORKER_ID:
+            response.set_cookie('nutri_worker', WORKER_ID, httponly=True, samesite='lax')
+        return response
+
+@app.get('/metrics')
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type='text/plain; version=0.0.4')
+
+# --- NEW: ON-DEMAND PROFILING (ADMIN ONLY) ---
+# Disabled unless NUTRI_ADMIN_TOKEN is set; send it as X-Admin-Token or ?token=
+ADMIN_TOKEN = os.environ.get("NUTRI_ADMIN_TOKEN", "")
+
+def is_admin(request):
+    sent = request.headers.get('x-admin-token') or request.query_params.get('token') or ""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(sent, ADMIN_TOKEN)
+
+@app.post('/admin/profile')
+def start_profile(request: Request, seconds: float = None, handlers: int = None):
+    """Samples this worker for `seconds`, or through the next `handlers` dashboard handlers/refreshes."""
+    if not is_admin(request):
+        return PlainTextResponse('Forbidden', status_code=403)
+    try:
+        return profiler.PROFILER.start(seconds=seconds, handlers=handlers)
+    except ValueError as ex:
+        return PlainTextResponse(str(ex), status_code=400)
+    except RuntimeError as ex:
+        return PlainTextResponse(str(ex), status_code=409)
+
+@app.get('/admin/profile')
+def profile_status(request: Request):
+    if not is_admin(request):
+        return PlainTextResponse('Forbidden', status_code=403)
+    return profiler.PROFILER.status()
+
+@app.delete('/admin/profile')
+async def stop_profile(request: Request):
+    if not is_admin(request):
+        return PlainTextResponse('Forbidden', status_code=403)
+    return await asyncio.to_thread(profiler.PROFILER.stop)
+
+@app.get('/admin/profile/{name}')
+def download_profile(request: Request, name: str):
+    path = os.path.join(profiler.PROFILE_DIR, os.path.basename(name))
+    if not is_admin(request):
+        return PlainTextResponse('Forbidden', status_code=403)
+    if not os.path.isfile(path):
+        return PlainTextResponse('Unknown profile', status_code=404)
+    return FileResponse(path, filename=os.path.basename(path))
+
+# --- NEW: API ACCESS ---
+# JSON bodies must be application/json and uploads must name a file type, neither of which a cross-site
+# <form> can send. NUTRI_API_TOKEN (see api.py) reaches the app's own pages as a same-site cookie.
+UPLOAD_TYPES = ("text/csv", "application/json", "application/x-ndjson", "application/xml", "text/xml",
+                "application/gpx+xml", "application/octet-stream")
+
+def refuse_api(request, body_types=None):
+    refused = rejection(request, body_types)
+    return PlainTextResponse(refused[1], status_code=refused[0]) if refused else None
+
+@app.middleware('http')
+async def api_cookie(request: Request, call_next):
+    response = await call_next(request)
+    if API_TOKEN and response.headers.get('content-type', '').startswith('text/html'):
+        response.set_cookie(API_COOKIE, API_TOKEN, httponly=True, samesite='strict')
+    return response
+
+# --- NEW: WEARABLE INGESTION ---
+WEARABLE_DIR = 'wearable_data'
+wearable_store = TimeSeriesStore(WEARABLE_DIR)
+
+async def import_wearable_file(path, fmt=None):
+    """Parses and buckets the export in a worker thread, then backfills on the event loop, where the UI reads the profile."""
+    summary = await asyncio.to_thread(ingest_file, path, wearable_store, fmt, user_health.tzinfo())
+    user_health.backfill_activity(wearable_store.iter_days(summary.pop("day_ordinals")))
+    return summary
+
+@app.post('/api/wearable/samples')
+async def wearable_webhook(request: Request):
+    """Live push from a companion app: {"samples": [{"start": "...", "steps": 120, "calories": 5}]}"""
+    refused = refuse_api(request, JSON_TYPES)
+    if refused:
+        return refused
+    try:
+        payload = await request.json()
+    except ValueError:
+        return PlainTextResponse('Body must be JSON', status_code=400)
+    samples = payload.get("samples", []) if isinstance(payload, dict) else payload
+    if not isinstance(samples, list):
+        return PlainTextResponse('samples must be a list', status_code=400)
+    count, days = await asyncio.to_thread(ingest_samples, samples, wearable_store, user_health.tzinfo())
+    user_health.backfill_activity(wearable_store.iter_days(days))
+    return {"records": count, "days": len(days)}
+
+@app.post('/api/wearable/import')
+async def wearable_import(request: Request, filename: str = "export.csv", format: str = None):
+    """Bulk export upload. The body is spooled to disk chunk by chunk, never held in memory."""
+    refused = refuse_api(request, UPLOAD_TYPES)
+    if refused:
+        return refused
+    suffix = os.path.splitext(filename)[1] or ".csv"
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        async for chunk in request.stream():
+            tmp.write(chunk)
+    try:
+        return await import_wearable_file(tmp.name, format)
+    finally:
+        os.remove(tmp.name)
+
+# --- NEW: HISTORY IMPORT / EXPORT ---
+EXPORT_TYPES = {"csv": "text/csv", "json": "application/x-ndjson"}
+
+@app.post('/api/history/import')
+async def history_import(request: Request, filename: str = "history.csv", format: str = None):
+    """MyFitnessPal/Cronometer style export upload, spooled to disk like the wearable import."""
+    refused = refuse_api(request, UPLOAD_TYPES)
+    if refused:
+        return refused
+    suffix = os.path.splitext(filename)[1] or ".csv"
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        async for chunk in request.stream():
+            tmp.write(chunk)
+    try:
+        return await asyncio.to_thread(history_io.import_file, tmp.name, user_health, format)
+    finally:
+        os.remove(tmp.name)
+
+@app.get('/api/history/export')
+def history_export(request: Request, format: str = "csv"):
+    refused = refuse_api(request)
+    if refused:
+        return refused
+    if format not in EXPORT_TYPES:
+        return PlainTextResponse('format must be csv or json', status_code=400)
+    extension = "csv" if format == "csv" else "jsonl"
+    return StreamingResponse(history_io.iter_export(user_health, format), media_type=EXPORT_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="nutri_history.{extension}"'})
+
+# --- NEW: BACKGROUND AI JOBS ---
+JOB_INPUT_DIR = 'job_inputs'
+os.makedirs(JOB_INPUT_DIR, exist_ok=True)
+job_queue = JobQueue('jobs.db', workers=4, owner=WORKER_ID)
+app.on_startup(job_queue.start)
+
+def result_key(kind, *parts):
+    return hashlib.sha256(json.dumps([kind, *parts]).encode()).hexdigest()
+
+def recipe_job(params, progress):
+    progress(0.3, "Curating recipe")
+    return recipe_text(params["food_name"], params["location"], params["goal"])
+
+def pantry_job(params, progress):
+    try:
+        with open(params["image_path"], 'rb') as f:
+            image_bytes = f.read()
+        progress(0.3, "Analyzing ingredients")
+        return pantry_text(image_bytes, params["location"], params["goal"], params["mime_type"])
+    finally:
+        if os.path.exists(params["image_path"]):
+            os.remove(params["image_path"])
+
+def recovery_job(params, progress):
+    progress(0.3, "Generating protocol")
+    return recovery_protocol_text(params["strain"], params["location"])
+
+job_queue.register("generate_recipe", recipe_job)
+job_queue.register("analyze_pantry_image", pantry_job)
+job_queue.register("generate_recovery_protocol", recovery_job)
+
+async def run_ai_job(kind, params, key, fields, image_bytes=None):
+    """Submits (or reuses) a job and waits for it. The job keeps running if this client goes away."""
+    job_id = job_queue.submit(user_health.user_id, kind, params, key)
+    try:
+        return await job_queue.wait(job_id)
+    except Exception as ex:
+        return fallback_reply(kind, fields, ex, image_bytes) or f"**System Error:** {str(ex)}"
+
+@app.get('/api/jobs/{job_id}')
+def job_status(request: Request, job_id: str):
+    refused = refuse_api(request)
+    if refused:
+        return refused
+    return job_queue.status(job_id) or PlainTextResponse('Unknown job', status_code=404)
+
+weight_forecaster = WeightForecaster(method="huber")
+
+# --- NEW: PROCESS POOL FOR CPU-HEAVY WORK ---
+compute_pool = ComputePool()
+app.on_startup(compute_pool.start)
+app.on_shutdown(compute_pool.shutdown)
+
+# --- NEW: ON-DEVICE FOOD RECOGNITION (BEFORE GEMINI) ---
+food_classifier = FoodClassifier(compute_pool.run)
+
+# --- NEW: GOAL COHORT BENCHMARKS ---
+# Rebuilt once a day in the pool; the dashboard only ever reads the small precomputed table
+COHORT_CHECK_INTERVAL_S = 3600
+cohort_table = cohorts.CohortTable()
+
+async def cohort_loop():
+    while True:
+        try:
+            if await compute_pool.run(cohorts.refresh, size=compute_pool.inline_max + 1):
+                stats_panel.refresh()
+        except Exception:
+            logging.exception("Cohort aggregation failed")
+        await asyncio.sleep(COHORT_CHECK_INTERVAL_S)
+
+def start_cohort_loop():
+    asyncio.get_running_loop().create_task(cohort_loop())
+
+app.on_startup(start_cohort_loop)
+
+# --- NEW: JSON API FOR MOBILE & INTEGRATIONS ---
+app.include_router(create_router(user_health, compute_pool, weight_forecaster))
+
 # --- CONSTANTS & LOGIC ---
 GOAL_OPTIONS = ["🔥 Lose Fat", "🥗 Eat Healthy", "🚫 Cut Sugar", "🏋️ Strength & Recovery"]
-GOAL_SUGGESTIONS = {
-    "🔥 Lose Fat": ["High-Protein Salad Bowl", "Metabolism-Boosting Tea", "Light Lentil Soup"],
-    "🥗 Eat Healthy": ["Mixed Veggie Stir-fry", "Fresh Local Fruit Bowl", "Wholesome Grain Wrap"],
-    "🚫 Cut Sugar": ["Spiced Yogurt", "Roasted Nuts & Seeds", "Herbal Infusion"],
-    "🏋️ Strength & Recovery": ["Post-Workout Protein Shake", "Lean Meat & Sweet Potato", "Protein-Rich Legume Dish"]
-}
+# Ranked against what is left of today's macros; see suggestions.py
+suggestion_index = SuggestionIndex()
 
 class State:
     def __init__(self):
@@ -55,38 +337,6 @@ class State:
 
 state = State()
 
-# --- NEW: MATH ALGORITHM ---
-def solve_gauss_jordan(matrix, targets):
-    """Solves a 3x3 system of linear equations using Gauss-Jordan elimination."""
-    # Create the augmented matrix
-    aug = [matrix[i] + [targets[i]] for i in range(3)]
-    
-    for i in range(3):
-        # Find pivot
-        pivot = aug[i][i]
-        if pivot == 0:
-            # Swap rows if pivot is zero
-            for j in range(i+1, 3):
-                if aug[j][i] != 0:
-                    aug[i], aug[j] = aug[j], aug[i]
-                    pivot = aug[i][i]
-                    break
-            if pivot == 0: return None # Singular matrix (foods have identical macro profiles)
-            
-        # Divide row by pivot
-        for j in range(4):
-            aug[i][j] /= pivot
-            
-        # Eliminate other rows
-        for k in range(3):
-            if k != i:
-                factor = aug[k][i]
-                for j in range(4):
-                    aug[k][j] -= factor * aug[i][j]
-                    
-    return [aug[0][3], aug[1][3], aug[2][3]]
-
-
 # Add variables to track the optimizer's state
 state.opt_targets = {'p': 50, 'c': 60, 'f': 20}
 state.opt_foods = [
@@ -96,25 +346,6 @@ state.opt_foods = [
 ]
 state.opt_results = ""
 
-def pearson_correlation(x, y):
-    """Calculates the linear relationship between two lifestyle variables."""
-    n = len(x)
-    if n < 3: return 0.0
-    
-    mean_x = sum(x) / n
-    mean_y = sum(y) / n
-    
-    # Prevent divide-by-zero if data is entirely flat/identical
-    if all(xi == mean_x for xi in x) or all(yi == mean_y for yi in y):
-        return 0.0
-        
-    numerator = sum((xi - mean_x) * (yi - mean_y) for xi, yi in zip(x, y))
-    sum_sq_x = sum((xi - mean_x)**2 for xi in x)
-    sum_sq_y = sum((yi - mean_y)**2 for yi in y)
-    
-    denominator = math.sqrt(sum_sq_x * sum_sq_y)
-    return numerator / denominator if denominator != 0 else 0.0
-
 # --- DIALOGS & ONBOARDING ---
 
 recipe_dialog = ui.dialog()
@@ -135,20 +366,12 @@ with settings_dialog, ui.card().classes('w-full max-w-sm glass-card p-6'):
         async def fetch_location():
             try:
                 ui.notify("Requesting location permissions...", color='info', icon='place')
+                # The browser only supplies coordinates; the city is resolved on the server from the bundled gazetteer
                 js_code = '''
                     return new Promise((resolve) => {
                         if (!navigator.geolocation) resolve({error: 'Geolocation not supported'});
                         else navigator.geolocation.getCurrentPosition(
-                            async (pos) => {
-                                try {
-                                    const url = `https://nominatim.openstreetmap.org/reverse?format=json&lat=${pos.coords.latitude}&lon=${pos.coords.longitude}`;
-                                    const res = await fetch(url, { headers: { 'Accept-Language': 'en-US,en;q=0.9' }});
-                                    const data = await res.json();
-                                    resolve({success: true, address: data.address});
-                                } catch (err) {
-                                    resolve({error: 'Browser could not reach the Maps API.'});
-                                }
-                            },
+                            (pos) => resolve({success: true, lat: pos.coords.latitude, lon: pos.coords.longitude}),
                             (err) => resolve({error: 'Location permission was denied.'})
                         );
                     });
@@ -156,13 +379,12 @@ with settings_dialog, ui.card().classes('w-full max-w-sm glass-card p-6'):
                 result = await ui.run_javascript(js_code, timeout=10.0)
                 
                 if result and result.get('success'):
-                    addr = result.get('address', {})
-                    city = addr.get('suburb', addr.get('city', addr.get('town', addr.get('county', 'Unknown Area'))))
-                    state_region = addr.get('state', '')
-                    country = addr.get('country', '')
-                    
-                    input_location.value = ", ".join(filter(bool, [city, state_region, country]))
-                    ui.notify("Location successfully detected!", color='positive', icon='check')
+                    place = await asyncio.to_thread(geocoder.reverse, result['lat'], result['lon'])
+                    if place:
+                        input_location.value = place['label']
+                        ui.notify("Location successfully detected!", color='positive', icon='check')
+                    else:
+                        ui.notify("No known city nearby. Please type your location.", color='warning')
                 else:
                     ui.notify(result.get('error', 'Failed to get location'), color='warning')
             except TimeoutError:
@@ -217,18 +439,63 @@ with settings_dialog, ui.card().classes('w-full max-w-sm glass-card p-6'):
 
 ui.timer(0.5, lambda: settings_dialog.open() if not state.name else None, once=True)
 
+async def detect_timezone():
+    """Lets the midnight rollover follow the user's clock rather than the server's."""
+    try:
+        tz = await ui.run_javascript('Intl.DateTimeFormat().resolvedOptions().timeZone', timeout=5.0)
+        if tz:
+            user_health.set_timezone(tz)
+    except Exception:
+        pass
+
+ui.timer(1.0, detect_timezone, once=True)
+
+def sync_from_other_workers():
+    """In cluster mode another process may have written the shared profile (e.g. a wearable webhook)."""
+    if user_health.reload_if_changed():
+        stats_panel.refresh()
+        smart_suggestions.refresh()
+        weekly_chart.refresh()
+        streak_panel.refresh()
+
+if WORKER_ID:
+    ui.timer(2.0, sync_from_other_workers)
+
+wearable_dialog = ui.dialog()
+with wearable_dialog, ui.card().classes('w-full max-w-sm glass-card p-6'):
+    ui.label('Import Wearable Data').classes('text-xl font-bold accessible-text mb-2')
+    ui.label('Upload a Google Fit CSV/JSON, Apple Health export.xml or a GPX track. Steps and burned calories are backfilled into your history.').classes('text-xs text-gray-600 mb-4 leading-tight')
+    ui.upload(label="📂 SELECT EXPORT FILE", on_upload=lambda e: handle_wearable_upload(e), auto_upload=True, max_files=1) \
+        .props('color=green-7 flat accept=".csv,.json,.jsonl,.xml,.gpx"').classes('w-full')
+    ui.button('CLOSE', on_click=wearable_dialog.close, color='green-8').classes('w-full mt-4 shadow-md rounded-lg')
+
+history_dialog = ui.dialog()
+with history_dialog, ui.card().classes('w-full max-w-sm glass-card p-6'):
+    ui.label('Nutrition History').classes('text-xl font-bold accessible-text mb-2')
+    ui.label('Import a MyFitnessPal or Cronometer CSV/JSON export, or download everything you have logged. Imported days replace what is stored for those days.').classes('text-xs text-gray-600 mb-4 leading-tight')
+    ui.upload(label="📂 IMPORT HISTORY FILE", on_upload=lambda e: handle_history_upload(e), auto_upload=True, max_files=1) \
+        .props('color=green-7 flat accept=".csv,.json,.jsonl"').classes('w-full')
+    with ui.row().classes('w-full gap-2 mt-2'):
+        ui.button('EXPORT CSV', on_click=lambda: ui.download('/api/history/export?format=csv'), color='green-7').classes('flex-1 rounded-lg')
+        ui.button('EXPORT JSONL', on_click=lambda: ui.download('/api/history/export?format=json'), color='green-7').classes('flex-1 rounded-lg')
+    ui.button('CLOSE', on_click=history_dialog.close, color='green-8').classes('w-full mt-4 shadow-md rounded-lg')
+
 # --- ASYNC EVENT HANDLERS ---
 
+@profiler.profiled()
 async def show_recipe(food_name):
     recipe_title.text = f"Curating {food_name}..."
     recipe_content.content = ""
     recipe_spinner.visible = True
     recipe_dialog.open()
-    result = await asyncio.to_thread(generate_recipe, food_name, state.location, state.current_goal)
+    fields = {"food_name": food_name, "location": state.location, "goal": state.current_goal}
+    # No result key: every click is a fresh recipe, as it always was; the job still survives the tab closing
+    result = await run_ai_job("generate_recipe", fields, None, fields)
     recipe_title.text = f"🍽️ {food_name}"
     recipe_spinner.visible = False
     recipe_content.content = result
 
+@profiler.profiled()
 async def handle_pantry_upload(e):
     ui.notify("Alchemist activated! Analyzing fridge...", color="purple", icon="science")
     recipe_title.text = "🧪 The Alchemist is analyzing your ingredients..."
@@ -250,8 +517,18 @@ async def handle_pantry_upload(e):
         if filename.endswith('.png'): mime_type = "image/png"
         elif filename.endswith('.webp'): mime_type = "image/webp"
         elif filename.endswith(('.heic', '.heif')): mime_type = "image/heic"
-
-        result = await asyncio.to_thread(analyze_pantry_image, image_bytes, state.location, state.current_goal, mime_type)
+        # Any real photo is past the pool's inline threshold, so decoding never runs on the event loop
+        image_bytes, mime_type = await compute_pool.run(prepare_image, image_bytes, mime_type, size=len(image_bytes))
+
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        key = result_key("analyze_pantry_image", image_hash, state.location, state.current_goal)
+        image_path = os.path.join(JOB_INPUT_DIR, f"{image_hash}.img")
+        if job_queue.result(user_health.user_id, key) is None:
+            with open(image_path, 'wb') as f:
+                f.write(image_bytes)
+        params = {"image_path": image_path, "location": state.location, "goal": state.current_goal, "mime_type": mime_type}
+        fields = {"location": state.location, "goal": state.current_goal}
+        result = await run_ai_job("analyze_pantry_image", params, key, fields, image_bytes)
         
         recipe_title.text = "✨ Your Custom Pantry Recipes"
         recipe_spinner.visible = False
@@ -265,29 +542,96 @@ async def handle_pantry_upload(e):
 
 async def sync_watch():
     ui.notify("Syncing with wearable...", color='info')
-    await asyncio.sleep(1) 
-    updates = user_health.sync_smartwatch()
+    wearable_store.reload_if_changed()
+    # The day the live counters belong to, in the user's timezone rather than the server's
+    steps, burned = wearable_store.day_totals(user_health.data["current_date"])
+    updates = user_health.sync_smartwatch(steps, burned)
     stats_panel.refresh()
+    smart_suggestions.refresh()
     weekly_chart.refresh() 
-    ui.notify(f"Synced: +{updates['steps']} steps!", color='positive', icon='watch')
+    if updates['steps']:
+        ui.notify(f"Synced: +{updates['steps']} steps!", color='positive', icon='watch')
+    else:
+        ui.notify("No new wearable data yet. Import an export or connect the sync webhook.", color='info', icon='watch')
+
+async def spool_upload(e):
+    """Copies an uploaded file to a temp file in chunks and returns its path. The caller removes it."""
+    filename = e.file.name if hasattr(e, 'file') else e.name
+    suffix = os.path.splitext(filename)[1] or ".csv"
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        if hasattr(e, 'content'):
+            # Older NiceGUI hands us a spooled file, so copy it across in chunks
+            e.content.seek(0)
+            while chunk := e.content.read(1024 * 1024):
+                tmp.write(chunk)
+        else:
+            content = e.file.read()
+            tmp.write(await content if asyncio.iscoroutine(content) else content)
+    return tmp.name
+
+async def handle_wearable_upload(e):
+    ui.notify("Importing wearable export...", color='info', icon='upload_file')
+    try:
+        path = await spool_upload(e)
+        try:
+            summary = await import_wearable_file(path)
+        finally:
+            os.remove(path)
+        wearable_dialog.close()
+        stats_panel.refresh()
+        smart_suggestions.refresh()
+        weekly_chart.refresh()
+        data_insights.refresh()
+        ui.notify(f"Imported {summary['records']} records across {summary['days']} days in {summary['seconds']}s.", color='positive', icon='check')
+    except Exception as ex:
+        ui.notify(f"Import failed: {str(ex)}", color='negative')
+
+async def handle_history_upload(e):
+    ui.notify("Importing nutrition history...", color='info', icon='upload_file')
+    try:
+        path = await spool_upload(e)
+        try:
+            summary = await asyncio.to_thread(history_io.import_file, path, user_health)
+        finally:
+            os.remove(path)
+        history_dialog.close()
+        stats_panel.refresh()
+        smart_suggestions.refresh()
+        weekly_chart.refresh()
+        data_insights.refresh()
+        ui.notify(f"Imported {summary['rows']} rows across {summary['days']} days ({summary['rows_per_sec']} rows/s).", color='positive', icon='check')
+    except Exception as ex:
+        ui.notify(f"Import failed: {str(ex)}", color='negative')
+
+async def switch_low_power():
+    enabled = await toggle_low_power()
+    ui.notify("Low-power mode on: effects and animations off." if enabled else "Low-power mode off.", color='info', icon='eco')
 
 def trigger_reset():
     user_health.force_reset_today()
     stats_panel.refresh()
+    smart_suggestions.refresh()
     weekly_chart.refresh()
+    meal_timeline.refresh()
     ui.notify("Today's data has been reset!", color='warning', icon='refresh')
 
+@profiler.profiled()
 async def handle_upload(e):
     state.is_scanning = True
     scan_area.refresh()
     try:
         content = e.file.read() if hasattr(e, 'file') else e.content.read()
         image_bytes = await content if asyncio.iscoroutine(content) else content
-        result = await asyncio.to_thread(analyze_food_image, image_bytes)
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        image_bytes, _ = await compute_pool.run(prepare_image, image_bytes, size=len(image_bytes))
+        result = await food_classifier.recognize(image_bytes)
+        if result is None:
+            result = await asyncio.to_thread(analyze_food_image, image_bytes)
         
         if isinstance(result, dict) and "error" in result:
             state.scan_result = {"error": result.get("message", "API Error occurred.")}
         else:
+            result["image_hash"] = image_hash
             state.scan_result = result
     except Exception as ex:
         state.scan_result = {"error": f"Internal Error: {str(ex)}"}
@@ -295,6 +639,7 @@ async def handle_upload(e):
         state.is_scanning = False
         scan_area.refresh()
 
+@profiler.profiled()
 async def handle_progress_upload(e):
     try:
         try:
@@ -304,17 +649,12 @@ async def handle_progress_upload(e):
             return
 
         filename = e.file.name if hasattr(e, 'file') else e.name
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        safe_filename = f"progress_{timestamp}_{filename}"
-        filepath = os.path.join(PROGRESS_DIR, safe_filename)
-        
         content = e.file.read() if hasattr(e, 'file') else e.content.read()
         image_bytes = await content if asyncio.iscoroutine(content) else content
         
-        with open(filepath, 'wb') as f:
-            f.write(image_bytes)
-            
-        user_health.log_progress(safe_filename, weight_val)
+        # Blob first, log entry second: a failure in between leaves an orphan for the sweep, never a dangling entry
+        key = await asyncio.to_thread(photo_store.put, image_bytes, filename)
+        user_health.log_progress(key, weight_val)
         
         progress_gallery.refresh()
         predictive_analytics.refresh() 
@@ -324,27 +664,39 @@ async def handle_progress_upload(e):
 
 async def delete_progress_photo(filename):
     try:
-        filepath = os.path.join(PROGRESS_DIR, filename)
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        user_health.delete_progress_entry(filename)
+        # Entry first, file second, and only once no other entry shares the photo
+        if user_health.delete_progress_entry(filename) == 0:
+            await asyncio.to_thread(photo_store.release, filename)
         progress_gallery.refresh()
         predictive_analytics.refresh()
         ui.notify("Photo deleted successfully.", color='info', icon='delete')
     except Exception as ex:
         ui.notify(f"Error deleting photo: {str(ex)}", color='negative')
 
+@profiler.profiled()
 def log_meal():
     if state.scan_result and "error" not in state.scan_result:
         res = state.scan_result
-        user_health.log_meal(res.get('name', 'Food'), res.get('calories', 0), res.get('protein', 0), res.get('carbs', 0), res.get('fats', 0))
+        user_health.log_meal(res.get('name', 'Food'), res.get('calories', 0), res.get('protein', 0), res.get('carbs', 0), res.get('fats', 0), res.get('image_hash'))
         state.scan_result = None
         scan_area.refresh()
         stats_panel.refresh()
+        smart_suggestions.refresh()
         weekly_chart.refresh()
+        meal_timeline.refresh()
         ui.notify("Meal securely logged!", color='positive', icon='check_circle')
 
+def undo_meal(meal_id):
+    meal = user_health.undo_meal(meal_id)
+    if meal:
+        stats_panel.refresh()
+        smart_suggestions.refresh()
+        weekly_chart.refresh()
+        meal_timeline.refresh()
+        ui.notify(f"Removed {meal['name']} ({meal['calories']} kcal).", color='info', icon='undo')
+
 
+@profiler.profiled()
 async def send_chat():
     if not state.chat_input.strip(): return
     text = state.chat_input
@@ -362,6 +714,7 @@ async def send_chat():
 # --- REFRESHABLE UI COMPONENTS ---
 
 @ui.refreshable
+@metrics.timed_render('profile_sidebar')
 def profile_sidebar():
     with ui.card().classes('w-full glass-card p-5 border-t-4 border-green-500 relative'):
         ui.button(icon='settings', on_click=settings_dialog.open).props('flat round color=green-8 size=sm').classes('absolute top-2 right-2')
@@ -378,16 +731,18 @@ def profile_sidebar():
         ui.label(f"Target Weight: {state.target_weight} kg").classes('text-xs text-center w-full text-green-800 font-bold mb-2')
 
 @ui.refreshable
+@metrics.timed_render('smart_suggestions')
 def smart_suggestions():
     with ui.column().classes('w-full gap-4'):
         with ui.card().classes('w-full glass-card p-4'):
             ui.label('💡 RECOMMENDED EATS').classes('text-xs font-bold text-green-800 tracking-wider mb-2')
-            ui.label('Click for localized recipes!').classes('text-[10px] text-gray-500 mb-3 italic')
-            suggestions = GOAL_SUGGESTIONS.get(state.current_goal, [])
+            ui.label('Fits what is left of your day. Click for localized recipes!').classes('text-[10px] text-gray-500 mb-3 italic')
+            suggestions = suggestion_index.suggest(state.current_goal, user_health.get_stats())
             for food in suggestions:
-                ui.button(food, on_click=lambda f=food: show_recipe(f), icon='auto_awesome') \
+                ui.button(f"{food['name']} · {food['calories']} kcal", on_click=lambda f=food['name']: show_recipe(f), icon='auto_awesome') \
                     .classes('w-full justify-start text-sm text-green-900 bg-white/40 hover:bg-green-100 mb-2 rounded-lg shadow-sm normal-case') \
-                    .props('flat')
+                    .props('flat') \
+                    .tooltip(f"{food['serving']} · P:{food['protein']}g C:{food['carbs']}g F:{food['fats']}g")
         
         with ui.card().classes('w-full glass-card p-4 border-l-4 border-purple-500'):
             with ui.row().classes('items-center gap-2 mb-2'):
@@ -399,6 +754,7 @@ def smart_suggestions():
                     .props('color=purple-6 flat').classes('w-full')
 
 @ui.refreshable
+@metrics.timed_render('stats_panel')
 def stats_panel():
     d = user_health.get_stats()
     with ui.row().classes('w-full grid grid-cols-3 gap-4 mb-4'):
@@ -414,9 +770,18 @@ def stats_panel():
             ui.label('STEPS').classes('text-green-800 text-xs font-bold tracking-wide')
             ui.label(f"{d['steps']}").classes('text-3xl font-bold accessible-text')
             ui.label('today').classes('text-xs text-green-700')
+    # You vs. users with the same goal, from the nightly cohort table
+    bench = cohort_table.compare(d['goal'], user_health.get_recent_averages())
+    if bench:
+        with ui.row().classes('w-full justify-center gap-2 -mt-2 mb-4'):
+            for metric, label in (('consumed', 'calories'), ('protein', 'protein'), ('steps', 'steps')):
+                if metric in bench:
+                    ui.label(f"{label}: higher than {bench[metric]}% of days").classes('text-[10px] font-bold text-green-800 bg-white/50 px-2 py-1 rounded-full')
+            ui.label(f"7-day average vs. {cohort_table.cohort_size(d['goal'])} {d['goal']} users").classes('text-[10px] text-gray-600 italic')
 
 # --- NEW: ALGORITHMIC MEAL PREP UI ---
 @ui.refreshable
+@metrics.timed_render('meal_optimizer')
 def meal_optimizer():
     with ui.column().classes('w-full mt-2'):
         ui.label("Enter your target macros and the nutritional value (per 100g) of 3 ingredients. The algorithm will calculate the perfect portion sizes.").classes('text-xs text-gray-600 mb-2 leading-tight')
@@ -435,35 +800,12 @@ def meal_optimizer():
                 ui.input('C', value=state.opt_foods[i]['c']).bind_value(state.opt_foods[i], 'c').classes('w-1/6').props('outlined dense color=orange-7 type=number')
                 ui.input('F', value=state.opt_foods[i]['f']).bind_value(state.opt_foods[i], 'f').classes('w-1/6').props('outlined dense color=orange-7 type=number')
 
-        def calculate_portions():
+        async def calculate_portions():
             try:
-                # Extract targets
-                tp = float(state.opt_targets['p'])
-                tc = float(state.opt_targets['c'])
-                tf = float(state.opt_targets['f'])
-                
-                # Build the 3x3 matrix (macros per 1 gram)
-                matrix = []
-                for f in state.opt_foods:
-                    matrix.append([float(f['p'])/100, float(f['c'])/100, float(f['f'])/100])
-                
-                # Transpose matrix for the equation Ax = b
-                A = [[matrix[j][i] for j in range(3)] for i in range(3)]
-                b = [tp, tc, tf]
-                
-                # Run the algorithm
-                solution = solve_gauss_jordan(A, b)
-                
-                if not solution:
-                    state.opt_results = "Error: Foods are too nutritionally similar to solve."
-                else:
-                    g1, g2, g3 = solution
-                    # Check for mathematically correct but physically impossible negative weights
-                    if g1 < 0 or g2 < 0 or g3 < 0:
-                        state.opt_results = "Math Error: Impossible to hit these exact targets without negative food. Try swapping an ingredient!"
-                    else:
-                        state.opt_results = f"🎯 **Perfect Prep:** \n- {g1:.1f}g of {state.opt_foods[0]['name']} \n- {g2:.1f}g of {state.opt_foods[1]['name']} \n- {g3:.1f}g of {state.opt_foods[2]['name']}"
-                
+                g1, g2, g3 = await compute_pool.run(portion_plan, state.opt_foods, state.opt_targets, size=9)
+                state.opt_results = f"🎯 **Perfect Prep:** \n- {g1:.1f}g of {state.opt_foods[0]['name']} \n- {g2:.1f}g of {state.opt_foods[1]['name']} \n- {g3:.1f}g of {state.opt_foods[2]['name']}"
+            except NoPortionPlan as ex:
+                state.opt_results = f"Error: {ex}"
             except ValueError:
                 state.opt_results = "Please ensure all macro fields contain valid numbers."
             
@@ -476,6 +818,7 @@ def meal_optimizer():
                 ui.markdown(state.opt_results).classes('text-sm text-orange-900')
 
 @ui.refreshable
+@metrics.timed_render('weekly_chart')
 def weekly_chart():
     data = user_health.get_weekly_history()
     chart_config = {
@@ -498,52 +841,37 @@ def weekly_chart():
 
 # --- NEW: DATA CORRELATION MATRIX ---
 @ui.refreshable
-def data_insights():
-    history = user_health.data.get("history", {})
-    today = user_health.data.get("current_date")
-    
-    # Merge today's live data with history for real-time analysis
-    full_data = history.copy()
-    full_data[today] = {
-        "consumed": user_health.data.get("consumed", 0),
-        "protein": user_health.data.get("protein", 0),
-        "carbs": user_health.data.get("carbs", 0),
-        "fats": user_health.data.get("fats", 0),
-        "steps": user_health.data.get("steps", 0)
-    }
-    
-    # Filter out empty days to avoid mathematically skewed data
-    valid_days = [d for d in full_data.values() if d.get("consumed", 0) > 0 or d.get("steps", 0) > 0]
+@metrics.timed_render('data_insights')
+async def data_insights():
+    # Archived days come straight out of the mapped history columns, with today's live counters appended
+    daily = user_health.get_daily_columns(("consumed", "protein", "carbs", "steps"))
+    # Years of history go to the process pool; a newer refresh supersedes a queued one
+    logged_days, r = await compute_pool.run(lifestyle_correlations, daily, size=len(daily["consumed"]) * 3,
+                                            key=f"{user_health.user_id}:data_insights")
     
-    if len(valid_days) < 4:
+    if logged_days < 4:
         with ui.card().classes('w-full glass-card p-6 flex flex-col items-center text-center border-dashed border-2 border-indigo-300'):
             ui.icon('hub', size='3em', color='indigo-400').classes('mb-2')
             ui.label("Gathering Intelligence...").classes('text-lg font-bold text-indigo-900')
-            ui.label(f"The Correlation Matrix needs at least 4 days of logged data to find hidden lifestyle patterns. Currently logged: {len(valid_days)} days.").classes('text-sm text-indigo-700 mt-2')
+            ui.label(f"The Correlation Matrix needs at least 4 days of logged data to find hidden lifestyle patterns. Currently logged: {logged_days} days.").classes('text-sm text-indigo-700 mt-2')
         return
 
-    # Extract arrays for the Pearson algorithm
-    cals = [d.get("consumed", 0) for d in valid_days]
-    steps = [d.get("steps", 0) for d in valid_days]
-    carbs = [d.get("carbs", 0) for d in valid_days]
-    protein = [d.get("protein", 0) for d in valid_days]
-    
     insights = []
     
     # 1. Carbs vs Steps (Energy correlation)
-    r_carbs_steps = pearson_correlation(carbs, steps)
+    r_carbs_steps = r[("carbs", "steps")]
     if r_carbs_steps > 0.6:
         insights.append(("🔋 High Energy Pattern", f"Strong positive correlation ({r_carbs_steps:.2f}). On days you eat more carbs, you tend to take significantly more steps!"))
     elif r_carbs_steps < -0.6:
         insights.append(("🛋️ Carb Coma Detected", f"Negative correlation ({r_carbs_steps:.2f}). High carb days are strongly linked to lower step counts. Consider adjusting meal timing."))
 
     # 2. Protein vs Calories (Satiety correlation)
-    r_prot_cals = pearson_correlation(protein, cals)
+    r_prot_cals = r[("protein", "consumed")]
     if r_prot_cals < -0.5:
         insights.append(("🥩 Satiety Effect", f"Negative correlation ({r_prot_cals:.2f}). Eating more protein is helping you naturally consume fewer total calories."))
         
     # 3. Steps vs Calories (Appetite correlation)
-    r_steps_cals = pearson_correlation(steps, cals)
+    r_steps_cals = r[("steps", "consumed")]
     if r_steps_cals > 0.7:
         insights.append(("🏃 Active Appetite", f"Positive correlation ({r_steps_cals:.2f}). High step days strongly trigger hunger, leading to higher calorie intake. Monitor post-workout snacking."))
         
@@ -559,10 +887,11 @@ def data_insights():
                     ui.label(text).classes('text-xs text-indigo-800 leading-tight')
 
 @ui.refreshable
-def predictive_analytics():
-    log = user_health.get_progress_log()
+@metrics.timed_render('predictive_analytics')
+async def predictive_analytics():
+    series = user_health.get_progress_series()
     
-    if len(log) < 2:
+    if len(series) < 2:
         with ui.card().classes('w-full glass-card p-6 flex flex-col items-center justify-center text-center border-dashed border-2 border-blue-300'):
             ui.icon('insights', size='3em', color='blue-400').classes('mb-2')
             ui.label("Data Insufficient").classes('text-lg font-bold text-blue-900')
@@ -570,46 +899,16 @@ def predictive_analytics():
         return
 
     try:
-        parsed_data = []
-        for entry in log:
-            try:
-                dt = datetime.strptime(entry["date"], "%b %d, %Y")
-                w = float(entry["weight"])
-                parsed_data.append((dt, w))
-            except (ValueError, TypeError):
-                continue
-                
-        if len(parsed_data) < 2: return
-            
-        parsed_data.sort(key=lambda x: x[0]) 
-        start_date = parsed_data[0][0]
-        
-        xs = [(p[0] - start_date).days for p in parsed_data]
-        ys = [p[1] for p in parsed_data]
-        
-        n = len(xs)
-        sum_x = sum(xs)
-        sum_y = sum(ys)
-        sum_xy = sum(x*y for x, y in zip(xs, ys))
-        sum_xx = sum(x*x for x in xs)
-        
-        denominator = (n * sum_xx) - (sum_x ** 2)
-        slope = 0 if denominator == 0 else ((n * sum_xy) - (sum_x * sum_y)) / denominator
-        intercept = (sum_y - (slope * sum_x)) / n
-        
-        dates_out = []
-        weights_out = []
-        projected_dates = []
-        projected_weights = []
-        
-        for x in xs:
-            dates_out.append((start_date + timedelta(days=x)).strftime("%b %d"))
-            weights_out.append(round((slope * x) + intercept, 1))
-            
-        last_x = xs[-1]
-        for future_x in range(last_x, last_x + 30, 5):
-            projected_dates.append((start_date + timedelta(days=future_x)).strftime("%b %d"))
-            projected_weights.append(round((slope * future_x) + intercept, 1))
+        # Memoized on the progress log revision, so re-renders don't refit; long logs fit in the pool
+        run = functools.partial(compute_pool.run, size=len(series), key=f"{user_health.user_id}:forecast")
+        fit = await weight_forecaster.forecast_async(series, run)
+        slope = fit["slope"]
+        dates_out = fit["dates"]
+        weights_out = fit["smoothed"]
+        projected_dates = fit["projected_dates"]
+        projected_weights = fit["projected"]
+        pad_history = [None] * (len(projected_dates)-1)
+        pad_forecast = [None] * (len(weights_out)-1)
             
         if slope < -0.01:
             trend_text = f"📉 Trending Down: Losing approx {abs(slope*7):.1f} kg per week."
@@ -624,7 +923,7 @@ def predictive_analytics():
             
             chart_config = {
                 'tooltip': {'trigger': 'axis'},
-                'legend': {'data': ['Historical Trend', '30-Day Forecast']},
+                'legend': {'data': ['Historical Trend', '30-Day Forecast', '95% Range']},
                 'grid': {'left': '3%', 'right': '4%', 'bottom': '5%', 'containLabel': True},
                 'xAxis': {
                     'type': 'category', 
@@ -640,16 +939,32 @@ def predictive_analytics():
                     {
                         'name': 'Historical Trend',
                         'type': 'line',
-                        'data': weights_out + [None] * (len(projected_dates)-1),
+                        'data': weights_out + pad_history,
                         'itemStyle': {'color': '#2196f3'},
                         'lineStyle': {'width': 3}
                     },
                     {
                         'name': '30-Day Forecast',
                         'type': 'line',
-                        'data': [None] * (len(weights_out)-1) + projected_weights,
+                        'data': pad_forecast + projected_weights,
                         'itemStyle': {'color': '#ff9800'},
                         'lineStyle': {'type': 'dashed', 'width': 3}
+                    },
+                    {
+                        'name': '95% Range',
+                        'type': 'line',
+                        'data': pad_forecast + fit["upper"],
+                        'itemStyle': {'color': '#ffcc80'},
+                        'lineStyle': {'type': 'dotted', 'width': 1},
+                        'symbol': 'none'
+                    },
+                    {
+                        'name': '95% Range',
+                        'type': 'line',
+                        'data': pad_forecast + fit["lower"],
+                        'itemStyle': {'color': '#ffcc80'},
+                        'lineStyle': {'type': 'dotted', 'width': 1},
+                        'symbol': 'none'
                     }
                 ]
             }
@@ -659,6 +974,7 @@ def predictive_analytics():
         ui.label(f"Error calculating trajectory: {e}").classes('text-red-500 text-xs')
 
 @ui.refreshable
+@metrics.timed_render('scan_area')
 def scan_area():
     if state.is_scanning:
         with ui.row().classes('w-full justify-center p-6 glass-card'):
@@ -686,6 +1002,22 @@ def scan_area():
             ui.upload(label="📸 UPLOAD FOOD TO SCAN", on_upload=handle_upload, auto_upload=True, max_files=1).props('color=green-7 flat').classes('w-full')
 
 @ui.refreshable
+@metrics.timed_render('meal_timeline')
+def meal_timeline():
+    meals = user_health.get_todays_meals()
+    with ui.column().classes('w-full mt-2 gap-2'):
+        if not meals:
+            ui.label("No meals logged today. Scan your food to start the timeline.").classes('text-sm text-green-800 italic')
+            return
+        for meal in reversed(meals):
+            with ui.row().classes('w-full items-center justify-between bg-white/50 rounded-lg px-3 py-2 no-wrap'):
+                with ui.column().classes('gap-0'):
+                    ui.label(f"{meal['time']} · {meal['name']}").classes('text-sm font-bold accessible-text')
+                    ui.label(f"{meal['calories']} kcal | P:{meal['protein']}g C:{meal['carbs']}g F:{meal['fats']}g").classes('text-xs text-gray-600 font-medium')
+                ui.button(icon='undo', on_click=lambda m=meal['id']: undo_meal(m)).props('flat round color=red size=sm').tooltip('Remove meal')
+
+@ui.refreshable
+@metrics.timed_render('progress_gallery')
 def progress_gallery():
     with ui.column().classes('w-full mt-2'):
         with ui.row().classes('w-full gap-4 items-center mb-4'):
@@ -701,16 +1033,23 @@ def progress_gallery():
             with ui.row().classes('w-full grid grid-cols-2 sm:grid-cols-3 gap-4'):
                 for entry in reversed(log):
                     with ui.card().classes('p-2 glass-card hover:scale-105 transition-transform relative'):
-                        ui.button(icon='delete', on_click=lambda f=entry['image']: delete_progress_photo(f)) \
+                        ui.button(icon='delete', on_click=lambda f=entry.get('image') or entry.get('op'): delete_progress_photo(f)) \
                             .props('flat round color=red size=sm') \
                             .classes('absolute top-3 right-3 z-10 bg-white/80 hover:bg-red-100 backdrop-blur-sm shadow-sm')
-                        ui.image(f"/progress_shots/{entry['image']}").classes('w-full h-32 object-cover rounded-md mb-2')
+                        if entry.get('image'):
+                            ui.image(f"/progress_shots/{entry['image']}").classes('w-full h-32 object-cover rounded-md mb-2')
+                        else:
+                            # Weigh-in logged from the offline page, no photo
+                            with ui.column().classes('w-full h-32 items-center justify-center bg-white/40 rounded-md mb-2'):
+                                ui.icon('monitor_weight', size='lg', color='green-7')
+                                ui.label('Logged offline').classes('text-[10px] text-gray-600 italic')
                         with ui.row().classes('w-full justify-between items-center'):
                             ui.label(entry['date']).classes('text-[10px] text-gray-600 font-bold uppercase tracking-wide')
                             ui.label(f"{entry['weight']} kg").classes('text-xs text-white bg-green-600 px-2 py-1 rounded-full font-black')
 # --- NEW: REHAB & RECOVERY UI ---
 
 @ui.refreshable
+@metrics.timed_render('rehab_panel')
 def rehab_panel():
     is_recovering = user_health.data.get("recovery_mode", False)
     active_strain = user_health.data.get("active_strain", "")
@@ -734,7 +1073,9 @@ def rehab_panel():
                 recipe_content.content = ""
                 recipe_spinner.visible = True
                 recipe_dialog.open()
-                result = await asyncio.to_thread(generate_recovery_protocol, active_strain, state.location)
+                fields = {"strain": active_strain, "location": state.location}
+                key = result_key("generate_recovery_protocol", active_strain, state.location)
+                result = await run_ai_job("generate_recovery_protocol", fields, key, fields)
                 recipe_title.text = f"Recovery: {active_strain}"
                 recipe_spinner.visible = False
                 recipe_content.content = result
@@ -763,6 +1104,7 @@ def rehab_panel():
 
 # --- NEW: DAILY STREAK TRACKER ---
 @ui.refreshable
+@metrics.timed_render('streak_panel')
 def streak_panel():
     streak_count, last_7_days = user_health.get_streak_info()
     
@@ -787,6 +1129,7 @@ def streak_panel():
                     ui.icon(icon_name, size='xs').classes(f'p-1 rounded-full {circle_color} shadow-sm')
 
 @ui.refreshable
+@metrics.timed_render('chat_area')
 def chat_area():
     with ui.column().classes('w-full gap-3'):
         for name, text, is_ai in state.messages:
@@ -796,14 +1139,35 @@ def chat_area():
                 .props(f'bg-color="{bg_color}" text-color="{text_color}"')
 
 
-# --- DASHBOARD LAYOUT ---
+def refresh_after_rollover(_):
+    stats_panel.refresh()
+    smart_suggestions.refresh()
+    weekly_chart.refresh()
+    streak_panel.refresh()
+    data_insights.refresh()
+
+rollover_scheduler.on_rollover(refresh_after_rollover)
+
+def refresh_after_offline_sync(_):
+    """offline.js replayed entries queued while this browser was offline."""
+    stats_panel.refresh()
+    smart_suggestions.refresh()
+    weekly_chart.refresh()
+    meal_timeline.refresh()
+    progress_gallery.refresh()
+    predictive_analytics.refresh()
+
+ui.on('nutri_synced', refresh_after_offline_sync)
 
 # --- DASHBOARD LAYOUT ---
 
 with ui.row().classes('w-full justify-between items-center py-4 px-6 mb-2 bg-white/30 backdrop-blur-md shadow-sm'):
     ui.label('NUtri-INO').classes('text-3xl font-black glisten-text tracking-tight')
     with ui.row().classes('gap-2'):
+        ui.button(icon='eco', on_click=switch_low_power).props('flat round color=green-8 size=md').tooltip('Low-Power Mode')
         ui.button(icon='restart_alt', on_click=trigger_reset).props('flat round color=orange-8 size=md').tooltip('Reset Today')
+        ui.button(icon='upload_file', on_click=wearable_dialog.open).props('flat round color=green-8 size=md').tooltip('Import Wearable Export')
+        ui.button(icon='history', on_click=history_dialog.open).props('flat round color=green-8 size=md').tooltip('Import / Export Nutrition History')
         ui.button(icon='watch', on_click=sync_watch).props('flat round color=green-8 size=lg').tooltip('Sync Wearable')
 
 with ui.row().classes('w-full max-w-7xl mx-auto flex-wrap lg:flex-nowrap gap-6 p-4 items-stretch'):
@@ -820,6 +1184,9 @@ with ui.row().classes('w-full max-w-7xl mx-auto flex-wrap lg:flex-nowrap gap-6 p
     with ui.column().classes('w-full lg:w-2/4 gap-4'):
         stats_panel()
         scan_area()
+
+        with ui.expansion("Today's Meals", icon='restaurant', value=False).classes('w-full glass-card text-green-900 font-bold bg-white/40'):
+            meal_timeline()
         
         # 1. SWAPPED: Weekly Trends moved to the top
         with ui.expansion('Weekly Trends', icon='insert_chart', value=True).classes('w-full glass-card text-green-900 font-bold bg-white/40'):
@@ -846,4 +1213,4 @@ with ui.row().classes('w-full max-w-7xl mx-auto flex-wrap lg:flex-nowrap gap-6 p
                     .bind_value(state, 'chat_input').on('keydown.enter', send_chat)
                 ui.button(icon='send', on_click=send_chat, color='green-6').props('round shadow-md')
 
-ui.run(title="NUtri-INO Dashboard", dark=False, port=8080, reload=False)
\ No newline at end of file
+ui.run(title="NUtri-INO Dashboard", dark=False, port=PORT, reload=False, show=not WORKER_ID)
\ No newline at end of file
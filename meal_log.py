@@ -0,0 +1,178 @@
+"""
+Per-meal event store.
+
+Every logged meal is kept as its own row (timestamp, name, macros and the hash
+of the scanned image) in SQLite. A `daily_totals` table is updated in the same
+transaction as each insert/delete, so per-day numbers never need a rescan.
+`sync_ops` remembers the client-generated ids of offline meal entries that were
+already applied, so a retried sync never logs anything twice.
+"""
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meals (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts          REAL    NOT NULL,
+    day         TEXT    NOT NULL,
+    name        TEXT    NOT NULL,
+    name_key    TEXT    NOT NULL,
+    calories    INTEGER NOT NULL,
+    protein     INTEGER NOT NULL,
+    carbs       INTEGER NOT NULL,
+    fats        INTEGER NOT NULL,
+    image_hash  TEXT
+);
+CREATE INDEX IF NOT EXISTS meals_day ON meals(day, ts);
+CREATE INDEX IF NOT EXISTS meals_name ON meals(name_key, day);
+CREATE TABLE IF NOT EXISTS sync_ops (
+    op_id  TEXT PRIMARY KEY,
+    kind   TEXT NOT NULL,
+    ts     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sync_ops_ts ON sync_ops(ts);
+CREATE TABLE IF NOT EXISTS daily_totals (
+    day       TEXT PRIMARY KEY,
+    meals     INTEGER NOT NULL,
+    calories  INTEGER NOT NULL,
+    protein   INTEGER NOT NULL,
+    carbs     INTEGER NOT NULL,
+    fats      INTEGER NOT NULL
+);
+"""
+
+MACROS = ("calories", "protein", "carbs", "fats")
+
+def _row_to_meal(row):
+    meal = dict(row)
+    meal["time"] = datetime.fromtimestamp(meal["ts"]).strftime("%H:%M")
+    meal.pop("name_key", None)
+    return meal
+
+class MealLog:
+    def __init__(self, path="meals.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def _apply_totals(self, day, sign, meals, calories, protein, carbs, fats):
+        self.conn.execute(
+            """INSERT INTO daily_totals (day, meals, calories, protein, carbs, fats) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(day) DO UPDATE SET
+                   meals = meals + excluded.meals, calories = calories + excluded.calories,
+                   protein = protein + excluded.protein, carbs = carbs + excluded.carbs, fats = fats + excluded.fats""",
+            (day, sign * meals, sign * calories, sign * protein, sign * carbs, sign * fats))
+
+    # --- WRITES ---
+    def log(self, day, name, calories, protein, carbs, fats, image_hash=None, ts=None):
+        """Stores one meal and bumps that day's totals. Returns the new meal id."""
+        ts = ts or time.time()
+        macros = [int(calories), int(protein), int(carbs), int(fats)]
+        with self.lock, self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO meals (ts, day, name, name_key, calories, protein, carbs, fats, image_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (ts, day, name, name.strip().lower(), *macros, image_hash))
+            self._apply_totals(day, 1, 1, *macros)
+            return cur.lastrowid
+
+    def log_many(self, meals, op_ids=()):
+        """
+        Bulk insert of (day, name, calories, protein, carbs, fats, image_hash, ts) tuples in one transaction.
+        `op_ids` (client sync ids) are recorded in the same transaction. Returns the new ids.
+        """
+        ids = []
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT INTO sync_ops (op_id, kind, ts) VALUES (?, 'meal', ?)", ((op, time.time()) for op in op_ids))
+            for day, name, calories, protein, carbs, fats, image_hash, ts in meals:
+                macros = [int(calories), int(protein), int(carbs), int(fats)]
+                cur = self.conn.execute(
+                    "INSERT INTO meals (ts, day, name, name_key, calories, protein, carbs, fats, image_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (ts or time.time(), day, name, name.strip().lower(), *macros, image_hash))
+                self._apply_totals(day, 1, 1, *macros)
+                ids.append(cur.lastrowid)
+        return ids
+
+    def delete(self, meal_id):
+        """Removes a meal and subtracts it from its day's totals. Returns the deleted meal or None."""
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT * FROM meals WHERE id = ?", (meal_id,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("DELETE FROM meals WHERE id = ?", (meal_id,))
+            self._apply_totals(row["day"], -1, 1, *(row[m] for m in MACROS))
+            return _row_to_meal(row)
+
+    def undo_last(self, day):
+        with self.lock:
+            row = self.conn.execute("SELECT id FROM meals WHERE day = ? ORDER BY ts DESC, id DESC LIMIT 1", (day,)).fetchone()
+        return self.delete(row["id"]) if row else None
+
+    def clear_day(self, day):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM meals WHERE day = ?", (day,))
+            self.conn.execute("DELETE FROM daily_totals WHERE day = ?", (day,))
+
+    def prune_ops(self, before_ts):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM sync_ops WHERE ts < ?", (before_ts,))
+
+    # --- QUERIES ---
+    def seen_ops(self, op_ids):
+        """The subset of `op_ids` that has already been applied."""
+        op_ids = list(op_ids)
+        seen = set()
+        with self.lock:
+            for i in range(0, len(op_ids), 500):
+                chunk = op_ids[i:i + 500]
+                rows = self.conn.execute(f"SELECT op_id FROM sync_ops WHERE op_id IN ({','.join('?' * len(chunk))})", chunk)
+                seen.update(r["op_id"] for r in rows)
+        return seen
+
+    def meals_for_day(self, day):
+        return self.meals_between(day, day)
+
+    def meals_between(self, start_day, end_day, limit=None, offset=0):
+        """Meals with start_day <= day <= end_day (inclusive, 'YYYY-MM-DD'), oldest first."""
+        sql = "SELECT * FROM meals WHERE day BETWEEN ? AND ? ORDER BY day, ts, id"
+        params = [start_day, end_day]
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        with self.lock:
+            return [_row_to_meal(r) for r in self.conn.execute(sql, params)]
+
+    def meals_by_food(self, name, start_day="0000-00-00", end_day="9999-99-99"):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM meals WHERE name_key = ? AND day BETWEEN ? AND ? ORDER BY day, ts",
+                (name.strip().lower(), start_day, end_day)).fetchall()
+        return [_row_to_meal(r) for r in rows]
+
+    def day_totals(self, day):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM daily_totals WHERE day = ?", (day,)).fetchone()
+        return dict(row) if row else {"day": day, "meals": 0, "calories": 0, "protein": 0, "carbs": 0, "fats": 0}
+
+    def totals_between(self, start_day, end_day):
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM daily_totals WHERE day BETWEEN ? AND ? ORDER BY day", (start_day, end_day)).fetchall()
+        return [dict(r) for r in rows]
+
+    def meal_hours(self, start_day, end_day):
+        """Meal count and calories per hour of day, for meal-timing analysis."""
+        with self.lock:
+            rows = self.conn.execute(
+                """SELECT CAST(strftime('%H', ts, 'unixepoch', 'localtime') AS INTEGER) AS hour,
+                          COUNT(*) AS meals, SUM(calories) AS calories
+                   FROM meals WHERE day BETWEEN ? AND ? GROUP BY hour ORDER BY hour""",
+                (start_day, end_day)).fetchall()
+        return [dict(r) for r in rows]
+
+    def close(self):
+        self.conn.close()
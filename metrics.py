@@ -0,0 +1,244 @@
+"""
+Lightweight in-process metrics and tracing.
+
+Counters and histograms are kept in memory and rendered in the Prometheus text
+format for the /metrics endpoint. Set NUTRI_TRACE_LOG to a file path to also
+get one JSON line per AI call, storage operation and UI refresh.
+"""
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import profiler
+
+TRACE_LOG = os.environ.get("NUTRI_TRACE_LOG", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_registry = []
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(_label_key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        _registry.append(self)
+
+    def set(self, value, **labels):
+        with _lock:
+            self.values[_label_key(labels)] = value
+
+    def value(self, **labels):
+        return self.values.get(_label_key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with _lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with _lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def count(self, **labels):
+        series = self.series.get(_label_key(labels))
+        return series["count"] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            for key, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+def render_prometheus():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- TRACE LOG ---
+
+_trace_lock = threading.Lock()
+
+def trace(kind, name, duration_s, **fields):
+    """Appends a single JSON event to the trace log when NUTRI_TRACE_LOG is set."""
+    if not TRACE_LOG:
+        return
+    event = {"ts": round(time.time(), 3), "kind": kind, "name": name, "ms": round(duration_s * 1000, 3), **fields}
+    line = json.dumps(event, default=str)
+    with _trace_lock:
+        with open(TRACE_LOG, 'a') as f:
+            f.write(line + "\n")
+
+# --- APP METRICS ---
+
+AI_LATENCY = Histogram("nutri_ai_call_seconds", "Latency of ai_engine calls to Gemini.")
+AI_ERRORS = Counter("nutri_ai_call_errors_total", "Failed ai_engine calls by error type.")
+AI_BYTES_SENT = Counter("nutri_ai_bytes_sent_total", "Prompt and image bytes sent to Gemini.")
+AI_TOKENS = Counter("nutri_ai_tokens_total", "Tokens reported by Gemini usage metadata.")
+STORAGE_LATENCY = Histogram("nutri_storage_seconds", "HealthManager load/save latency.")
+STORAGE_BYTES = Counter("nutri_storage_bytes_total", "Bytes read and written by HealthManager.")
+UI_REFRESH_LATENCY = Histogram("nutri_ui_refresh_seconds", "Build time of each ui.refreshable component.")
+VISION_PARSE_FAILURES = Counter("nutri_vision_parse_failures_total", "Food scans whose output violated the JSON schema.")
+VISION_REPAIRS = Counter("nutri_vision_repairs_total", "Outcome of repair prompts sent after a schema violation.")
+PROMPT_TRIMS = Counter("nutri_prompt_trims_total", "Prompt fields shortened to fit a template's token budget.")
+PROMPT_BUDGET_OVERRUNS = Counter("nutri_prompt_budget_overruns_total", "Calls whose measured tokens exceeded the template budget.")
+AI_RETRIES = Counter("nutri_ai_retries_total", "Gemini calls retried after a transient failure.")
+AI_FALLBACKS = Counter("nutri_ai_fallbacks_total", "Cached or offline answers served while Gemini was unavailable.")
+AI_CIRCUIT_OPEN = Gauge("nutri_ai_circuit_open", "1 while the Gemini circuit breaker is open.")
+JOBS_SUBMITTED = Counter("nutri_jobs_submitted_total", "Background jobs submitted, by whether a stored result answered them.")
+JOB_SECONDS = Histogram("nutri_job_seconds", "Run time of background jobs.")
+COMPUTE_SECONDS = Histogram("nutri_compute_seconds", "CPU-bound task time, by task and whether it ran inline or in the process pool.")
+FOOD_SCANS = Counter("nutri_food_scans_total", "Food scans by the tier that answered them, and why the local model passed.")
+FOOD_CLASSIFIER_LATENCY = Histogram("nutri_food_classifier_seconds", "On-device food classification time, batching wait included.")
+FOOD_CLASSIFIER_BATCH = Histogram("nutri_food_classifier_batch_size", "Images per on-device inference batch.", buckets=(1, 2, 4, 8, 16, 32))
+PHOTO_STORE_BYTES = Gauge("nutri_photo_store_bytes", "Bytes of live progress photos after the last blob sweep.")
+PHOTO_GC_REMOVED = Counter("nutri_photo_gc_removed_total", "Unreferenced progress photos removed by the blob sweep.")
+
+class AICall:
+    """Handed to the body of `ai_call` so it can attach the SDK response."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.cached_tokens = 0
+
+    def record_usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        self.prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+        self.response_tokens = getattr(usage, "candidates_token_count", None) or 0
+        self.cached_tokens = getattr(usage, "cached_content_token_count", None) or 0
+
+@contextmanager
+def ai_call(function, bytes_sent=0):
+    call = AICall()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield call
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        AI_LATENCY.observe(elapsed, function=function)
+        AI_BYTES_SENT.inc(bytes_sent, function=function)
+        if error:
+            AI_ERRORS.inc(function=function, error=error)
+        if call.prompt_tokens:
+            AI_TOKENS.inc(call.prompt_tokens, function=function, kind="prompt")
+        if call.response_tokens:
+            AI_TOKENS.inc(call.response_tokens, function=function, kind="response")
+        if call.cached_tokens:
+            AI_TOKENS.inc(call.cached_tokens, function=function, kind="cached")
+        trace("ai", function, elapsed, bytes_sent=bytes_sent, prompt_tokens=call.prompt_tokens,
+              response_tokens=call.response_tokens, cached_tokens=call.cached_tokens, error=error)
+
+def record_ai_error(function, error):
+    """For failures ai_engine detects itself, e.g. unparseable model output."""
+    AI_ERRORS.inc(function=function, error=error)
+
+@contextmanager
+def storage_op(op, path):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        STORAGE_LATENCY.observe(elapsed, op=op)
+        STORAGE_BYTES.inc(size, op=op)
+        trace("storage", op, elapsed, bytes=size)
+
+def timed_render(component):
+    """Times a refreshable's build, and lets handler-mode profiling sessions follow it. Apply beneath @ui.refreshable."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    with profiler.track(component):
+                        return await func(*args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    UI_REFRESH_LATENCY.observe(elapsed, component=component)
+                    trace("ui", component, elapsed)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with profiler.track(component):
+                    return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                UI_REFRESH_LATENCY.observe(elapsed, component=component)
+                trace("ui", component, elapsed)
+        return wrapper
+    return decorator
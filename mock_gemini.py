@@ -0,0 +1,204 @@
+"""
+Local stand-in for the Gemini GenAI REST endpoint.
+
+Speaks just enough of the v1beta API (generateContent, streamGenerateContent and
+countTokens) for ai_engine to run unchanged against it, with configurable
+latency, error rate and streaming. Point the app at it with:
+
+    python mock_gemini.py --port 8765 --latency-ms 900 --error-rate 0.05
+    GEMINI_BASE_URL=http://127.0.0.1:8765 python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_FOODS = [
+    {"name": "Grilled Chicken Salad", "calories": 420, "protein": 38, "carbs": 18, "fats": 21},
+    {"name": "Masala Dosa", "calories": 380, "protein": 9, "carbs": 56, "fats": 13},
+    {"name": "Oatmeal with Berries", "calories": 310, "protein": 11, "carbs": 54, "fats": 6},
+    {"name": "Paneer Tikka", "calories": 450, "protein": 26, "carbs": 12, "fats": 32},
+]
+
+FAKE_MARKDOWN = """**Quick Mock Recipe**
+
+- 1 cup of a fresh local vegetable
+- 100g of lean protein
+- A pinch of spice and a splash of oil
+
+**Method:** Sear the protein, toss in the vegetables, season and serve warm. This keeps the meal light while supporting your goal."""
+
+class MockConfig:
+    def __init__(self, latency_ms=800, jitter_ms=250, error_rate=0.0, stream_chunks=4, seed=None, malformed_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.stream_chunks = max(1, stream_chunks)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests_served = 0
+
+    def sample_latency(self):
+        with self.lock:
+            jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def should_fail(self):
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+def _estimate_tokens(payload):
+    """Roughly 4 characters per token, the same rule of thumb the real API documents."""
+    return max(1, len(json.dumps(payload)) // 4)
+
+def _wants_json(body):
+    config = body.get("generationConfig") or body.get("generation_config") or {}
+    mime = config.get("responseMimeType") or config.get("response_mime_type") or ""
+    return mime == "application/json"
+
+def _make_text(body, rng, malformed_rate=0.0):
+    if _wants_json(body):
+        food = dict(rng.choice(FAKE_FOODS))
+        food["advice"] = "Pair this with a glass of water and some greens."
+        if rng.random() < malformed_rate:
+            # Chatty, truncated output to exercise the client's repair path
+            return "Sure! Here is the breakdown: " + json.dumps(food)[:-12]
+        return json.dumps(food)
+    return FAKE_MARKDOWN
+
+def _response_payload(text, prompt_tokens, finish=True):
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if finish:
+        candidate["finishReason"] = "STOP"
+    out_tokens = max(1, len(text) // 4)
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": out_tokens,
+            "totalTokenCount": prompt_tokens + out_tokens,
+        },
+        "modelVersion": "mock-gemini",
+    }
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = MockConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        raw = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _send_error(self):
+        status, name = self.config.rng.choice([(503, "UNAVAILABLE"), (429, "RESOURCE_EXHAUSTED"), (500, "INTERNAL")])
+        self._send_json(status, {"error": {"code": status, "message": f"Mock {name.lower()} error", "status": name}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"code": 400, "message": "Invalid JSON body", "status": "INVALID_ARGUMENT"}})
+            return
+
+        path = self.path.split("?", 1)[0]
+        with self.config.lock:
+            self.config.requests_served += 1
+
+        if path.endswith(":countTokens"):
+            self._send_json(200, {"totalTokens": _estimate_tokens(body.get("contents", []))})
+            return
+        if not (path.endswith(":generateContent") or path.endswith(":streamGenerateContent")):
+            self._send_json(404, {"error": {"code": 404, "message": f"Unknown route {path}", "status": "NOT_FOUND"}})
+            return
+
+        time.sleep(self.config.sample_latency())
+        if self.config.should_fail():
+            self._send_error()
+            return
+
+        with self.config.lock:
+            text = _make_text(body, self.config.rng, self.config.malformed_rate)
+        prompt_tokens = _estimate_tokens(body.get("contents", []))
+
+        if path.endswith(":streamGenerateContent"):
+            self._stream(text, prompt_tokens)
+        else:
+            self._send_json(200, _response_payload(text, prompt_tokens))
+
+    def _stream(self, text, prompt_tokens):
+        """Server-sent events, one chunk of the text per event."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunks = self.config.stream_chunks
+        size = max(1, -(-len(text) // chunks))
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            event = json.dumps(_response_payload(piece, prompt_tokens, finish=last))
+            self.wfile.write(f"data: {event}\r\n\r\n".encode())
+            self.wfile.flush()
+            if not last:
+                time.sleep(self.config.sample_latency() / chunks)
+        self.close_connection = True
+
+class MockGeminiServer:
+    """Runs the mock endpoint on a background thread, e.g. from the load tester."""
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        handler = type("BoundMockGeminiHandler", (MockGeminiHandler,), {"config": config or MockConfig()})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.config = handler.config
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the Gemini GenAI endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=250)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 429/500/503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of JSON replies sent back broken")
+    parser.add_argument("--stream-chunks", type=int, default=4)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.stream_chunks, args.seed, args.malformed_rate)
+    server = MockGeminiServer(args.host, args.port, config)
+    print(f"Mock Gemini listening on {server.url} (latency {args.latency_ms}±{args.jitter_ms} ms, error rate {args.error_rate:.0%})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
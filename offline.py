@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+
+from fastapi import Response
+from nicegui import app, ui
+
+from theme import THEME_URL, THEME_VERSION
+
+# --- OFFLINE SHELL ---
+# A service worker keeps the theme, NiceGUI's static assets and a standalone
+# /offline logging page cached. Entries made while offline wait in IndexedDB
+# (static/offline.js) and are replayed to /api/sync when the network is back.
+# The service worker and the page are versioned like the theme: a changed file
+# means a new cache, and the old one is dropped on activation.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+def _read(name):
+    with open(os.path.join(STATIC_DIR, name), 'rb') as f:
+        return f.read()
+
+OFFLINE_JS = _read('offline.js')
+OFFLINE_HTML = _read('offline.html').decode('utf-8')
+SERVICE_WORKER_JS = _read('sw.js').decode('utf-8')
+ICON_SVG = _read('icon.svg')
+OFFLINE_VERSION = hashlib.sha256(
+    OFFLINE_JS + OFFLINE_HTML.encode() + SERVICE_WORKER_JS.encode() + ICON_SVG + THEME_VERSION.encode()
+).hexdigest()[:12]
+OFFLINE_JS_URL = f'/offline/{OFFLINE_VERSION}/offline.js'
+ICON_URL = f'/offline/{OFFLINE_VERSION}/icon.svg'
+PRECACHE = ['/offline', OFFLINE_JS_URL, ICON_URL, THEME_URL, '/manifest.webmanifest']
+THEME_COLOR = '#2e7d32'
+
+OFFLINE_PAGE = (OFFLINE_HTML.replace('__THEME_URL__', THEME_URL)
+                .replace('__OFFLINE_JS__', OFFLINE_JS_URL)
+                .replace('__ICON__', ICON_URL))
+SERVICE_WORKER = (SERVICE_WORKER_JS.replace('__OFFLINE_JS__', OFFLINE_JS_URL)
+                  .replace('__VERSION__', OFFLINE_VERSION)
+                  .replace('__PRECACHE__', json.dumps(PRECACHE)))
+MANIFEST = json.dumps({
+    'name': 'NUtri-INO',
+    'short_name': 'NUtri-INO',
+    'start_url': '/',
+    'display': 'standalone',
+    'background_color': '#f1f8e9',
+    'theme_color': THEME_COLOR,
+    'icons': [{'src': ICON_URL, 'sizes': 'any', 'type': 'image/svg+xml', 'purpose': 'any'}],
+})
+
+def _versioned(body, media_type, version):
+    cache = 'public, max-age=31536000, immutable' if version == OFFLINE_VERSION else 'no-cache'
+    return Response(body, media_type=media_type, headers={'Cache-Control': cache})
+
+@app.get('/sw.js')
+def service_worker():
+    # Always revalidated, so a deploy reaches installed clients on their next visit
+    return Response(SERVICE_WORKER, media_type='application/javascript',
+                    headers={'Cache-Control': 'no-cache', 'Service-Worker-Allowed': '/'})
+
+@app.get('/offline/{version}/offline.js')
+def offline_script(version: str):
+    return _versioned(OFFLINE_JS, 'application/javascript', version)
+
+@app.get('/offline/{version}/icon.svg')
+def offline_icon(version: str):
+    return _versioned(ICON_SVG, 'image/svg+xml', version)
+
+@app.get('/offline')
+def offline_page():
+    return Response(OFFLINE_PAGE, media_type='text/html', headers={'Cache-Control': 'no-cache'})
+
+@app.get('/manifest.webmanifest')
+def web_manifest():
+    return Response(MANIFEST, media_type='application/manifest+json', headers={'Cache-Control': 'no-cache'})
+
+def enable_offline():
+    ui.add_head_html(f'<link rel="manifest" href="/manifest.webmanifest">\n'
+                     f'<meta name="theme-color" content="{THEME_COLOR}">\n'
+                     f'<link rel="icon" href="{ICON_URL}">\n'
+                     f'<script src="{OFFLINE_JS_URL}" defer></script>')
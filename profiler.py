@@ -0,0 +1,232 @@
+"""
+On-demand sampling profiler for a live dashboard process.
+
+A background thread snapshots every thread's Python stack with
+sys._current_frames() a few hundred times a second. Nothing is traced or
+instrumented, so the app runs at full speed and the only cost is the sampler's
+own CPU time, which is reported alongside the results. A session either covers
+a fixed window (`seconds`) or follows the next N handlers wrapped in
+`profiled()`/`track()` (`handlers`). In handler mode, samples are only kept
+while one of those handlers is in flight. Sessions are capped at MAX_SECONDS,
+so a forgotten one ends on its own.
+
+Each session writes three files to PROFILE_DIR:
+    <name>.speedscope.json   open at https://www.speedscope.app
+    <name>.folded            collapsed stacks for flamegraph.pl / inferno
+    <name>.txt               top functions by self and total samples
+"""
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+PROFILE_DIR = os.environ.get("NUTRI_PROFILE_DIR", "profiles")
+DEFAULT_INTERVAL = 0.005
+MAX_SECONDS = 120
+TOP_N = 25
+# Leaf frames of a thread that is parked, not working: dropped unless include_idle
+IDLE_LEAVES = {("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("selectors.py", "select"), ("queue.py", "get"),
+               ("thread.py", "_worker"), ("connection.py", "_poll"), ("socket.py", "accept")}
+
+def _frame_key(code):
+    return (getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno)
+
+def _is_idle(code):
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES
+
+class SamplingProfiler:
+    def __init__(self, out_dir=PROFILE_DIR, interval=DEFAULT_INTERVAL, include_idle=False):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.include_idle = include_idle
+        self.last_result = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = Counter()     # Only the sampler thread touches this while a session runs
+        self._samples = 0            # Its running total, safe for status() to read from other threads
+        self._handlers_left = 0      # Handlers that may still start being followed
+        self._in_flight = Counter()  # Followed handlers currently running, by name
+        self._mode = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=None, handlers=None):
+        """Begins a session: a `seconds` window, or the next `handlers` tracked handlers (capped at MAX_SECONDS)."""
+        if not seconds and not handlers:
+            raise ValueError("Give seconds or handlers")
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A profiling session is already running")
+            self._stacks = Counter()
+            self._samples = 0
+            self._in_flight = Counter()
+            self._handlers_left = int(handlers or 0)
+            self._mode = f"next {handlers} handlers" if handlers else f"{seconds}s window"
+            self._stop.clear()
+            limit = min(float(seconds or MAX_SECONDS), MAX_SECONDS)
+            self._thread = threading.Thread(target=self._run, args=(limit, bool(handlers)), name="nutri-profiler", daemon=True)
+            self._thread.start()
+        return self.status()
+
+    def stop(self):
+        """Ends the session early; results are still written."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        return self.last_result
+
+    def status(self):
+        return {"running": self.running, "mode": self._mode, "samples": self._samples,
+                "handlers_left": self._handlers_left, "last_result": self.last_result}
+
+    # --- HANDLER TRACKING ---
+
+    @contextmanager
+    def track(self, name):
+        """Marks `name` as in flight so handler-mode sessions sample it. Near-free when no session wants it."""
+        if not self._handlers_left:
+            yield
+            return
+        with self._lock:
+            followed = self._handlers_left > 0
+            if followed:
+                self._handlers_left -= 1
+                self._in_flight[name] += 1
+        try:
+            yield
+        finally:
+            if followed:
+                with self._lock:
+                    self._in_flight[name] -= 1
+                    if self._in_flight[name] <= 0:
+                        del self._in_flight[name]
+
+    def profiled(self, name=None):
+        """Decorator form of track() for sync or async event handlers."""
+        def decorator(func):
+            label = name or func.__name__
+            if inspect.iscoroutinefunction(func):
+                @wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.track(label):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.track(label):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # --- SAMPLING ---
+
+    def _run(self, limit, handler_mode):
+        started = time.perf_counter()
+        cpu_start = time.thread_time()
+        own = threading.get_ident()
+        names = {}
+        deadline = started + limit
+        while not self._stop.is_set() and time.perf_counter() < deadline:
+            if handler_mode and not self._in_flight and not self._handlers_left:
+                break  # Every followed handler has finished
+            if not handler_mode or self._in_flight:
+                root = "+".join(sorted(self._in_flight)) if handler_mode else None
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    if ident not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    if not self.include_idle and _is_idle(frame.f_code):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_key(frame.f_code))
+                        frame = frame.f_back
+                    stack.append((f"[thread] {names.get(ident, ident)}", "", 0))
+                    if root:
+                        stack.append((f"[handler] {root}", "", 0))
+                    stack.reverse()
+                    self._stacks[tuple(stack)] += 1
+                    self._samples += 1
+            self._stop.wait(self.interval)
+        wall = time.perf_counter() - started
+        overhead = (time.thread_time() - cpu_start) / wall if wall else 0.0
+        self._handlers_left = 0
+        try:
+            self.last_result = self._write(wall, overhead)
+        except OSError as ex:
+            self.last_result = {"error": f"Could not write profile: {ex}"}
+
+    # --- OUTPUT ---
+
+    def _write(self, wall, overhead):
+        os.makedirs(self.out_dir, exist_ok=True)
+        name = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        stacks = self._stacks
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in stacks.items():
+            row = []
+            for key in stack:
+                if key not in index:
+                    index[key] = len(frames)
+                    frames.append({"name": key[0], "file": key[1], "line": key[2]} if key[1] else {"name": key[0]})
+                row.append(index[key])
+            samples.append(row)
+            weights.append(round(count * self.interval, 6))
+        speedscope = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "nutri-profiler",
+            "shared": {"frames": frames},
+            "profiles": [{"type": "sampled", "name": f"{self._mode} (pid {os.getpid()})", "unit": "seconds",
+                          "startValue": 0, "endValue": round(sum(weights), 6), "samples": samples, "weights": weights}],
+        }
+        with open(os.path.join(self.out_dir, name + ".speedscope.json"), 'w') as f:
+            json.dump(speedscope, f, separators=(",", ":"))
+        with open(os.path.join(self.out_dir, name + ".folded"), 'w') as f:
+            for stack, count in stacks.items():
+                f.write(";".join(k[0].replace(";", ":") for k in stack) + f" {count}\n")
+
+        top = self.top_functions(stacks)
+        total = sum(stacks.values())
+        with open(os.path.join(self.out_dir, name + ".txt"), 'w') as f:
+            f.write(f"{self._mode}: {total} samples over {wall:.1f}s, sampler overhead {overhead:.1%} of one core\n\n")
+            f.write(f"{'self%':>7} {'total%':>7}  function\n")
+            for entry in top:
+                f.write(f"{entry['self_pct']:>6.1f}% {entry['total_pct']:>6.1f}%  {entry['function']}  ({entry['file']}:{entry['line']})\n")
+        return {"name": name, "mode": self._mode, "samples": total, "seconds": round(wall, 2),
+                "overhead": round(overhead, 4), "files": [name + ext for ext in (".speedscope.json", ".folded", ".txt")],
+                "top": top[:10]}
+
+    @staticmethod
+    def top_functions(stacks, n=TOP_N):
+        """Hottest Python functions by self samples, with inclusive share; synthetic thread/handler roots left out."""
+        own, inclusive = Counter(), Counter()
+        for stack, count in stacks.items():
+            real = [key for key in stack if key[1]]
+            if not real:
+                continue
+            own[real[-1]] += count
+            for key in set(real):
+                inclusive[key] += count
+        total = sum(stacks.values()) or 1
+        return [{"function": key[0], "file": os.path.relpath(key[1]) if key[1].startswith(os.getcwd()) else key[1], "line": key[2],
+                 "self_pct": round(100 * count / total, 1), "total_pct": round(100 * inclusive[key] / total, 1)}
+                for key, count in own.most_common(n)]
+
+# Shared by metrics.timed_render and main's handlers
+PROFILER = SamplingProfiler()
+track = PROFILER.track
+profiled = PROFILER.profiled
@@ -0,0 +1,171 @@
+"""
+Prompt registry for ai_engine.
+
+Each prompt is compiled once at import into a PromptTemplate. The persona and
+formatting rules become a static system instruction that is byte-identical on
+every call, and only the short per-call part is formatted. The instructions
+are far below the ~1k-token minimum for Gemini's context caching (explicit or
+implicit), so they are simply sent inline; keeping them short is the saving.
+Every template also carries a token budget: variable fields are trimmed to fit
+before sending, and the measured usage is checked against the budget afterwards.
+"""
+import string
+import textwrap
+
+import metrics
+
+CHARS_PER_TOKEN = 4        # Gemini's documented rule of thumb for English text
+IMAGE_TOKENS = 258         # Flat cost of one image up to 384px; larger images tile
+OUTPUT_HEADROOM = 4        # The hard output cap is this multiple of the budget: answers are never cut to fit one
+TRUNCATION_NOTE = "\n\n*…this answer was cut short. Ask again for the rest.*"
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+class PromptTemplate:
+    """A static system instruction plus a precompiled per-call template with a token budget."""
+
+    def __init__(self, name, system, user, input_budget, output_budget, temperature,
+                 trim=(), images=0, thinking_budget=0):
+        self.name = name
+        self.system = textwrap.dedent(system).strip()
+        self.user = textwrap.dedent(user).strip()
+        self.fields = tuple(field for _, field, _, _ in string.Formatter().parse(self.user) if field)
+        unknown = set(trim) - set(self.fields)
+        if unknown:
+            raise ValueError(f"{name}: cannot trim unknown fields {sorted(unknown)}")
+        self.trim = tuple(trim)
+        self.input_budget = input_budget
+        self.output_budget = output_budget
+        self.output_limit = output_budget * OUTPUT_HEADROOM
+        self.temperature = temperature
+        self.thinking_budget = thinking_budget
+        self.system_tokens = estimate_tokens(self.system)
+        self.fixed_tokens = self.system_tokens + images * IMAGE_TOKENS
+
+    def render(self, **values):
+        """Formats the per-call text, shortening `trim` fields (in order) until it fits the budget."""
+        missing = [f for f in self.fields if f not in values]
+        if missing:
+            raise KeyError(f"{self.name}: missing prompt fields {missing}")
+        values = {f: str(values[f]) for f in self.fields}
+        text = self.user.format_map(values)
+        for field in self.trim:
+            over = self.fixed_tokens + estimate_tokens(text) - self.input_budget
+            if over <= 0:
+                break
+            value = values[field]
+            values[field] = value[:max(0, len(value) - over * CHARS_PER_TOKEN)]
+            text = self.user.format_map(values)
+            metrics.PROMPT_TRIMS.inc(prompt=self.name, field=field)
+        return text
+
+    def check_usage(self, response):
+        """Compares the token counts Gemini measured with this template's budget."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        if (getattr(usage, "prompt_token_count", None) or 0) > self.input_budget:
+            metrics.PROMPT_BUDGET_OVERRUNS.inc(prompt=self.name, kind="input")
+        if (getattr(usage, "candidates_token_count", None) or 0) >= self.output_budget:
+            metrics.PROMPT_BUDGET_OVERRUNS.inc(prompt=self.name, kind="output")
+        if was_truncated(response):
+            metrics.PROMPT_BUDGET_OVERRUNS.inc(prompt=self.name, kind="truncated")
+
+def was_truncated(response):
+    """True when Gemini stopped because it hit max_output_tokens rather than finishing the answer."""
+    candidates = getattr(response, "candidates", None) or []
+    reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+    return getattr(reason, "name", reason) == "MAX_TOKENS"
+
+# --- TEMPLATES ---
+
+PROMPTS = {t.name: t for t in [
+    PromptTemplate(
+        "chat_with_ai",
+        system="""
+        You are NUtri-INO, a friendly, uplifting AI health coach.
+        Keep answers concise, helpful, and under 3 sentences.
+        Use a positive, motivating tone. Include local insights if applicable.
+        """,
+        user="""
+        Current User Stats & Context: {context}
+        {message}
+        """,
+        input_budget=600, output_budget=256, temperature=None, trim=("context", "message"),
+    ),
+    PromptTemplate(
+        "generate_recipe",
+        system="""
+        Act as a localized nutritionist and chef.
+        Provide a quick, simple, healthy home-cooked recipe or preparation method for the requested dish.
+        Adapt the ingredients to what is fresh, cultural, and locally available where the user lives, while strictly supporting their health goal.
+
+        IMPORTANT: Do NOT explicitly include the city, state, or region name in the recipe title or text. Use the natural, traditional name of the dish.
+        Format the response cleanly in Markdown with bold headers and bullet points. Keep it under 150 words.
+        """,
+        user="""
+        Dish: {food_name}
+        Location: {location}
+        Health goal: {goal}
+        """,
+        input_budget=400, output_budget=400, temperature=0.6, trim=("food_name",),
+    ),
+    PromptTemplate(
+        "analyze_pantry_image",
+        system="""
+        You are the "Pantry Alchemist". Look at the ingredients visible in the image (fridge, pantry, or counter).
+        Invent 2 unique, simple, and delicious recipes the user can make right now using ONLY the ingredients you see (plus basic pantry staples like salt, pepper, oil, water).
+        If you cannot clearly see any food items, politely explain what you see instead.
+
+        Format cleanly in Markdown. For each recipe include:
+        - A catchy title (IMPORTANT: Do NOT include the city, state, or region name anywhere in the title)
+        - Estimated Calories
+        - Brief instructions
+        """,
+        user="""
+        Location: {location}
+        Health goal: {goal}
+        """,
+        input_budget=1800, output_budget=700, temperature=0.7, images=1,
+    ),
+    PromptTemplate(
+        "generate_recovery_protocol",
+        system="""
+        Act as an elite sports medicine dietitian and physiotherapist.
+        Provide a highly actionable recovery protocol for the user's strain or injury, formatted cleanly in Markdown. Include:
+        1. **Immediate Mobility/Rehab Advice:** 2 specific, safe stretches or actions to take.
+        2. **Anti-Inflammatory Diet Shift:** Explain briefly what macros/micronutrients they need right now to repair this specific tissue.
+        3. **Healing Recipe:** 1 specific recipe using ingredients traditionally available in their region that directly supports reducing inflammation.
+
+        IMPORTANT: Do NOT explicitly mention the user's city, state, or region name anywhere in the protocol or recipe title. Give the dish its natural name.
+        """,
+        user="""
+        Strain/injury: {strain}
+        Location: {location}
+        """,
+        input_budget=600, output_budget=800, temperature=0.4, trim=("strain",),
+    ),
+    PromptTemplate(
+        "analyze_food_image",
+        system="""
+        Analyze the food image. Provide the nutritional breakdown as JSON:
+        the food name, total estimated calories, grams of protein, carbs and fats,
+        and one short sentence of healthy advice regarding this food.
+        """,
+        user="Estimate the nutrition for this meal.",
+        input_budget=1800, output_budget=200, temperature=0.2, images=1,
+    ),
+    PromptTemplate(
+        "analyze_food_image_repair",
+        system="""
+        Your previous reply to a food-image nutrition request did not match the required JSON schema.
+        Return ONLY the corrected JSON object with keys name, calories, protein, carbs, fats, advice.
+        """,
+        user="""
+        Problem: {problem}
+        Previous reply: {bad_output}
+        """,
+        input_budget=800, output_budget=200, temperature=0.0, trim=("bad_output",),
+    ),
+]}
@@ -0,0 +1,71 @@
+"""
+Background day rollover.
+
+Instead of every read checking whether the date changed, one asyncio task
+sleeps until the next local midnight of any registered profile and then
+rolls all of them over in a single pass.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+log = logging.getLogger(__name__)
+
+# Small grace period so we wake up just after midnight, never just before it
+WAKE_GRACE_SECONDS = 1.0
+MAX_SLEEP_SECONDS = 3600.0
+
+class DailyRolloverScheduler:
+    def __init__(self):
+        self.managers = []
+        self.callbacks = []
+        self._task = None
+
+    def register(self, manager):
+        if manager not in self.managers:
+            self.managers.append(manager)
+
+    def on_rollover(self, callback):
+        """Called with the list of managers that rolled over, e.g. to refresh the dashboard."""
+        self.callbacks.append(callback)
+
+    def seconds_until_next_midnight(self):
+        waits = []
+        for manager in self.managers:
+            now = manager.now()
+            midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+            # Compare in UTC so DST transitions don't skew the wait
+            waits.append((midnight.astimezone(timezone.utc) - now.astimezone(timezone.utc)).total_seconds())
+        # Capped so a timezone change or a suspended laptop is noticed within the hour
+        return min(min(waits, default=MAX_SLEEP_SECONDS), MAX_SLEEP_SECONDS)
+
+    def run_once(self):
+        """Batch pass over every registered profile. Returns the managers that changed day."""
+        rolled = [m for m in self.managers if m.rollover()]
+        if rolled:
+            log.info("Daily rollover for %d profile(s)", len(rolled))
+            for callback in self.callbacks:
+                try:
+                    callback(rolled)
+                except Exception:
+                    log.exception("Rollover callback failed")
+        return rolled
+
+    async def run_forever(self):
+        while True:
+            await asyncio.sleep(self.seconds_until_next_midnight() + WAKE_GRACE_SECONDS)
+            try:
+                self.run_once()
+            except Exception:
+                log.exception("Daily rollover failed")
+
+    def start(self):
+        """Hook for app.on_startup."""
+        if self._task is None:
+            self.run_once()
+            self._task = asyncio.get_running_loop().create_task(self.run_forever())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,92 @@
+"""
+Cross-process storage primitives for running several dashboard workers on one box.
+
+FileLock is an exclusive advisory lock (flock on POSIX, msvcrt on Windows)
+that is re-entrant within a process. atomic_write_json never leaves a
+half-written file for another worker to read. file_stamp tells a process
+whether someone else has rewritten a file since it last loaded it. DiskCache
+is a small SQLite key/value store that every worker can read and write.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            os.close(self._fd)
+            self._fd = None
+        self._rlock.release()
+
+def atomic_write_json(path, data, **dump_kwargs):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, **dump_kwargs)
+    os.replace(tmp, path)
+
+def file_stamp(path):
+    """(inode, mtime_ns, size) of `path`, or None if it doesn't exist. Changes whenever the file is replaced."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+class DiskCache:
+    """JSON values by string key, least recently used entries pruned past `max_entries`."""
+
+    def __init__(self, path, max_entries=256):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, touched REAL NOT NULL)")
+
+    def get(self, key):
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE cache SET touched = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO cache (key, value, touched) VALUES (?, ?, ?)",
+                              (key, json.dumps(value), time.time()))
+            self.conn.execute("DELETE FROM cache WHERE key NOT IN (SELECT key FROM cache ORDER BY touched DESC LIMIT ?)",
+                              (self.max_entries,))
@@ -0,0 +1,134 @@
+/*
+ * Offline queue shared by the dashboard, the offline page and the service worker.
+ *
+ * Entries are stored in IndexedDB with a client-generated id and sent to
+ * /api/sync in batches. The server applies each id once, so a retry after a
+ * timeout can never double-log. Ids the server echoes back (applied,
+ * duplicate or rejected) are removed from the queue.
+ */
+(function (scope) {
+    var DB_NAME = 'nutri-offline', STORE = 'ops', BATCH = 100, SYNC_URL = '/api/sync', FLUSH_EVERY_MS = 30000;
+    var dbPromise = null, flushing = null;
+
+    function openDb() {
+        if (!dbPromise) {
+            dbPromise = new Promise(function (resolve, reject) {
+                var req = indexedDB.open(DB_NAME, 1);
+                req.onupgradeneeded = function () { req.result.createObjectStore(STORE, { keyPath: 'id' }); };
+                req.onsuccess = function () { resolve(req.result); };
+                req.onerror = function () { dbPromise = null; reject(req.error); };
+            });
+        }
+        return dbPromise;
+    }
+
+    function withStore(mode, fn) {
+        return openDb().then(function (db) {
+            return new Promise(function (resolve, reject) {
+                var tx = db.transaction(STORE, mode), req = fn(tx.objectStore(STORE));
+                tx.oncomplete = function () { resolve(req ? req.result : undefined); };
+                tx.onerror = function () { reject(tx.error); };
+            });
+        });
+    }
+
+    function newId() {
+        if (scope.crypto && scope.crypto.randomUUID) return scope.crypto.randomUUID();
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+    }
+
+    function announce(synced) {
+        if (!scope.document) return;
+        NutriOffline.pending().then(function (ops) {
+            scope.dispatchEvent(new CustomEvent('nutri-offline', { detail: { pending: ops.length, synced: synced } }));
+        });
+        // Lets the dashboard refresh its panels (ui.on('nutri_synced', ...) in main.py)
+        if (synced && typeof scope.emitEvent === 'function') scope.emitEvent('nutri_synced', { count: synced });
+    }
+
+    var NutriOffline = {
+        /* Queues {type: 'meal'|'steps'|'weight', ...fields} and tries to send it straight away. */
+        queue: function (type, fields) {
+            var op = Object.assign({ id: newId(), type: type, ts: Date.now() }, fields);
+            return withStore('readwrite', function (store) { return store.put(op); }).then(function () {
+                if (scope.navigator && scope.navigator.serviceWorker) {
+                    // Background Sync delivers the queue even if this tab is closed before the network returns
+                    scope.navigator.serviceWorker.ready.then(function (reg) {
+                        if (reg.sync) return reg.sync.register('nutri-sync');
+                    }).catch(function () {});
+                }
+                NutriOffline.flush();
+                announce(0);
+                return op;
+            });
+        },
+
+        pending: function () {
+            return withStore('readonly', function (store) { return store.getAll(); });
+        },
+
+        /* Sends the queue oldest first in batches. Resolves to the number of entries settled; `strict` rethrows failures. */
+        flush: function (strict) {
+            if (flushing) return flushing;
+            flushing = (async function () {
+                var settled = 0;
+                for (;;) {
+                    var ops = (await NutriOffline.pending()).sort(function (a, b) { return a.ts - b.ts; }).slice(0, BATCH);
+                    if (!ops.length) break;
+                    var res = await fetch(SYNC_URL, {
+                        method: 'POST', credentials: 'same-origin',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({ ops: ops })
+                    });
+                    if (!res.ok) throw new Error('Sync failed with HTTP ' + res.status);
+                    var body = await res.json();
+                    var done = body.applied.concat(body.duplicate, body.rejected.map(function (r) { return r.id; }));
+                    await withStore('readwrite', function (store) {
+                        done.forEach(function (id) { if (id) store.delete(id); });
+                    });
+                    settled += done.length;
+                    if (!done.length) break;
+                }
+                return settled;
+            })();
+            var result = flushing.then(function (n) { announce(n); return n; }, function (err) {
+                if (strict) throw err;
+                return 0;
+            });
+            result.finally(function () { flushing = null; }).catch(function () {});
+            flushing = result;
+            return result;
+        }
+    };
+    scope.NutriOffline = NutriOffline;
+
+    if (!scope.document) return;  // Service worker: it only needs the queue
+
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register('/sw.js', { scope: '/' }).catch(function () {});
+    }
+    window.addEventListener('online', function () { NutriOffline.flush(); });
+    document.addEventListener('visibilitychange', function () {
+        if (!document.hidden && navigator.onLine) NutriOffline.flush();
+    });
+    setInterval(function () { if (navigator.onLine) NutriOffline.flush(); }, FLUSH_EVERY_MS);
+
+    // On the dashboard, a dropped connection offers the offline logger instead of a dead page
+    function toggleBanner() {
+        if (location.pathname === '/offline' || !document.body) return;
+        var banner = document.getElementById('nutri-offline-banner');
+        if (!navigator.onLine && !banner) {
+            banner = document.createElement('a');
+            banner.id = 'nutri-offline-banner';
+            banner.className = 'nutri-offline-banner';
+            banner.href = '/offline';
+            banner.textContent = "You're offline. Keep logging here and it will sync later.";
+            document.body.appendChild(banner);
+        } else if (navigator.onLine && banner) {
+            banner.remove();
+        }
+    }
+    window.addEventListener('online', toggleBanner);
+    window.addEventListener('offline', toggleBanner);
+    document.addEventListener('DOMContentLoaded', function () { toggleBanner(); NutriOffline.flush(); });
+})(self);
@@ -0,0 +1,58 @@
+/*
+ * Service worker: keeps the app shell available offline and delivers the queue.
+ * Placeholders are filled in by offline.py, which serves this file from /sw.js.
+ */
+importScripts('__OFFLINE_JS__');
+
+var CACHE = 'nutri-shell-__VERSION__';
+var PRECACHE = __PRECACHE__;
+// Content-versioned URLs never change, so these are served cache-first
+var IMMUTABLE_PREFIXES = ['/_nicegui/', '/theme/', '/offline/'];
+var NETWORK_ONLY_PREFIXES = ['/api/', '/admin/', '/_nicegui_ws', '/metrics', '/sw.js'];
+
+self.addEventListener('install', function (event) {
+    event.waitUntil(caches.open(CACHE).then(function (cache) { return cache.addAll(PRECACHE); }).then(function () {
+        return self.skipWaiting();
+    }));
+});
+
+self.addEventListener('activate', function (event) {
+    event.waitUntil(caches.keys().then(function (keys) {
+        return Promise.all(keys.filter(function (key) {
+            return key.indexOf('nutri-shell-') === 0 && key !== CACHE;
+        }).map(function (key) { return caches.delete(key); }));
+    }).then(function () { return self.clients.claim(); }));
+});
+
+function startsWithAny(path, prefixes) {
+    return prefixes.some(function (prefix) { return path.indexOf(prefix) === 0; });
+}
+
+self.addEventListener('fetch', function (event) {
+    var request = event.request, url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin || startsWithAny(url.pathname, NETWORK_ONLY_PREFIXES)) {
+        return;
+    }
+    if (request.mode === 'navigate') {
+        // The live dashboard when reachable, the offline logger when not
+        event.respondWith(fetch(request).catch(function () { return caches.match('/offline'); }));
+        return;
+    }
+    if (startsWithAny(url.pathname, IMMUTABLE_PREFIXES) || PRECACHE.indexOf(url.pathname) >= 0) {
+        event.respondWith(caches.match(request).then(function (hit) {
+            return hit || fetch(request).then(function (response) {
+                if (response.ok) {
+                    var copy = response.clone();
+                    caches.open(CACHE).then(function (cache) { cache.put(request, copy); });
+                }
+                return response;
+            });
+        }));
+    }
+});
+
+self.addEventListener('sync', function (event) {
+    if (event.tag === 'nutri-sync') {
+        event.waitUntil(self.NutriOffline.flush(true));  // A rejection makes the browser retry later
+    }
+});
@@ -0,0 +1,76 @@
+"""
+Goal-aware food suggestions that follow what is left in the day.
+
+Every food in suggestion_foods.csv is a row of one NumPy matrix, with all
+columns in kcal so they are comparable: total kcal, then protein, carbs, fats,
+sugar and fiber. The query is the day's remaining macro gap from
+HealthManager.get_stats(), sized to one meal. A per-goal weight vector says
+what matters most, e.g. protein for Strength & Recovery or sugar for Cut
+Sugar. Ranking is a single weighted squared-distance pass over the matrix
+followed by an argpartition. Gaps are bucketed (50 kcal, 10% macro shares)
+and ranked lists are cached per (goal, bucket), so most renders are a dict
+lookup.
+"""
+import csv
+import os
+from functools import lru_cache
+
+import numpy as np
+
+FOODS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suggestion_foods.csv")
+KCAL_PER_GRAM = np.array([4.0, 4.0, 9.0])  # protein, carbs, fats
+MEAL_KCAL_CAP = 650
+KCAL_BUCKET = 50
+SHARE_STEPS = 10
+FIBER_PER_KCAL = 0.014  # 14 g per 1000 kcal
+
+# goal: (protein/carb/fat share of the day's kcal, weights for kcal, protein, carbs, fats, sugar, fiber)
+GOAL_PROFILES = {
+    "🔥 Lose Fat": ((0.35, 0.35, 0.30), (1.2, 1.5, 0.8, 1.0, 1.0, 0.5)),
+    "🥗 Eat Healthy": ((0.20, 0.50, 0.30), (1.0, 1.0, 1.0, 1.0, 0.7, 1.5)),
+    "🚫 Cut Sugar": ((0.30, 0.35, 0.35), (1.0, 1.0, 0.8, 1.0, 3.0, 0.7)),
+    "🏋️ Strength & Recovery": ((0.30, 0.45, 0.25), (0.8, 2.0, 1.0, 0.8, 0.5, 0.3)),
+}
+DEFAULT_PROFILE = GOAL_PROFILES["🥗 Eat Healthy"]
+
+class SuggestionIndex:
+    def __init__(self, path=FOODS_PATH):
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            self.foods = [
+                {"name": row["name"], "serving": row["serving"], "calories": int(row["calories"]), "protein": int(row["protein"]),
+                 "carbs": int(row["carbs"]), "fats": int(row["fats"]), "fiber": int(row["fiber"]), "sugar": int(row["sugar"])}
+                for row in csv.DictReader(f)
+            ]
+        grams = np.array([[f["protein"], f["carbs"], f["fats"]] for f in self.foods], dtype=np.float64)
+        self.matrix = np.column_stack([
+            [f["calories"] for f in self.foods],
+            grams * KCAL_PER_GRAM,
+            [4.0 * f["sugar"] for f in self.foods],
+            [4.0 * f["fiber"] for f in self.foods],
+        ])
+        self._ranked = lru_cache(maxsize=1024)(self._rank)
+
+    def gap_key(self, goal, stats):
+        """Buckets the remaining day into (goal, meal kcal, protein/carb/fat shares of the gap) for the cache."""
+        split, _ = GOAL_PROFILES.get(goal, DEFAULT_PROFILE)
+        budget = stats["target"] + stats.get("burned", 0)
+        eaten = np.array([stats.get("protein", 0), stats.get("carbs", 0), stats.get("fats", 0)], dtype=np.float64)
+        gap = np.maximum(budget * np.array(split) - eaten * KCAL_PER_GRAM, 0)
+        shares = gap / gap.sum() if gap.sum() else np.array(split)
+        meal_kcal = min(stats.get("remaining", 0), MEAL_KCAL_CAP)
+        return goal, int(round(meal_kcal / KCAL_BUCKET)), tuple(int(round(s * SHARE_STEPS)) for s in shares)
+
+    def _rank(self, goal, kcal_bucket, shares, k):
+        _, weights = GOAL_PROFILES.get(goal, DEFAULT_PROFILE)
+        meal_kcal = kcal_bucket * KCAL_BUCKET
+        shares = np.array(shares, dtype=np.float64)
+        shares = shares / shares.sum() if shares.sum() else shares
+        target = np.concatenate(([meal_kcal], meal_kcal * shares, [0.0, 4.0 * FIBER_PER_KCAL * meal_kcal]))
+        distance = (((self.matrix - target) * np.array(weights)) ** 2).sum(axis=1)
+        k = min(k, len(self.foods))
+        top = np.argpartition(distance, k - 1)[:k]
+        return tuple(int(i) for i in top[np.argsort(distance[top])])
+
+    def suggest(self, goal, stats, k=3):
+        """The k catalogue foods closest to a meal-sized share of what `stats` (get_stats()) has left today."""
+        return [self.foods[i] for i in self._ranked(*self.gap_key(goal, stats), k)]
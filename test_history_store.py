@@ -0,0 +1,55 @@
+"""
+Crash-safety checks for HistoryStore's range growth.
+
+    python -m pytest test_history_store.py      (or: python -m unittest test_history_store)
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import shared_store
+from history_store import HistoryStore
+
+class InterruptedResizeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="nutri_history_")
+        self.store = HistoryStore(self.directory)
+        self.store.write_rows([("2026-10-10", {"consumed": 1000, "steps": 5000}),
+                               ("2026-10-12", {"consumed": 1800, "steps": 7000})])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _fail_meta_write(self, rows):
+        with mock.patch.object(shared_store, "atomic_write_json", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.store.write_rows(rows)
+
+    def test_interrupted_prepend_keeps_existing_days(self):
+        self._fail_meta_write([("2026-09-01", {"consumed": 500})])
+        for store in (self.store, HistoryStore(self.directory)):  # This process, and a fresh one after a crash
+            self.assertEqual(store.row("2026-10-10")["consumed"], 1000)
+            self.assertEqual(store.row("2026-10-10")["steps"], 5000)
+            self.assertEqual(store.row("2026-10-12")["consumed"], 1800)
+            self.assertEqual(store.row("2026-09-01")["consumed"], 0)
+
+    def test_interrupted_append_keeps_existing_days(self):
+        self._fail_meta_write([("2026-10-20", {"consumed": 500})])
+        reopened = HistoryStore(self.directory)
+        self.assertEqual(reopened.days, 3)
+        self.assertEqual(reopened.row("2026-10-12")["steps"], 7000)
+
+    def test_retry_after_interruption_succeeds(self):
+        self._fail_meta_write([("2026-09-01", {"consumed": 500})])
+        self.store.write_rows([("2026-09-01", {"consumed": 500})])
+        reopened = HistoryStore(self.directory)
+        self.assertEqual(reopened.row("2026-09-01")["consumed"], 500)
+        self.assertEqual(reopened.row("2026-10-10")["consumed"], 1000)
+        self.assertEqual(reopened.row("2026-10-12")["steps"], 7000)
+        # Only the live generation's column files remain
+        self.assertEqual(len([n for n in os.listdir(self.directory) if n.startswith("consumed.")]), 1)
+
+if __name__ == "__main__":
+    unittest.main()
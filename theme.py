@@ -1,44 +1,47 @@
-from nicegui import ui
+import hashlib
+import os
+
+from fastapi import Response
+from nicegui import app, ui
+
+# --- STATIC STYLESHEET ---
+# The CSS is served from a URL that contains its content hash, so browsers can
+# cache it forever and a changed theme is simply a new URL.
+THEME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'theme.css')
+with open(THEME_PATH, 'rb') as f:
+    THEME_CSS = f.read()
+THEME_VERSION = hashlib.sha256(THEME_CSS).hexdigest()[:12]
+THEME_URL = f'/theme/{THEME_VERSION}/theme.css'
+
+@app.get('/theme/{version}/theme.css')
+def theme_stylesheet(version: str):
+    # Old versions still get the current file, just without the long cache
+    cache = 'public, max-age=31536000, immutable' if version == THEME_VERSION else 'no-cache'
+    return Response(THEME_CSS, media_type='text/css', headers={'Cache-Control': cache})
+
+# --- LOW-POWER MODE ---
+# Chosen before first paint: the saved toggle wins, otherwise prefers-reduced-motion decides.
+LOW_POWER_KEY = 'nutri-low-power'
+LOW_POWER_BOOT_JS = f'''
+(function () {{
+    var root = document.documentElement, saved = localStorage.getItem('{LOW_POWER_KEY}');
+    if (saved === '1' || (saved === null && window.matchMedia('(prefers-reduced-motion: reduce)').matches)) {{
+        root.classList.add('low-power');
+    }}
+    document.addEventListener('visibilitychange', function () {{
+        root.classList.toggle('page-hidden', document.hidden);
+    }});
+}})();
+'''
+LOW_POWER_TOGGLE_JS = f'''
+const on = document.documentElement.classList.toggle('low-power');
+localStorage.setItem('{LOW_POWER_KEY}', on ? '1' : '0');
+return on;
+'''
 
 def apply_theme():
-    ui.add_head_html('''
-    <style>
-        body { 
-            background: linear-gradient(135deg, #e8f5e9 0%, #c8e6c9 100%); 
-            color: #1b5e20; 
-            font-family: 'Segoe UI', system-ui, sans-serif;
-            min-height: 100vh;
-            margin: 0;
-        }
-        /* Glassmorphism card effect */
-        .glass-card { 
-            background: rgba(255, 255, 255, 0.65); 
-            backdrop-filter: blur(12px); 
-            -webkit-backdrop-filter: blur(12px);
-            border: 1px solid rgba(255, 255, 255, 0.8); 
-            border-radius: 16px; 
-            box-shadow: 0 8px 32px 0 rgba(76, 175, 80, 0.15);
-            transition: transform 0.2s ease, box-shadow 0.2s ease;
-        }
-        .glass-card:hover {
-            box-shadow: 0 12px 40px 0 rgba(76, 175, 80, 0.25);
-        }
-        /* Glistening text effect for headers */
-        .glisten-text { 
-            background: linear-gradient(to right, #2e7d32, #4caf50, #2e7d32);
-            background-size: 200% auto;
-            color: #000;
-            background-clip: text;
-            text-fill-color: transparent;
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            animation: shine 3s linear infinite;
-        }
-        @keyframes shine {
-            to { background-position: 200% center; }
-        }
-        .accessible-text {
-            color: #1a4314; /* High contrast dark green */
-        }
-    </style>
-    ''')
\ No newline at end of file
+    ui.add_head_html(f'<link rel="stylesheet" href="{THEME_URL}">\n<script>{LOW_POWER_BOOT_JS}</script>')
+
+async def toggle_low_power():
+    """Flips low-power mode in the current browser and remembers it there. Returns the new state."""
+    return bool(await ui.run_javascript(LOW_POWER_TOGGLE_JS))
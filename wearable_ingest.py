@@ -0,0 +1,493 @@
+"""
+Wearable ingestion pipeline.
+
+Stream-parses bulk activity exports (Google Fit / generic CSV, JSON or JSON
+Lines, Apple Health export.xml and GPX tracks) record by record, downsamples
+them into fixed-size time buckets held in compact `array` columns, and persists
+them as raw binary files. Daily totals from the store backfill the history
+steps and burned calories in HealthManager.
+
+Usage:
+    python wearable_ingest.py export.xml              # import into wearable_data/
+    python wearable_ingest.py fit.csv --resolution 60 # minute buckets
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
+
+import shared_store
+
+STEP_KCAL = 0.04        # Same burn-per-step ratio the dashboard has always used
+STRIDE_METRES = 0.762   # Average walking stride, used to turn GPX distance into steps
+CHUNK_SIZE = 64 * 1024
+
+TIME_FIELDS = ("start time", "starttime", "start", "startdate", "start_time", "timestamp", "time", "date", "datetime", "starttimenanos", "starttimemillis")
+STEP_FIELDS = ("step count", "steps", "step_count", "stepcount", "count")
+CALORIE_FIELDS = ("calories (kcal)", "calories", "active calories", "activeenergyburned", "energy", "kcal", "burned")
+
+APPLE_STEPS = "HKQuantityTypeIdentifierStepCount"
+APPLE_ENERGY = "HKQuantityTypeIdentifierActiveEnergyBurned"
+
+# --- TIMESTAMPS ---
+
+def parse_timestamp(value, tz=None):
+    """
+    Accepts ISO strings, Apple Health dates and epoch seconds/millis/nanos. Returns a naive datetime in `tz`
+    (the user's timezone; server local time when None). Timestamps without an offset are taken as already local.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) or str(value).strip().lstrip("-").isdigit():
+        n = float(value)
+        if n > 1e17: n /= 1e9
+        elif n > 1e14: n /= 1e6
+        elif n > 1e11: n /= 1e3
+        return datetime.fromtimestamp(n, tz).replace(tzinfo=None)
+
+    text = str(value).strip()
+    dt = None
+    try:
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        for fmt in ("%Y-%m-%d %H:%M:%S %z", "%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M", "%Y-%m-%d"):
+            try:
+                dt = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+    if dt is None:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(tz).replace(tzinfo=None)
+    return dt
+
+def _to_float(value):
+    """A finite float, or None for blanks, junk, NaN and infinities."""
+    try:
+        number = float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+def _amount(value):
+    """A usable step/calorie delta: positive and finite. Broken device exports emit negatives and NaN."""
+    return value is not None and math.isfinite(value) and value > 0
+
+# --- TIME-SERIES STORE ---
+
+class TimeSeriesStore:
+    """
+    Step and burned-calorie buckets, one slot per `resolution` seconds.
+
+    Slots are addressed relative to `base_ordinal` (a day ordinal), so a day is
+    always a contiguous slice. Columns are `array('I')` and `array('f')`, i.e.
+    4 bytes per slot per metric.
+    """
+
+    def __init__(self, directory=None, resolution=3600):
+        if 86400 % resolution:
+            raise ValueError("Resolution must divide a day evenly")
+        self.directory = directory
+        self.resolution = resolution
+        self.slots_per_day = 86400 // resolution
+        self.base_ordinal = None
+        self.steps = array('I')
+        self.burned = array('f')
+        # Per-slot flags used while importing: 1 = steps seen, 2 = calories seen
+        self.touched = None
+        self.lock = threading.Lock()
+        self._file_lock = None
+        self._stamp = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._file_lock = shared_store.FileLock(os.path.join(directory, "store.lock"))
+            self._load()
+
+    # Persistence
+    def _paths(self):
+        return (os.path.join(self.directory, "meta.json"),
+                os.path.join(self.directory, "steps.u32"),
+                os.path.join(self.directory, "burned.f32"))
+
+    def _load(self):
+        meta_path, steps_path, burned_path = self._paths()
+        self._stamp = shared_store.file_stamp(meta_path)
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get("resolution") != self.resolution:
+            # Keep whatever resolution is on disk so old data stays readable
+            self.resolution = meta["resolution"]
+            self.slots_per_day = 86400 // self.resolution
+        self.base_ordinal = meta.get("base_ordinal")
+        for column, path in ((self.steps, steps_path), (self.burned, burned_path)):
+            with open(path, 'rb') as f:
+                column.frombytes(f.read())
+
+    def save(self):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path, steps_path, burned_path = self._paths()
+        for column, path in ((self.steps, steps_path), (self.burned, burned_path)):
+            with open(path + ".tmp", 'wb') as f:
+                column.tofile(f)
+            os.replace(path + ".tmp", path)
+        shared_store.atomic_write_json(meta_path, {"resolution": self.resolution, "base_ordinal": self.base_ordinal, "slots": len(self.steps)})
+        self._stamp = shared_store.file_stamp(meta_path)
+
+    def reload_if_changed(self):
+        """Re-reads the columns if another process saved the store since we loaded it."""
+        if not self.directory or shared_store.file_stamp(self._paths()[0]) == self._stamp:
+            return False
+        with self._file_lock:
+            self.base_ordinal = None
+            self.steps = array('I')
+            self.burned = array('f')
+            self._load()
+        return True
+
+    @contextmanager
+    def transaction(self):
+        """Thread and cross-process lock around load-merge-save, so concurrent importers don't overwrite each other."""
+        with self.lock, self._file_lock or nullcontext():
+            self.reload_if_changed()
+            yield self
+            self.save()
+
+    # Addressing
+    def _ensure_day(self, ordinal):
+        """Grows the columns so `ordinal` is covered. Returns the slot index of that day's first bucket."""
+        if self.base_ordinal is None:
+            self.base_ordinal = ordinal
+        if ordinal < self.base_ordinal:
+            pad = (self.base_ordinal - ordinal) * self.slots_per_day
+            self.steps = array('I', bytes(4 * pad)) + self.steps
+            self.burned = array('f', bytes(4 * pad)) + self.burned
+            if self.touched is not None:
+                self.touched = bytearray(pad) + self.touched
+            self.base_ordinal = ordinal
+        first = (ordinal - self.base_ordinal) * self.slots_per_day
+        missing = first + self.slots_per_day - len(self.steps)
+        if missing > 0:
+            self.steps.frombytes(bytes(4 * missing))
+            self.burned.frombytes(bytes(4 * missing))
+            if self.touched is not None:
+                self.touched.extend(bytes(missing))
+        return first
+
+    def _slot(self, dt):
+        first = self._ensure_day(dt.toordinal())
+        return first + (dt.hour * 3600 + dt.minute * 60 + dt.second) // self.resolution
+
+    # Writing
+    def add(self, dt, steps=None, burned=None):
+        slot = self._slot(dt)
+        if self.touched is None:
+            self.touched = bytearray(len(self.steps))
+        if _amount(steps):
+            self.steps[slot] = min(0xFFFFFFFF, self.steps[slot] + int(steps))
+            self.touched[slot] |= 1
+        if _amount(burned):
+            self.burned[slot] += burned
+            self.touched[slot] |= 2
+
+    def fill_missing_burn(self):
+        """Estimates burned calories for buckets that only had step data."""
+        if self.touched is None:
+            return
+        for slot, flags in enumerate(self.touched):
+            if flags == 1:
+                self.burned[slot] = self.steps[slot] * STEP_KCAL
+
+    def merge(self, other, replace=True):
+        """
+        Copies every bucket `other` touched into this store. Bulk imports replace
+        old values so re-importing a file is idempotent; live pushes add to them.
+        """
+        if other.base_ordinal is None or other.touched is None:
+            return set()
+        if other.resolution != self.resolution:
+            raise ValueError("Cannot merge stores with different resolutions")
+        days = set()
+        for slot, flags in enumerate(other.touched):
+            if not flags:
+                continue
+            ordinal = other.base_ordinal + slot // other.slots_per_day
+            target = self._ensure_day(ordinal) + slot % other.slots_per_day
+            if replace:
+                self.steps[target] = other.steps[slot]
+                self.burned[target] = other.burned[slot]
+            else:
+                self.steps[target] = min(0xFFFFFFFF, self.steps[target] + other.steps[slot])
+                self.burned[target] += other.burned[slot]
+            days.add(ordinal)
+        return days
+
+    # Reading
+    def day_totals(self, day):
+        """Returns (steps, burned) for a date, 'YYYY-MM-DD' string or day ordinal."""
+        ordinal = _ordinal(day)
+        if self.base_ordinal is None or ordinal < self.base_ordinal:
+            return 0, 0
+        first = (ordinal - self.base_ordinal) * self.slots_per_day
+        if first >= len(self.steps):
+            return 0, 0
+        last = first + self.slots_per_day
+        return sum(self.steps[first:last]), int(round(sum(self.burned[first:last])))
+
+    def iter_days(self, ordinals=None):
+        """Yields ('YYYY-MM-DD', steps, burned) for the given day ordinals (default: every stored day)."""
+        if self.base_ordinal is None:
+            return
+        if ordinals is None:
+            ordinals = range(self.base_ordinal, self.base_ordinal + len(self.steps) // self.slots_per_day)
+        for ordinal in sorted(ordinals):
+            steps, burned = self.day_totals(ordinal)
+            yield date.fromordinal(ordinal).strftime("%Y-%m-%d"), steps, burned
+
+def _ordinal(day):
+    if isinstance(day, int):
+        return day
+    if isinstance(day, (date, datetime)):
+        return day.toordinal()
+    return datetime.strptime(day, "%Y-%m-%d").toordinal()
+
+# --- STREAMING PARSERS ---
+# Each parser yields (datetime, steps or None, calories or None) one record at a time.
+
+def _pick(fields, candidates):
+    lowered = {f.strip().lower(): f for f in fields if f}
+    for c in candidates:
+        if c in lowered:
+            return lowered[c]
+    return None
+
+def parse_csv(stream, tz=None):
+    reader = csv.DictReader(stream)
+    fields = reader.fieldnames or []
+    time_col = _pick(fields, TIME_FIELDS)
+    step_col = _pick(fields, STEP_FIELDS)
+    cal_col = _pick(fields, CALORIE_FIELDS)
+    if not time_col or not (step_col or cal_col):
+        raise ValueError(f"CSV needs a time column and a steps or calories column, found {fields}")
+    for row in reader:
+        dt = parse_timestamp(row.get(time_col), tz)
+        if dt is None:
+            continue
+        yield dt, _to_float(row.get(step_col)) if step_col else None, _to_float(row.get(cal_col)) if cal_col else None
+
+def _record_from_json(obj, tz=None):
+    """Understands flat records and Google Fit style dataPoints."""
+    if not isinstance(obj, dict):
+        return None
+    keys = list(obj.keys())
+    time_key = _pick(keys, TIME_FIELDS)
+    if time_key is None:
+        return None
+    dt = parse_timestamp(obj[time_key], tz)
+    if dt is None:
+        return None
+
+    if "value" in obj and isinstance(obj["value"], list):
+        # Google Fit: {"dataTypeName": "com.google.step_count.delta", "value": [{"intVal": 42}]}
+        raw = obj["value"][0] if obj["value"] else {}
+        amount = raw.get("intVal", raw.get("fpVal"))
+        kind = obj.get("dataTypeName", "")
+        if "calories" in kind:
+            return dt, None, _to_float(amount)
+        return dt, _to_float(amount), None
+
+    step_key = _pick(keys, STEP_FIELDS)
+    cal_key = _pick(keys, CALORIE_FIELDS)
+    return dt, _to_float(obj[step_key]) if step_key else None, _to_float(obj[cal_key]) if cal_key else None
+
+def iter_json_objects(stream):
+    """
+    Yields objects from JSON Lines, a top-level array, or the first array inside a
+    wrapper object (e.g. {"dataPoints": [...]}) while holding only one chunk in memory.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    in_array = False
+    eof = False
+
+    def fill():
+        nonlocal buf, eof
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            eof = True
+        buf += chunk
+
+    fill()
+    stripped = buf.lstrip()
+    if stripped.startswith("{"):
+        # JSON Lines if the first line is a complete object, otherwise a wrapper object
+        first_line = stripped.split("\n", 1)[0]
+        try:
+            json.loads(first_line)
+        except ValueError:
+            while "[" not in buf and not eof:
+                fill()
+            buf = buf[buf.index("[") + 1:] if "[" in buf else ""
+            in_array = True
+    elif stripped.startswith("["):
+        buf = stripped[1:]
+        in_array = True
+
+    while True:
+        buf = buf.lstrip(" \t\r\n,")
+        if in_array and buf.startswith("]"):
+            return
+        if not buf:
+            if eof:
+                return
+            fill()
+            continue
+        try:
+            obj, end = decoder.raw_decode(buf)
+        except ValueError:
+            if eof:
+                return
+            fill()
+            continue
+        buf = buf[end:]
+        yield obj
+
+def parse_json(stream, tz=None):
+    for obj in iter_json_objects(stream):
+        record = _record_from_json(obj, tz)
+        if record:
+            yield record
+        elif isinstance(obj, dict):
+            # A single-line wrapper object such as {"dataPoints": [...]}
+            for value in obj.values():
+                if isinstance(value, list):
+                    yield from filter(None, (_record_from_json(v, tz) for v in value))
+
+def parse_apple_health(stream, tz=None):
+    for _, elem in ET.iterparse(stream, events=("end",)):
+        if elem.tag == "Record":
+            kind = elem.get("type")
+            if kind in (APPLE_STEPS, APPLE_ENERGY):
+                dt = parse_timestamp(elem.get("startDate"), tz)
+                value = _to_float(elem.get("value"))
+                if dt is not None and value is not None:
+                    yield (dt, value, None) if kind == APPLE_STEPS else (dt, None, value)
+            elem.clear()
+        elif elem.tag == "Workout":
+            elem.clear()
+
+def _haversine(lat1, lon1, lat2, lon2):
+    r = 6371000
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * r * math.asin(math.sqrt(a))
+
+def parse_gpx(stream, tz=None):
+    """GPX has no step counts, so steps are estimated from distance walked between track points."""
+    previous = None
+    for _, elem in ET.iterparse(stream, events=("end",)):
+        if not elem.tag.endswith("trkpt"):
+            continue
+        time_text = next((child.text for child in elem if child.tag.endswith("time")), None)
+        dt = parse_timestamp(time_text, tz)
+        lat, lon = _to_float(elem.get("lat")), _to_float(elem.get("lon"))
+        elem.clear()
+        if dt is None or lat is None or lon is None:
+            continue
+        if previous:
+            metres = _haversine(previous[0], previous[1], lat, lon)
+            yield dt, metres / STRIDE_METRES, None
+        previous = (lat, lon)
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".tsv"):
+        return "csv"
+    if ext in (".json", ".jsonl", ".ndjson"):
+        return "json"
+    if ext == ".gpx":
+        return "gpx"
+    if ext == ".xml":
+        return "apple"
+    with open(path, 'r', errors='ignore') as f:
+        head = f.read(2048)
+    if "<gpx" in head:
+        return "gpx"
+    if "<HealthData" in head or "<?xml" in head:
+        return "apple"
+    if head.lstrip().startswith(("{", "[")):
+        return "json"
+    return "csv"
+
+def iter_records(path, fmt=None, tz=None):
+    fmt = fmt or detect_format(path)
+    if fmt in ("apple", "gpx"):
+        with open(path, 'rb') as f:
+            parser = parse_apple_health if fmt == "apple" else parse_gpx
+            yield from parser(f, tz)
+    else:
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            parser = parse_csv if fmt == "csv" else parse_json
+            yield from parser(f, tz)
+
+# --- PIPELINE ---
+
+def ingest_records(records, store, replace=True):
+    """Buckets a record stream and merges it into `store`. Returns (record_count, touched day ordinals)."""
+    buffer = TimeSeriesStore(resolution=store.resolution)
+    count = 0
+    for dt, steps, burned in records:
+        buffer.add(dt, steps, burned)
+        count += 1
+    buffer.fill_missing_burn()
+    with store.transaction():
+        days = store.merge(buffer, replace)
+    return count, days
+
+def ingest_file(path, store, fmt=None, tz=None):
+    """Imports an export file, bucketing samples by the days of `tz` (the user's timezone)."""
+    start = time.perf_counter()
+    count, days = ingest_records(iter_records(path, fmt, tz), store)
+    return {"records": count, "days": len(days), "seconds": round(time.perf_counter() - start, 3), "day_ordinals": days}
+
+def ingest_samples(samples, store, tz=None):
+    """For the webhook: a list of {"start": ..., "steps": ..., "calories": ...} deltas, added to existing buckets."""
+    records = (r for r in (_record_from_json(s, tz) for s in samples) if r)
+    return ingest_records(records, store, replace=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a wearable export into the NUtri-INO activity store.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "json", "apple", "gpx"])
+    parser.add_argument("--store", default="wearable_data")
+    parser.add_argument("--resolution", type=int, default=3600, help="Bucket size in seconds (60 or 3600)")
+    parser.add_argument("--user-data", default="user_data.json", help="HealthManager file to backfill")
+    parser.add_argument("--no-backfill", action="store_true")
+    args = parser.parse_args(argv)
+
+    manager = None
+    if not args.no_backfill:
+        from health_manager import HealthManager
+        manager = HealthManager(args.user_data)
+    store = TimeSeriesStore(args.store, args.resolution)
+    summary = ingest_file(args.path, store, args.format, manager.tzinfo() if manager else None)
+    if manager:
+        manager.backfill_activity(store.iter_days(summary["day_ordinals"]))
+    print(f"Imported {summary['records']} records covering {summary['days']} days in {summary['seconds']}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())